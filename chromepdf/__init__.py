@@ -1,9 +1,10 @@
 __version__ = '1.7.4'
 
 from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import RenderResult
 from chromepdf.maker import ChromePdfMaker
 from chromepdf.shortcuts import generate_pdf, generate_pdf_url
 
 
 __all__ = ['__version__',
-           'generate_pdf', 'generate_pdf_url', 'ChromePdfException', 'ChromePdfMaker']
+           'generate_pdf', 'generate_pdf_url', 'ChromePdfException', 'ChromePdfMaker', 'RenderResult']
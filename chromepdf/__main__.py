@@ -2,6 +2,7 @@
 Command-line entry point for running ChromePDF.
 To execute, run:
 > python -m chromepdf generate-pdf [args] [kwargs]
+> python -m chromepdf bench [kwargs]
 """
 
 
@@ -0,0 +1,166 @@
+import base64
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote
+
+from chromepdf import metrics
+from chromepdf.conf import find_static_file, get_static_url
+
+
+# The default limits of a StaticAssetCache: the total length of the data: URIs it holds, and the number of static file
+# lookups it remembers. Past these, the least recently used entries are dropped.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_LOOKUPS = 4096
+
+# mimetypes does not know about some font types on every OS, so provide fallbacks for those.
+_MIME_TYPE_FALLBACKS = {
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.ttf': 'font/ttf',
+    '.otf': 'font/otf',
+    '.svg': 'image/svg+xml',
+}
+
+
+def _guess_mime_type(path):
+    """Return the MIME type to use in a data: URI for the file at the given path."""
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in _MIME_TYPE_FALLBACKS:
+        return _MIME_TYPE_FALLBACKS[ext]
+    mime_type = mimetypes.guess_type(path)[0]
+    return mime_type or 'application/octet-stream'
+
+
+class StaticAssetCache:
+    """
+    A thread-safe, in-memory LRU cache of static files encoded as base64 data: URIs, and of the paths that Django's
+    staticfiles finders found them at.
+    An entry is re-read from disk whenever the file's mtime or size changes. Once the data: URIs total more than
+    max_bytes characters, the least recently used are dropped. A file whose data: URI alone exceeds that is not cached.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_lookups=DEFAULT_MAX_LOOKUPS):
+        self.max_bytes = max_bytes
+        self.max_lookups = max_lookups
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # absolute path => ((mtime_ns, size), data_uri), least recently used first
+        self._size = 0  # total length of the cached data: URIs
+        self._lookups = OrderedDict()  # path relative to STATIC_URL => absolute path, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, relative_path):
+        """
+        Return the absolute path of a static file found via Django's staticfiles finders, or None if not found.
+        Finders may search many folders, so a found path is remembered for as long as it is still a file.
+        """
+
+        with self._lock:
+            path = self._lookups.get(relative_path)
+            if path is not None:
+                self._lookups.move_to_end(relative_path)
+        if path is not None and os.path.isfile(path):
+            return path
+
+        path = find_static_file(relative_path)
+        with self._lock:
+            if path is None:
+                self._lookups.pop(relative_path, None)  # not found, so search again next time, in case it is added.
+            else:
+                self._lookups[relative_path] = path
+                self._lookups.move_to_end(relative_path)
+                while len(self._lookups) > self.max_lookups:
+                    self._lookups.popitem(last=False)
+        return path
+
+    def get_data_uri(self, path):
+        """Return a data: URI containing the contents of the file at the given path."""
+
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                metrics.ASSET_CACHE_HITS.inc()
+                return entry[1]
+            self.misses += 1
+        metrics.ASSET_CACHE_MISSES.inc()
+
+        # read the file outside of the lock so large files do not block other threads.
+        with open(path, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode('ascii')
+        data_uri = f'data:{_guess_mime_type(path)};base64,{encoded}'
+
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self._size -= len(entry[1])
+            if len(data_uri) <= self.max_bytes:
+                self._entries[path] = (key, data_uri)
+                self._size += len(data_uri)
+                while self._size > self.max_bytes:
+                    _path, (_key, evicted) = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data_uri
+
+    def clear(self):
+        """Remove all cached entries and lookups."""
+
+        with self._lock:
+            self._entries.clear()
+            self._lookups.clear()
+            self._size = 0
+
+
+# A process-wide cache, shared by all renders.
+_default_cache = StaticAssetCache()
+
+
+def get_default_asset_cache():
+    """Return the StaticAssetCache used by inline_static_assets() when no cache is passed in."""
+    return _default_cache
+
+
+def inline_static_assets(html, static_url=None, cache=None):
+    """
+    Return the html with every static file url replaced by a data: URI containing the file's contents.
+
+    Urls are recognized if they begin with STATIC_URL (EG, the output of Django's {% static %} tag) and appear in a
+    src="", href="", or poster="" attribute, or in a CSS url(). They are resolved via Django's staticfiles finders.
+    Urls that cannot be resolved to a file (EG, hashed names from ManifestStaticFilesStorage) are left unchanged.
+
+    html: A string
+    static_url: The url prefix of static files. Defaults to Django's settings.STATIC_URL.
+    cache: A StaticAssetCache to read files through. Defaults to a process-wide cache.
+    """
+
+    static_url = static_url if static_url is not None else get_static_url()
+    if not static_url:
+        return html
+    cache = cache if cache is not None else _default_cache
+
+    def replace(match):
+        url = match.group('url')
+        relative_path = unquote(re.split(r'[?#]', url[len(static_url):], maxsplit=1)[0])
+        path = cache.find(relative_path) if relative_path else None
+        if path is None or not os.path.isfile(path):
+            return match.group(0)
+        data_uri = cache.get_data_uri(path)
+        return f'{match.group("prefix")}{match.group("quote")}{data_uri}{match.group("quote")}{match.group("suffix")}'
+
+    escaped_url = re.escape(static_url)
+    attribute_regex = (r'(?P<prefix>\b(?:src|href|poster)\s*=\s*)(?P<quote>["\'])'
+                       rf'(?P<url>{escaped_url}[^"\'\s>]*)(?P=quote)(?P<suffix>)')
+    css_regex = (r'(?P<prefix>\burl\(\s*)(?P<quote>["\']?)'
+                 rf'(?P<url>{escaped_url}[^"\')\s]*)(?P=quote)(?P<suffix>\s*\))')
+
+    html = re.sub(attribute_regex, replace, html, flags=re.IGNORECASE)
+    html = re.sub(css_regex, replace, html, flags=re.IGNORECASE)
+    return html
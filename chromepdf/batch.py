@@ -0,0 +1,248 @@
+"""
+Generation of many PDF files at once, by worker threads that each keep a browser open between renders.
+To execute, run:
+> python -m chromepdf generate-pdf --jobs=4 --out-dir=path/to/pdfs path/to/html/folder more/*.html
+> python -m chromepdf render-manifest --jobs=4 path/to/manifest.jsonl
+"""
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import ExitStack
+
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import RenderResult
+from chromepdf.pdfconf import clean_pdf_kwargs
+
+
+HTML_EXTENSIONS = ('.html', '.htm')
+
+
+def _is_glob(path):
+    return any(c in path for c in '*?[')
+
+
+def find_inputs(paths):
+    """
+    Return a list of (path, relative_path) tuples of the HTML files found via a list of paths, globs, or directories.
+    Directories are searched recursively for .html and .htm files. The relative_path is relative to the deepest folder
+    that contains every directory given and every other file found, so that output files may mirror the input folders,
+    and files with the same name in different folders do not share an output path.
+    Raise FileNotFoundError if a path does not exist, or a glob does not match any files.
+    Raise ValueError if the files have no folder in common, EG because they are on different drives.
+    """
+
+    found = []  # (path, the folder that its relative_path must be within)
+    for path in paths:
+        if _is_glob(path):
+            matches = sorted(p for p in glob.glob(path, recursive=True) if os.path.isfile(p))
+            if not matches:
+                raise FileNotFoundError(f'No files match: "{path}"')
+            found.extend((p, os.path.dirname(p)) for p in matches)
+        elif os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()  # walk in a consistent order
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(HTML_EXTENSIONS):
+                        found.append((os.path.join(dirpath, filename), path))
+        elif os.path.isfile(path):
+            found.append((path, os.path.dirname(path)))
+        else:
+            raise FileNotFoundError(f'Could not find: "{path}"')
+
+    # Skip files that were found more than once, EG via both a directory and a glob.
+    seen = set()
+    unique = []
+    for path, folder in found:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append((path, os.path.abspath(folder)))
+    if not unique:
+        return []
+
+    try:
+        root = os.path.commonpath([folder for _path, folder in unique])
+    except ValueError as ex:
+        raise ValueError(f'The files must have a folder in common, to mirror it in the output folder: {ex}') from ex
+    return [(path, os.path.relpath(os.path.abspath(path), root)) for path, _folder in unique]
+
+
+def read_manifest(path):
+    """Return the paths listed in a manifest file, one per line. Blank lines and lines starting with # are skipped."""
+
+    with open(path, 'r', encoding='utf8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def get_output_path(path, relative_path, out_dir=None):
+    """Return the PDF path for an input file: in out_dir if given (at its relative_path), or else beside the input."""
+
+    if out_dir is None:
+        return os.path.splitext(path)[0] + '.pdf'
+    return os.path.join(out_dir, os.path.splitext(relative_path)[0] + '.pdf')
+
+
+def read_render_manifest(lines, pdf_kwargs=None, profiles=None):
+    """
+    Yield a job for run_jobs() from each record in a JSON-lines manifest. Blank lines are skipped.
+    Each record is a JSON object with the keys:
+    input: Path of an HTML file. Or instead, html: A string of HTML.
+    output: Path to write the PDF to.
+    pdf_kwargs: Optional. A dict of pdf_kwargs, which override those of the profile, and the pdf_kwargs argument.
+    profile: Optional. The name of a profile in `profiles`, whose settings to render with.
+    id: Optional. Any value that identifies the record, which is copied to its result.
+
+    lines: An iterable of lines, such as an open file. It is read lazily.
+    profiles: A dict of profile name => a dict of ChromePdfMaker settings, plus an optional "pdf_kwargs" dict.
+    Invalid records are yielded as jobs with an "invalid" key, containing the error message.
+    """
+
+    profiles = profiles or {}
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        job = {'line': line_number}
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('a record must be a JSON object.')
+        except ValueError as ex:
+            yield dict(job, invalid=f'Invalid record: {ex}')
+            continue
+
+        job.update((k, record[k]) for k in ('id', 'input', 'html', 'output', 'profile') if k in record)
+        profile = record.get('profile')
+        record_pdf_kwargs = record.get('pdf_kwargs') or {}
+        if ('input' in record) == ('html' in record):
+            job['invalid'] = 'A record must have either an "input" or an "html" key.'
+        elif not record.get('output'):
+            job['invalid'] = 'A record must have an "output" key.'
+        elif profile is not None and profile not in profiles:
+            job['invalid'] = f'Unknown profile: "{profile}"'
+        elif not isinstance(record_pdf_kwargs, dict):
+            job['invalid'] = '"pdf_kwargs" must be a JSON object.'
+        else:
+            profile_pdf_kwargs = profiles[profile].get('pdf_kwargs') or {} if profile is not None else {}
+            job['pdf_kwargs'] = {**(pdf_kwargs or {}), **profile_pdf_kwargs, **record_pdf_kwargs}
+        yield job
+
+
+def run_jobs(maker, jobs, workers=1, profiles=None):
+    """
+    Generate a PDF for each job, using `workers` threads that each keep a ChromePdfSession open between renders.
+    Yield a result dict for each job, in the order they finish.
+
+    maker: A ChromePdfMaker.
+    jobs: An iterable of dicts, with the keys "input" (an HTML file path) or "html" (an HTML string), "output" (the
+    PDF's path), and optionally "pdf_kwargs" and "profile". Jobs with an "invalid" key are not rendered, and fail
+    with that error message. The iterable is read lazily, so at most a few jobs per worker are held in memory at once.
+    profiles: A dict of profile name => ChromePdfMaker, for the jobs with a "profile". Each worker opens a session for
+    each profile that its jobs use.
+
+    Each result dict has the keys of its job (except "html"), plus:
+    status: "ok" or "error".
+    seconds: The time taken to render the job, including reading and writing its files.
+    timings: The time spent in each phase of the render. See RenderResult.
+    error: The error message, if the job failed.
+    A browser that fails to render a job is closed, and a new one started for the worker's next job. Jobs with invalid
+    pdf_kwargs fail before they are rendered, so they keep the browser.
+    """
+
+    job_queue = queue.Queue(maxsize=workers * 2)
+    result_queue = queue.Queue()
+    feed_errors = []
+
+    def feed():
+        try:
+            for job in jobs:
+                job_queue.put(job)
+        except Exception as ex:
+            feed_errors.append(ex)
+        finally:
+            for _i in range(workers):
+                job_queue.put(None)  # tell each worker to stop
+
+    def work():
+        stacks = {}  # profile name => ExitStack holding its session
+        sessions = {}  # profile name => ChromePdfSession
+        try:
+            while True:
+                job = job_queue.get()
+                if job is None:
+                    break
+                start = time.monotonic()
+                profile = job.get('profile')
+                try:
+                    if 'invalid' in job:
+                        raise ValueError(job['invalid'])
+                    clean_pdf_kwargs(**(job.get('pdf_kwargs') or {}))  # raises ValueError or TypeError if invalid
+                    if profile not in sessions:
+                        stack = stacks.setdefault(profile, ExitStack())
+                        job_maker = maker if profile is None else profiles[profile]
+                        sessions[profile] = stack.enter_context(job_maker.session())
+                    timings = _run_job(sessions[profile], job)
+                except Exception as ex:
+                    result_queue.put(_get_result(job, 'error', time.monotonic() - start, {}, str(ex)))
+                    if isinstance(ex, ChromePdfException) and profile in stacks:
+                        # the browser may be in a bad state. Start a new one for the next job.
+                        stacks[profile].close()
+                        sessions.pop(profile, None)
+                else:
+                    result_queue.put(_get_result(job, 'ok', time.monotonic() - start, timings, None))
+        finally:
+            try:
+                for stack in stacks.values():
+                    stack.close()
+            finally:
+                result_queue.put(None)  # tell the caller this worker has stopped
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads.extend(threading.Thread(target=work, daemon=True) for _i in range(workers))
+    for thread in threads:
+        thread.start()
+
+    stopped = 0
+    while stopped < workers:
+        result = result_queue.get()
+        if result is None:
+            stopped += 1
+        else:
+            yield result
+    for thread in threads:
+        thread.join()
+
+    if feed_errors:
+        raise feed_errors[0]
+
+
+def _get_result(job, status, seconds, timings, error):
+    """Return the result dict of a job. The job's HTML string (if any) is left out, to not hold it in memory."""
+
+    result = {k: v for k, v in job.items() if k != 'html'}
+    result.update(status=status, seconds=seconds, timings=timings, error=error)
+    return result
+
+
+def _run_job(session, job):
+    """Generate the PDF of a job with a session, and return the timings of its render."""
+
+    html = job.get('html')
+    if html is None:
+        with open(job['input'], 'r', encoding='utf8') as f:
+            html = f.read()
+
+    result = RenderResult()
+    pdf_bytes = session.generate_pdf(html, job.get('pdf_kwargs'), result=result)
+
+    outpath_dir = os.path.dirname(job['output'])
+    if outpath_dir:
+        os.makedirs(outpath_dir, exist_ok=True)
+    with open(job['output'], 'wb') as f:
+        f.write(pdf_bytes)
+
+    return result.timings
@@ -0,0 +1,131 @@
+"""
+Benchmarks of PDF generation, for capacity sizing and for catching performance regressions between releases.
+To execute, run:
+> python -m chromepdf bench [kwargs]
+"""
+
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from chromepdf.instrumentation import RenderResult
+from chromepdf.maker import ChromePdfMaker
+from chromepdf.pool import BrowserPool
+
+
+BACKENDS = ('selenium', 'noselenium', 'pooled')
+
+
+def make_html(size, pages=1):
+    """Return an HTML string of approximately `size` bytes, whose text is split evenly across `pages` pages."""
+
+    word = '123456789 '
+    words_per_page = max(1, size // pages // len(word))
+    page = word * words_per_page
+    page_break = '<div style="page-break-after: always"></div>'
+    return page_break.join(f'<p>{page}</p>' for _i in range(pages))
+
+
+def _percentile(values, percent):
+    """Return the percentile of a list of numbers, interpolating linearly between the closest ranks."""
+
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * percent / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def run_benchmark(backend, html_size, pages=1, concurrency=1, renders=10, **maker_kwargs):
+    """
+    Render the same HTML `renders` times, with `concurrency` renders running at once, and return a dict of statistics.
+    backend: 'selenium' or 'noselenium', to start a browser for each render, or 'pooled', to render with a BrowserPool
+    of `concurrency` browsers (without Selenium) that are reused across renders. A pool's browsers are launched outside
+    of the renders, so its startup_mean is not reported.
+    summed_peak_rss_bytes is the largest memory use of any one render (see RenderResult.resources), rather than of the
+    browser's whole life, so that it is reported for every backend, including pooled browsers that outlive the renders.
+    maker_kwargs: Any other settings to pass to ChromePdfMaker.
+    """
+
+    output = {
+        'backend': backend,
+        'html_bytes': html_size,
+        'pages': pages,
+        'concurrency': concurrency,
+        'renders': renders,
+        'errors': 0,
+    }
+
+    start = time.monotonic()
+    try:
+        maker = ChromePdfMaker(use_selenium=(backend == 'selenium'), **maker_kwargs)
+    except Exception as ex:
+        output['errors'] = renders
+        output['error'] = str(ex)
+        return output
+    output['maker_init_seconds'] = time.monotonic() - start
+
+    html = make_html(html_size, pages)
+
+    latencies = []
+    startups = []
+    peak_rss = []
+    with ExitStack() as stack:
+        renderer = stack.enter_context(BrowserPool(maker, concurrency)) if backend == 'pooled' else maker
+
+        def render(_i):
+            result = RenderResult()
+            render_start = time.monotonic()
+            renderer.generate_pdf(html, result=result)
+            return time.monotonic() - render_start, result
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(render, i) for i in range(renders)]
+            for future in futures:
+                try:
+                    latency, result = future.result()
+                except Exception as ex:
+                    output['errors'] += 1
+                    output.setdefault('error', str(ex))
+                    continue
+                latencies.append(latency)
+                if backend != 'pooled':
+                    startups.append(result.timings.get('chromedriver_spawn', 0) + result.timings.get('browser_launch', 0))
+                if result.resources is not None:
+                    peak_rss.append(result.resources['summed_peak_rss_bytes'])
+        wall_seconds = time.monotonic() - start
+
+    output.update({
+        'wall_seconds': wall_seconds,
+        'throughput': len(latencies) / wall_seconds if wall_seconds else None,  # successful renders per second
+        'latency_p50': _percentile(latencies, 50),
+        'latency_p95': _percentile(latencies, 95),
+        'latency_p99': _percentile(latencies, 99),
+        'startup_mean': sum(startups) / len(startups) if startups else None,  # chromedriver + browser launch
+        'summed_peak_rss_bytes': max(peak_rss) if peak_rss else None,
+    })
+    return output
+
+
+def run_matrix(backends=BACKENDS, html_sizes=(1000,), pages=(1,), concurrencies=(1,), renders=10, **maker_kwargs):
+    """Run run_benchmark() for every combination of the given axes, and return a JSON-serializable dict of results."""
+
+    import chromepdf
+
+    results = []
+    for backend in backends:
+        for html_size in html_sizes:
+            for page_count in pages:
+                for concurrency in concurrencies:
+                    results.append(run_benchmark(backend, html_size, page_count, concurrency, renders, **maker_kwargs))
+
+    return {
+        'chromepdf_version': chromepdf.__version__,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
@@ -0,0 +1,79 @@
+"""
+Capture of Chrome's own traces of a render (layout, paint, script, etc), for diagnosing slow documents.
+
+The chromedriver's HTTP API does not deliver DevTools events, so traces are collected through its performance log:
+when a session is created with PERF_LOGGING_PREFS, the chromedriver calls Tracing.start itself, and each time the log
+is read, it calls Tracing.end and returns the trace events that were collected (and then starts tracing again).
+
+Traces are written in Chrome's trace-event JSON format, which can be opened in the Performance panel of Chrome's
+DevTools, or at https://ui.perfetto.dev, to view a flame chart of the render.
+"""
+
+import json
+import os
+import time
+import uuid
+
+
+# The categories recorded by the Performance panel of Chrome's DevTools.
+TRACE_CATEGORIES = ','.join([
+    'devtools.timeline',
+    'disabled-by-default-devtools.timeline',
+    'disabled-by-default-devtools.timeline.frame',
+    'disabled-by-default-devtools.timeline.stack',
+    'blink',
+    'blink.user_timing',
+    'loading',
+    'toplevel',
+    'v8.execute',
+    'disabled-by-default-v8.cpu_profiler',
+])
+
+# The "goog:loggingPrefs" capability, which enables the chromedriver's performance log.
+LOGGING_PREFS = {'performance': 'ALL'}
+
+# The "perfLoggingPrefs" Chrome option. Only trace events are logged, not every Network and Page event.
+PERF_LOGGING_PREFS = {'enableNetwork': False, 'enablePage': False, 'traceCategories': TRACE_CATEGORIES}
+
+
+def get_trace_events(log_entries):
+    """Yield the trace events in a list of entries from the chromedriver's performance log."""
+
+    for entry in log_entries:
+        message = json.loads(entry['message'])['message']
+        # Other Tracing.* messages report on the trace buffer, and are not trace events.
+        if message.get('method') == 'Tracing.dataCollected':
+            yield message['params']
+
+
+def get_trace_path(trace_dir):
+    """Return a new, unique path for a trace file in the directory."""
+
+    timestamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(trace_dir, f'chromepdf-trace-{timestamp}-{uuid.uuid4().hex[:8]}.json')
+
+
+def write_trace(path, events):
+    """
+    Write an iterable of trace events to a file in Chrome's trace-event JSON format, one event at a time.
+    The file is written under a temporary name and then renamed, so that it never appears partially written.
+    """
+
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+
+    temp_path = f'{path}.partial'
+    try:
+        with open(temp_path, 'w', encoding='utf8') as f:
+            f.write('{"traceEvents": [')
+            for i, event in enumerate(events):
+                f.write(',\n' if i else '\n')
+                f.write(json.dumps(event))
+            f.write('\n]}\n')
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
@@ -3,16 +3,38 @@ DEFAULT_SETTINGS = {
     'CHROMEDRIVER_PATH': None,
     'CHROMEDRIVER_DOWNLOADS': True,
     'CHROMEDRIVER_CHMOD': 0o764,
+    'CHROMEDRIVER_URL': None,
+    'CHROME_DEBUGGER_ADDRESS': None,
+    'SHARE_CHROMEDRIVER': False,
+    'STANDBY_BROWSER': False,
     # also, PDF_KWARGS, but it's handled differently
     'CHROME_ARGS': [],
     'USE_SELENIUM': None,
+    'INLINE_STATIC_ASSETS': False,
+    'BLOCK_NETWORK': False,
+    'NETWORK_ALLOWLIST': [],
+    'WAIT_FOR': None,
+    'WAIT_TIMEOUT': 30,
+    'JAVASCRIPT': True,
+    'USER_DATA_DIR': None,
+    'COLLECT_PERFORMANCE_METRICS': False,
+    'TRACE_DIR': None,
+    'TRACE_THRESHOLD': None,
+    'SLOW_RENDER_THRESHOLD': None,
+    'SLOW_RENDER_SPOOL_DIR': None,
+    'SLOW_RENDER_SPOOL_LIMIT': 100,
+    'DAEMON': None,
+    'DAEMON_TIMEOUT': 300,
+    'RENDER_SERVERS': [],
+    'RENDER_SERVER_CONNECT_TIMEOUT': 5,
+    'RENDER_SERVER_READ_TIMEOUT': 300,
 }
 
 
 def get_chromepdf_settings_dict():
     """
     Return a Django's settings.CHROMEPDF dict. Return empty dict if not found or Django not installed.
-    For our sanity, this should be the ONLY place within the chromepdf app that we import from Django.
+    For our sanity, this module should be the ONLY place within the chromepdf app that we import from Django.
     This way, the library should work even if Django is not installed (except with its settings ignored).
     """
     try:
@@ -24,6 +46,39 @@ def get_chromepdf_settings_dict():
         return {}
 
 
+def get_static_url():
+    """
+    Return Django's settings.STATIC_URL. Return None if not set or Django not installed.
+    """
+    try:
+        from django.conf import settings
+        return getattr(settings, 'STATIC_URL', None) or None
+    except Exception:
+        return None
+
+
+def get_http_response(content, content_type):
+    """
+    Return a Django HttpResponse of the content. Unlike the functions above, this requires Django, since it is only
+    used by Django views.
+    """
+    from django.http import HttpResponse
+    return HttpResponse(content, content_type=content_type)
+
+
+def find_static_file(path):
+    """
+    Return the absolute path of a static file found via Django's staticfiles finders, or None if not found.
+    `path` is relative to STATIC_URL, EG "fonts/myfont.woff2".
+    """
+    try:
+        from django.contrib.staticfiles import finders
+        return finders.find(path)
+    except Exception:
+        # Django not installed or not configured, or a finder could not be loaded.
+        return None
+
+
 def parse_settings(**overrides):
     """
     Return a dict of lowercased DEFAULT_SETTINGS based on combination of defaults, Django settings, and overrides.
@@ -42,18 +97,21 @@ def parse_settings(**overrides):
             output[k_lower] = chromepdf_settings.get(k, defaultval)  # get Django setting, OR default value
 
         # convert falsey values to more appropriate ones.
-        if k == 'CHROMEDRIVER_DOWNLOADS':  # boolean settings
+        if k in ('CHROMEDRIVER_DOWNLOADS', 'SHARE_CHROMEDRIVER', 'STANDBY_BROWSER', 'INLINE_STATIC_ASSETS',
+                 'BLOCK_NETWORK', 'JAVASCRIPT', 'COLLECT_PERFORMANCE_METRICS'):  # boolean settings
             if output[k_lower] is None:
                 output[k_lower] = False
-        elif k == 'CHROMEDRIVER_CHMOD':
+        elif k in ('CHROMEDRIVER_CHMOD', 'WAIT_TIMEOUT', 'TRACE_THRESHOLD', 'SLOW_RENDER_THRESHOLD',
+                   'SLOW_RENDER_SPOOL_LIMIT', 'DAEMON_TIMEOUT', 'RENDER_SERVER_CONNECT_TIMEOUT',
+                   'RENDER_SERVER_READ_TIMEOUT'):
             pass
-        elif k == 'CHROME_ARGS':
+        elif k in ('CHROME_ARGS', 'NETWORK_ALLOWLIST', 'RENDER_SERVERS'):  # iterable-of-strings settings
             if output[k_lower] is None:
                 output[k_lower] = []
             elif isinstance(output[k_lower], str):
                 # Prevent passing individual characters in str to Chrome as args. Silent, and unexpected behavior.
-                raise TypeError('The chrome_args/CHROME_ARGS parameter/setting must be an iterable of strings.')
-        else:  # path settings
+                raise TypeError(f'The {k_lower}/{k} parameter/setting must be an iterable of strings.')
+        else:  # path and other string settings
             if output[k_lower] == '':
                 output[k_lower] = None
 
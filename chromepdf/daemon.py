@@ -0,0 +1,239 @@
+"""
+A render daemon that owns a BrowserPool, and serves PDFs to every process on the host over a Unix socket.
+So that, EG, all the workers of a web server share one warm pool, rather than each starting its own browsers.
+To execute, run:
+> python -m chromepdf serve --socket=/run/chromepdf.sock --pool-size=4 [kwargs]
+Then render through it with ChromePdfMaker(daemon='/run/chromepdf.sock'), or the DAEMON setting.
+
+Each connection carries one request and one response. Each message is two 4-byte big-endian lengths, followed by a
+JSON header of the first length, and a body of the second length:
+request header: {"command": "generate_pdf", "pdf_kwargs": {...}} with the HTML as the body (UTF-8 encoded),
+    or {"command": "generate_pdf_url", "url": "...", "pdf_kwargs": {...}} with an empty body,
+    or {"command": "ping"} with an empty body.
+response header: {"status": "ok", "timings": {...}, ...} with the PDF as the body,
+    or {"status": "error", "error": "...", "error_type": "ChromePdfException" or "ValueError"} with an empty body.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import RenderResult
+from chromepdf.pool import BrowserPool
+
+
+# The lengths of a message's header and body.
+_PREFIX = struct.Struct('>II')
+
+# The size of the chunks that a PDF is copied in, when it is written to a file.
+CHUNK_SIZE = 1024 * 1024
+
+# The largest header, and request body (HTML), that the daemon accepts. Larger messages are rejected before they are
+# read, so that a bad client cannot make the daemon allocate an arbitrary amount of memory.
+MAX_HEADER_SIZE = 1024 * 1024
+MAX_REQUEST_BODY_SIZE = 256 * 1024 * 1024
+
+# Seconds that a client waits for each part of the daemon's response, including the wait for a free browser.
+DEFAULT_TIMEOUT = 300
+
+# The RenderResult attributes that are sent back to the client, besides the PDF itself.
+_RESULT_ATTRIBUTES = ('timings', 'resources', 'browser_resources', 'performance_metrics', 'trace_path')
+
+
+def send_message(sock, header, body=b''):
+    """Send a message, made of a JSON-serializable header dict and a body of bytes, over a socket."""
+
+    header_bytes = json.dumps(header).encode('utf8')
+    sock.sendall(_PREFIX.pack(len(header_bytes), len(body)) + header_bytes)
+    if body:
+        sock.sendall(body)
+
+
+def recv_message(rfile, output=None, max_body_size=None):
+    """
+    Receive a message from a binary file object (EG, from socket.makefile('rb')), and return its (header, body).
+    If an output file is given, the body is copied to it in chunks instead, and its size is returned as the body.
+    Raise ValueError if the header is larger than MAX_HEADER_SIZE, or the body is larger than max_body_size.
+    """
+
+    header_size, body_size = _PREFIX.unpack(_recv_exactly(rfile, _PREFIX.size))
+    if header_size > MAX_HEADER_SIZE:
+        raise ValueError(f'The message header of {header_size} bytes is larger than {MAX_HEADER_SIZE} bytes.')
+    if max_body_size is not None and body_size > max_body_size:
+        raise ValueError(f'The message body of {body_size} bytes is larger than {max_body_size} bytes.')
+    header = json.loads(_recv_exactly(rfile, header_size).decode('utf8'))
+    if output is None:
+        return header, _recv_exactly(rfile, body_size)
+
+    remaining = body_size
+    while remaining:
+        chunk = _recv_exactly(rfile, min(remaining, CHUNK_SIZE))
+        output.write(chunk)
+        remaining -= len(chunk)
+    return header, body_size
+
+
+def _recv_exactly(rfile, size):
+    data = rfile.read(size)
+    if len(data) != size:
+        raise ConnectionError('The connection was closed before the whole message was received.')
+    return data
+
+
+class DaemonClient:
+    """
+    Sends renders to a render daemon. Used by ChromePdfMaker when its DAEMON setting is set.
+    timeout: Seconds to wait to connect to the daemon, and for each part of its response, or None to wait indefinitely.
+    """
+
+    def __init__(self, socket_path, timeout=DEFAULT_TIMEOUT):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ChromePdfException('A ChromePDF daemon requires Unix sockets, which this platform does not support.')
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def generate_pdf(self, html, pdf_kwargs=None, result=None, output=None):
+        """
+        Generate a PDF from an html string, and return its bytes. If an output file is given, write the PDF to it
+        instead, and return its size.
+        """
+
+        header = {'command': 'generate_pdf', 'pdf_kwargs': pdf_kwargs}
+        return self._render(header, html.encode('utf8'), result, output)
+
+    def generate_pdf_url(self, url, pdf_kwargs=None, result=None):
+        """Generate a PDF from a url, and return its bytes."""
+
+        return self._render({'command': 'generate_pdf_url', 'url': url, 'pdf_kwargs': pdf_kwargs}, b'', result)
+
+    def ping(self):
+        """Raise a ChromePdfException if the daemon is not responding."""
+
+        self._request({'command': 'ping'})
+
+    def _render(self, header, body, result, output=None):
+        response, pdf = self._request(header, body, output)
+        if result is not None:
+            result.pdf_bytes = pdf if output is None else None
+            for name in _RESULT_ATTRIBUTES:
+                setattr(result, name, response.get(name))
+        return pdf
+
+    def _request(self, header, body=b'', output=None):
+        """Send a request to the daemon, and return its (response header, body). Raise its error, if it failed."""
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                send_message(sock, header, body)
+                with sock.makefile('rb') as rfile:
+                    response, response_body = recv_message(rfile, output)
+        except OSError as ex:
+            raise ChromePdfException(f'Could not render with the ChromePDF daemon at "{self.socket_path}": {ex}') from ex
+
+        if response['status'] != 'ok':
+            exception_class = ValueError if response.get('error_type') == 'ValueError' else ChromePdfException
+            raise exception_class(response['error'])
+        return response, response_body
+
+
+class _RenderRequestHandler(socketserver.StreamRequestHandler):
+    """Handles a single request to the render daemon."""
+
+    def handle(self):
+        try:
+            header, body = recv_message(self.rfile, max_body_size=MAX_REQUEST_BODY_SIZE)
+        except (OSError, ValueError, struct.error):
+            return  # the client went away, is not a ChromePDF client, or sent a message that is too large.
+
+        try:
+            response, pdf_bytes = _render(self.server.pool, header, body)
+        except Exception as ex:
+            error_type = 'ValueError' if isinstance(ex, (ValueError, TypeError)) else 'ChromePdfException'
+            response, pdf_bytes = {'status': 'error', 'error': str(ex), 'error_type': error_type}, b''
+
+        try:
+            send_message(self.request, response, pdf_bytes)
+        except OSError:
+            pass  # the client went away, EG, because it timed out.
+
+
+def _render(pool, header, body):
+    """Return the (response header, PDF bytes) of a request."""
+
+    command = header.get('command')
+    if command == 'ping':
+        return {'status': 'ok'}, b''
+
+    result = RenderResult()
+    if command == 'generate_pdf':
+        pdf_bytes = pool.generate_pdf(body.decode('utf8'), header.get('pdf_kwargs'), result)
+    elif command == 'generate_pdf_url':
+        pdf_bytes = pool.generate_pdf_url(header.get('url'), header.get('pdf_kwargs'), result)
+    else:
+        raise ValueError(f'Unknown command: {command}')
+
+    response = {'status': 'ok'}
+    response.update((name, getattr(result, name)) for name in _RESULT_ATTRIBUTES)
+    return response, pdf_bytes
+
+
+if hasattr(socket, 'AF_UNIX'):  # not on Windows, where importing chromepdf must still work.
+
+    class RenderDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """A server that renders each request with a browser from a BrowserPool, in its own thread."""
+
+        daemon_threads = True
+
+        def __init__(self, socket_path, pool):
+            self.pool = pool
+            _remove_stale_socket(socket_path)
+            super().__init__(socket_path, _RenderRequestHandler)
+
+        def server_close(self):
+            super().server_close()
+            try:
+                os.remove(self.server_address)
+            except FileNotFoundError:
+                pass
+
+
+def _remove_stale_socket(socket_path):
+    """
+    Remove a socket file left behind by a daemon that did not exit cleanly.
+    Raise OSError if another daemon is listening on it, or if the path is some other kind of file.
+    """
+
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f'Cannot listen at "{socket_path}": it exists, and is not a socket.')
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)  # nothing is listening.
+            return
+    raise OSError(f'Cannot listen at "{socket_path}": another daemon is already listening there.')
+
+
+def serve(socket_path, maker, pool_size=1):
+    """Render PDFs for clients of the Unix socket, with a BrowserPool of the ChromePdfMaker's browsers, forever."""
+
+    try:
+        with BrowserPool(maker, pool_size) as pool:
+            server = RenderDaemonServer(socket_path, pool)
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+    finally:
+        maker.close()  # end the shared chromedriver, if SHARE_CHROMEDRIVER is set
@@ -0,0 +1,355 @@
+"""
+A fake chromedriver, for testing and load-testing ChromePDF on machines without Chrome.
+
+It implements the WebDriver endpoints that ChromePDF uses (creating and deleting a session, navigating, executing
+scripts, reading logs, and sending DevTools commands), and responds to Page.printToPDF with a canned PDF.
+Latency and failures may be injected into any endpoint or DevTools command.
+
+To use it in-process:
+    with FakeChromedriver(latency=0.05) as fake:
+        ...  # send requests to fake.url
+To run it as a chromedriver executable, write a launcher script and pass it as the chromedriver_path:
+    chromedriver_path = write_fake_chromedriver('/tmp/fakedriver', failure_rate=0.1)
+Or run it directly:
+> python -m chromepdf.fakedriver --port=9515 [--latency=0.05] [--failure-rate=0.1] [--fail=Page.printToPDF]
+"""
+
+import base64
+import json
+import os
+import platform
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+FAKE_CHROME_VERSION = '120.0.0.0'
+
+
+def _make_pdf(text):
+    """Return the bytes of a minimal, valid, one-page PDF file containing the text."""
+
+    stream = f'BT /F1 24 Tf 72 720 Td ({text}) Tj ET'.encode('latin-1')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    output = b'%PDF-1.4\n'
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (i, obj)
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+    return output
+
+
+FAKE_PDF_BYTES = _make_pdf('Fake PDF')
+
+
+class _IPv6HTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_INET6
+
+
+class FakeChromedriver:
+    """
+    A chromedriver-like HTTP server, running on a background thread.
+
+    port: The port to listen on. Defaults to any free port.
+    latency: Seconds to wait before responding to every request.
+    command_latency: A dict of extra seconds to wait for specific requests. See below for the names used as keys.
+    failure_rate: The probability (0 to 1) that any request will fail with a 500 error.
+    fail: Names of requests that will always fail with a 500 error.
+    pdf_bytes: The PDF returned by Page.printToPDF.
+    seed: A seed for the random number generator used for failure_rate, for repeatable failures.
+    host: The address to listen on. May be an IPv4 or IPv6 address.
+
+    Requests are named "session", "url", "execute", "log", "new_window", "switch_window", "close_window", or "quit",
+    except for DevTools commands, which are named after the command itself, EG "Page.printToPDF".
+    """
+
+    def __init__(self, port=0, latency=0, command_latency=None, failure_rate=0, fail=(), pdf_bytes=FAKE_PDF_BYTES,
+                 seed=None, host='127.0.0.1'):
+        self.latency = latency
+        self.command_latency = dict(command_latency or {})
+        self.failure_rate = failure_rate
+        self.fail = set(fail)
+        self.pdf_bytes = pdf_bytes
+        self._random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self.sessions = set()
+        self.streams = {}  # handle => [bytes, position], for PDFs printed with transferMode=ReturnAsStream
+        self.requests = []  # names of all requests received, in order
+        self.new_sessions = []  # the JSON body of each request to create a session, in order
+        self.windows = set()  # handles of the tabs opened by sessions, and not yet closed
+        self._current_windows = {}  # session id => handle of the tab that the session switched to
+
+        server_class = _IPv6HTTPServer if ':' in host else ThreadingHTTPServer
+        self.server = server_class((host, port), _FakeChromedriverHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.port = self.server.server_address[1]
+        self._thread = None
+
+    @property
+    def url(self):
+        host = self.server.server_address[0]
+        return f'http://[{host}]:{self.port}' if ':' in host else f'http://{host}:{self.port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _begin_request(self, name):
+        """Record the request, wait for any injected latency, and return True if it should fail."""
+
+        with self._lock:
+            self.requests.append(name)
+            should_fail = name in self.fail or (self.failure_rate and self._random.random() < self.failure_rate)
+        delay = self.latency + self.command_latency.get(name, 0)
+        if delay:
+            time.sleep(delay)
+        return should_fail
+
+    def _devtool_result(self, cmd, params):
+        "Return the result of a DevTools command."
+
+        if cmd == 'Page.printToPDF':
+            if params.get('transferMode') == 'ReturnAsStream':
+                handle = uuid.uuid4().hex
+                with self._lock:
+                    self.streams[handle] = [self.pdf_bytes, 0]
+                return {'data': '', 'stream': handle}
+            return {'data': base64.b64encode(self.pdf_bytes).decode('ascii')}
+        elif cmd == 'IO.read':
+            with self._lock:
+                stream = self.streams[params['handle']]
+                data = stream[0][stream[1]:stream[1] + params.get('size', 1024 * 1024)]
+                stream[1] += len(data)
+                eof = stream[1] >= len(stream[0])
+            return {'base64Encoded': True, 'data': base64.b64encode(data).decode('ascii'), 'eof': eof}
+        elif cmd == 'IO.close':
+            with self._lock:
+                self.streams.pop(params['handle'], None)
+        elif cmd == 'Runtime.evaluate':
+            # Expressions are not evaluated. Report that pages have no origin, and that WAIT_FOR promises succeed.
+            value = 'null' if params.get('expression') == 'location.origin' else True
+            return {'result': {'type': type(value).__name__, 'value': value}}
+        elif cmd == 'Page.getFrameTree':
+            return {'frameTree': {'frame': {'id': 'FAKEFRAME'}}}
+        elif cmd == 'Performance.getMetrics':
+            return {'metrics': [{'name': 'LayoutCount', 'value': 1}, {'name': 'RecalcStyleCount', 'value': 1}]}
+        return {}
+
+    def _log_entries(self, log_type):
+        "Return the entries of a log. The performance log contains a trace of a single layout."
+
+        if log_type != 'performance':
+            return []
+        messages = [
+            {'method': 'Tracing.dataCollected', 'params': {
+                'cat': 'devtools.timeline', 'name': 'Layout', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': 1000, 'dur': 500}},
+            {'method': 'Tracing.bufferUsage', 'params': {'percentFull': 0.01}},
+        ]
+        timestamp = int(time.time() * 1000)
+        return [{'level': 'INFO', 'timestamp': timestamp, 'message': json.dumps({'message': m, 'webview': ''})}
+                for m in messages]
+
+
+class _FakeChromedriverHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # otherwise each keep-alive response may be delayed by 40ms
+
+    _SESSION_PATH = re.compile(r'^/session/(?P<session_id>[^/]+)(?P<suffix>/.*)?$')
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._respond(200, {'ready': True, 'message': 'ChromePDF fake chromedriver ready'})
+        elif self.path == '/shutdown':
+            self._respond(200, None)
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self._respond_error(404, 'unknown command', f'Unknown path: {self.path}')
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length).decode('utf8') or '{}') if length else {}
+
+        if self.path == '/session':
+            if fake._begin_request('session'):
+                return self._respond_injected_failure()
+            session_id = uuid.uuid4().hex
+            with fake._lock:
+                fake.sessions.add(session_id)
+                fake.new_sessions.append(body)
+            capabilities = {'browserName': 'chrome', 'browserVersion': FAKE_CHROME_VERSION}
+            # The legacy protocol used by NoSeleniumWebdriverMaker reads "sessionId" from the top level of the response.
+            return self._respond(200, {'sessionId': session_id, 'capabilities': capabilities}, sessionId=session_id)
+
+        match = self._match_session()
+        if match is None:
+            return
+        suffix = match.group('suffix')
+        if suffix == '/url':
+            name, value = 'url', None
+        elif suffix in ('/execute/sync', '/execute/async'):
+            name, value = 'execute', None
+        elif suffix == '/se/log':
+            name, value = 'log', fake._log_entries(body.get('type'))
+        elif suffix == '/chromium/send_command_and_get_result':
+            name = body.get('cmd', '')
+            value = fake._devtool_result(name, body.get('params') or {})
+        elif suffix == '/window/new':
+            name, value = 'new_window', {'handle': uuid.uuid4().hex, 'type': 'tab'}
+        elif suffix == '/window':
+            name, value = 'switch_window', None
+        else:
+            return self._respond_error(404, 'unknown command', f'Unknown path: {self.path}')
+
+        if fake._begin_request(name):
+            return self._respond_injected_failure()
+        if name == 'new_window':
+            with fake._lock:
+                fake.windows.add(value['handle'])
+        elif name == 'switch_window':
+            with fake._lock:
+                fake._current_windows[match.group('session_id')] = body.get('handle') or body.get('name')
+        self._respond(200, value)
+
+    def do_DELETE(self):
+        fake = self.server.fake
+        match = self._match_session()
+        if match is None:
+            return
+        if match.group('suffix') == '/window':
+            if fake._begin_request('close_window'):
+                return self._respond_injected_failure()
+            with fake._lock:
+                fake.windows.discard(fake._current_windows.pop(match.group('session_id'), None))
+            return self._respond(200, [])
+        if match.group('suffix'):
+            return self._respond_error(404, 'unknown command', f'Unknown path: {self.path}')
+        if fake._begin_request('quit'):
+            return self._respond_injected_failure()
+        with fake._lock:
+            fake.sessions.discard(match.group('session_id'))
+        self._respond(200, None)
+
+    def _match_session(self):
+        """Return the path's match if it refers to an existing session. Otherwise respond with an error."""
+
+        match = self._SESSION_PATH.match(self.path)
+        if match is None:
+            self._respond_error(404, 'unknown command', f'Unknown path: {self.path}')
+            return None
+        if match.group('session_id') not in self.server.fake.sessions:
+            self._respond_error(404, 'invalid session id', 'invalid session id')
+            return None
+        return match
+
+    def _respond_injected_failure(self):
+        self._respond_error(500, 'unknown error', 'chromepdf.fakedriver: injected failure')
+
+    def _respond_error(self, status, error, message):
+        self._respond(status, {'error': error, 'message': message, 'stacktrace': ''})
+
+    def _respond(self, status, value, **extra):
+        data = json.dumps({'value': value, **extra}).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass  # a real chromedriver does not log each request either
+
+
+def write_fake_chromedriver(path, latency=0, failure_rate=0, fail=(), seed=None):
+    """
+    Write an executable script to the path, which runs a fake chromedriver process with the given options.
+    Pass its path as the chromedriver_path to have ChromePDF use the fake instead of a real chromedriver.
+    Return the path of the script. On Windows, ".cmd" is appended to the path.
+    """
+
+    args = [f'--latency={latency}', f'--failure-rate={failure_rate}']
+    args.extend(f'--fail={name}' for name in fail)
+    if seed is not None:
+        args.append(f'--seed={seed}')
+
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if platform.system() == 'Windows':
+        path = f'{path}.cmd'
+        contents = (f'@set PYTHONPATH={package_parent};%PYTHONPATH%\r\n'
+                    f'@"{sys.executable}" -m chromepdf.fakedriver {" ".join(args)} %*\r\n')
+    else:
+        contents = (f'#!/bin/sh\nPYTHONPATH="{package_parent}${{PYTHONPATH:+:$PYTHONPATH}}" '
+                    f'exec "{sys.executable}" -m chromepdf.fakedriver {" ".join(args)} "$@"\n')
+
+    with open(path, 'w', encoding='utf8') as f:
+        f.write(contents)
+    os.chmod(path, 0o755)
+    return path
+
+
+def main(args=None):
+    """Run a fake chromedriver until it is killed, or receives a /shutdown request."""
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m chromepdf.fakedriver', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--port', type=int, default=9515)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds to wait before every response.')
+    parser.add_argument('--failure-rate', type=float, default=0, help='Probability (0 to 1) that a request fails.')
+    parser.add_argument('--fail', action='append', default=[], help='Name of a request that always fails.')
+    parser.add_argument('--seed', type=int, help='Seed for the random failures.')
+    # Ignore anything else a real chromedriver is passed, such as a Chrome path, or Selenium's logging flags.
+    namespace, _unknown = parser.parse_known_args(args)
+
+    # Like a real chromedriver, listen on whichever of the IPv4 and IPv6 loopback addresses is available.
+    for host in ('127.0.0.1', '::1'):
+        try:
+            fake = FakeChromedriver(port=namespace.port, latency=namespace.latency,
+                                    failure_rate=namespace.failure_rate, fail=namespace.fail, seed=namespace.seed,
+                                    host=host)
+            break
+        except OSError as ex:
+            error = ex
+    else:
+        raise error
+    try:
+        fake.server.serve_forever()
+    finally:
+        fake.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""
+Constants of the HTTP render server's API, shared by the server (chromepdf.httpserver) and its client
+(chromepdf.sharding). They live apart from the server, so that importing the client does not import http.server.
+"""
+
+# The name of the request header containing a JSON dict of pdf_kwargs.
+PDF_KWARGS_HEADER = 'X-ChromePDF-Kwargs'
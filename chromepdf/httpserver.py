@@ -0,0 +1,210 @@
+"""
+An HTTP render server that owns a BrowserPool, so that PDFs can be rendered by a dedicated tier of servers, and the
+web servers that request them need not run Chrome at all.
+To execute, run:
+> python -m chromepdf http --host=0.0.0.0 --port=8181 --pool-size=4 [kwargs]
+
+Endpoints:
+POST /pdf: Render the request body (HTML, encoded as UTF-8) as a PDF. pdf_kwargs may be passed as a JSON dict in the
+    X-ChromePDF-Kwargs header. The PDF is streamed back as Chrome produces it, with chunked transfer encoding.
+    Invalid requests return a 400, and failed renders a 500, with a JSON body of {"error": "..."}.
+    If all the browsers are busy, and `queue_size` requests are already waiting for one, a 503 is returned.
+GET /health: A JSON body describing the server, EG: {"status": "ok", "pool_size": 4, "active": 1, ...}
+    If the pool cannot provide or launch a working browser, a 503 is returned, with a "status" of "unhealthy" and an
+    "error", so that load balancers and chromepdf.sharding send renders to other servers.
+GET /metrics: The metrics of chromepdf.metrics, in the Prometheus text format.
+
+Connections are kept alive between requests (HTTP/1.1), until they are idle for KEEP_ALIVE_TIMEOUT seconds.
+"""
+
+import json
+import logging
+import socketserver
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+from chromepdf import __version__, metrics
+from chromepdf.httpapi import PDF_KWARGS_HEADER
+from chromepdf.pdfconf import clean_pdf_kwargs
+from chromepdf.pool import BrowserPool
+
+
+logger = logging.getLogger('chromepdf.http')
+
+# Seconds that an idle keep-alive connection is held open.
+KEEP_ALIVE_TIMEOUT = 60
+
+# The number of renders that may wait for a browser, beyond those being rendered, before requests are rejected.
+DEFAULT_QUEUE_SIZE = 16
+
+
+class _ChunkedWriter:
+    """
+    A binary file object that sends whatever is written to it as the chunks of an HTTP response body.
+    The response's status and headers are only sent before the first chunk, so that a render that fails before
+    producing any of the PDF can still respond with an error.
+    """
+
+    def __init__(self, handler):
+        self._handler = handler
+        self.started = False
+
+    def _start(self):
+        if not self.started:
+            self.started = True
+            self._handler.send_response(200)
+            self._handler.send_header('Content-Type', 'application/pdf')
+            self._handler.send_header('Transfer-Encoding', 'chunked')
+            self._handler.end_headers()
+
+    def write(self, data):
+        if data:
+            self._start()
+            self._handler.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        return len(data)
+
+    def close(self):
+        """Send the final, empty chunk, that ends the response."""
+
+        self._start()
+        self._handler.wfile.write(b'0\r\n\r\n')
+
+
+class _RenderRequestHandler(BaseHTTPRequestHandler):
+    """Handles the requests of one connection to the render server."""
+
+    protocol_version = 'HTTP/1.1'  # for keep-alive connections
+    server_version = f'ChromePDF/{__version__}'
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            health = self.server.get_health()
+            self._send_json(200 if health['status'] == 'ok' else 503, health)
+        elif path == '/metrics':
+            self._send(200, metrics.CONTENT_TYPE, metrics.REGISTRY.exposition().encode('utf8'))
+        else:
+            self._send_json(404, {'error': f'Not found: {path}'})
+
+    def do_POST(self):
+        if self.headers.get('Content-Length') is None:
+            self.close_connection = True  # the body cannot be skipped, so the connection cannot be reused.
+            return self._send_json(411, {'error': 'A Content-Length header is required.'})
+        body = self.rfile.read(int(self.headers['Content-Length']))
+
+        path = urlsplit(self.path).path
+        if path != '/pdf':
+            return self._send_json(404, {'error': f'Not found: {path}'})
+
+        # validate the request before waiting for a browser.
+        try:
+            html = body.decode('utf8')
+            pdf_kwargs = json.loads(self.headers.get(PDF_KWARGS_HEADER) or '{}')
+            if not isinstance(pdf_kwargs, dict):
+                raise ValueError(f'The {PDF_KWARGS_HEADER} header must be a JSON dict.')
+            clean_pdf_kwargs(**pdf_kwargs)
+        except (ValueError, TypeError) as ex:
+            return self._send_json(400, {'error': str(ex)})
+
+        with self.server.track_request() as accepted:
+            if not accepted:
+                return self._send_json(503, {'error': 'All browsers are busy, and too many requests are waiting.'},
+                                       headers={'Retry-After': '1'})
+
+            writer = _ChunkedWriter(self)
+            try:
+                self.server.pool.write_pdf(html, writer, pdf_kwargs)
+            except Exception as ex:
+                logger.warning('Render failed: %s', ex)
+                if writer.started:
+                    # part of the PDF was sent. Close the connection so the client sees an incomplete response.
+                    self.close_connection = True
+                    return
+                return self._send_json(500, {'error': str(ex)})
+            writer.close()
+
+    def _send_json(self, status, data, headers=None):
+        self._send(status, 'application/json', json.dumps(data).encode('utf8'), headers)
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.info('%s - %s', self.address_string(), format % args)
+
+
+class RenderHTTPServer(socketserver.ThreadingMixIn, HTTPServer):  # ThreadingHTTPServer requires Python 3.7
+    """
+    A server that renders each request with a browser from a BrowserPool, in its own thread.
+    At most pool.size + queue_size renders are accepted at once. Connections beyond those that can be accepted wait
+    in the socket's listen queue, which is also queue_size long.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address, pool, queue_size=DEFAULT_QUEUE_SIZE):
+        self.pool = pool
+        self.queue_size = queue_size
+        self.request_queue_size = queue_size  # the socket's listen() backlog
+        self.active = 0  # renders that are being rendered or waiting for a browser
+        self._active_lock = threading.Lock()
+        super().__init__(server_address, _RenderRequestHandler)
+
+    @contextmanager
+    def track_request(self):
+        """Context manager that counts a render as active, and returns False if there are already too many."""
+
+        with self._active_lock:
+            accepted = self.active < self.pool.size + self.queue_size
+            if accepted:
+                self.active += 1
+        try:
+            yield accepted
+        finally:
+            if accepted:
+                with self._active_lock:
+                    self.active -= 1
+
+    def get_health(self):
+        """
+        Return a JSON-serializable dict describing the server. Its "status" is "unhealthy", with an "error", if the pool
+        cannot provide or launch a working browser.
+        """
+
+        health = {
+            'status': 'ok',
+            'version': __version__,
+            'pool_size': self.pool.size,
+            'queue_size': self.queue_size,
+            'active': self.active,
+        }
+        try:
+            self.pool.check_health()
+        except Exception as ex:
+            logger.warning('Health check failed: %s', ex)
+            health['status'] = 'unhealthy'
+            health['error'] = str(ex)
+        return health
+
+
+def serve_http(host, port, maker, pool_size=1, queue_size=DEFAULT_QUEUE_SIZE):
+    """Render PDFs for HTTP clients, with a BrowserPool of the ChromePdfMaker's browsers, forever."""
+
+    try:
+        with BrowserPool(maker, pool_size) as pool:
+            server = RenderHTTPServer((host, port), pool, queue_size)
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+    finally:
+        maker.close()  # end the shared chromedriver, if SHARE_CHROMEDRIVER is set
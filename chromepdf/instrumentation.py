@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from chromepdf.tracing import get_tracer
+
+
+# Callables that are called as hook(phase_name, seconds) each time a phase of work completes.
+_hooks = []
+_hooks_lock = threading.Lock()
+
+# The PhaseTimer that is recording the current thread's render, if any.
+_local = threading.local()
+
+
+def register_hook(hook):
+    """
+    Register a callable to be called as hook(phase_name, seconds) whenever a phase of PDF generation completes.
+    Phases include "chrome_version", "chromedriver_download", "chromedriver_spawn", "browser_launch", "navigate",
+    "load_content", "wait", "print", "decode", "quit", "standby_wait" (see chromepdf.standby), and "render" (the
+    entirety of a render).
+    Hooks are called from whichever thread did the work, so they must be thread-safe.
+    """
+
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def unregister_hook(hook):
+    """Remove a callable previously passed to register_hook()."""
+
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+class PhaseTimer:
+    """Records the total monotonic time spent in each phase of work, while activated on the current thread."""
+
+    def __init__(self):
+        self.timings = {}  # phase name => seconds
+
+    @contextmanager
+    def activate(self):
+        """Record all phases that run on the current thread to this timer, for the duration of the context."""
+
+        previous = getattr(_local, 'timer', None)
+        _local.timer = self
+        try:
+            yield self
+        finally:
+            _local.timer = previous
+
+    def record(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0) + seconds
+
+
+@contextmanager
+def phase(name):
+    """
+    Context manager that times a phase of work, within a "chromepdf.<name>" tracing span.
+    The time is recorded to the current thread's active PhaseTimer (if any), and passed to all registered hooks.
+    """
+
+    start = time.monotonic()
+    try:
+        with get_tracer().start_span(f'chromepdf.{name}'):
+            yield
+    finally:
+        seconds = time.monotonic() - start
+        timer = getattr(_local, 'timer', None)
+        if timer is not None:
+            timer.record(name, seconds)
+        with _hooks_lock:
+            hooks = list(_hooks)
+        for hook in hooks:
+            hook(name, seconds)
+
+
+class RenderResult:
+    """
+    An optional object that can be passed to ChromePdfMaker.generate_pdf(..., result=RenderResult())
+    to receive details about the render, in addition to the PDF bytes that are returned.
+    """
+
+    def __init__(self):
+        self.pdf_bytes = None
+        self.timings = {}  # phase name => seconds
+        # CPU and memory used by the chromedriver and Chrome processes. See chromepdf.resources. None if unsupported.
+        self.resources = None  # during the render
+        self.browser_resources = None  # over the lifetime of the browser, including its launch
+        # Chrome's Performance.getMetrics values for the page (EG, LayoutCount), if COLLECT_PERFORMANCE_METRICS is on.
+        self.performance_metrics = None
+        # The file that Chrome's trace of the render was written to, if TRACE_DIR is set. See chromepdf.chrometrace.
+        self.trace_path = None
@@ -1,10 +1,22 @@
 import os
+import threading
+import weakref
+from contextlib import contextmanager
 from urllib.parse import urlparse
 
+from chromepdf import metrics
+from chromepdf.assets import inline_static_assets
 from chromepdf.conf import parse_settings
+from chromepdf.daemon import DaemonClient
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import PhaseTimer, phase
+from chromepdf.sharding import get_sharded_client
+from chromepdf.slowrenders import log_slow_render
+from chromepdf.standby import StandbyBrowser, get_standby_browser
+from chromepdf.tracing import get_tracer
 from chromepdf.webdrivermakers import (
-    NoSeleniumWebdriverMaker, SeleniumWebdriverMaker, get_webdriver_maker, get_webdriver_maker_class,
-    is_selenium_installed)
+    ChromedriverService, NoSeleniumWebdriverMaker, SeleniumWebdriverMaker, get_webdriver_maker,
+    get_webdriver_maker_class, is_selenium_installed)
 from chromepdf.webdrivers import (
     _get_chromesession_temp_dir, download_chromedriver_version, find_chrome, get_chrome_version)
 
@@ -19,6 +31,28 @@ class ChromePdfMaker:
         self._chrome_path = settings['chrome_path']
         self._chromedriver_path = settings['chromedriver_path']
         self._chromedriver_downloads = settings['chromedriver_downloads']
+        # an already-running chromedriver and/or Chrome to use, rather than starting them for each session.
+        self._chromedriver_url = settings['chromedriver_url']
+        self._chrome_debugger_address = settings['chrome_debugger_address']
+        if self._chrome_debugger_address is not None:
+            # A running Chrome's command-line arguments cannot be changed, so these settings could not take effect.
+            ignored = [name for name in ('chrome_args', 'block_network', 'user_data_dir', 'trace_dir') if settings[name]]
+            if ignored:
+                raise ValueError(f'chrome_debugger_address cannot be combined with {", ".join(ignored)}, since they '
+                                 'must be given when Chrome is started.')
+        self._inline_static_assets = settings['inline_static_assets']
+        self._slow_render_threshold = settings['slow_render_threshold']
+        self._slow_render_spool_dir = settings['slow_render_spool_dir']
+        self._slow_render_spool_limit = settings['slow_render_spool_limit']
+        # If a render daemon's socket or render servers are given, every render is sent to their browsers, rather
+        # than started here.
+        self._render_client = None
+        if settings['daemon'] is not None:
+            self._render_client = DaemonClient(settings['daemon'], settings['daemon_timeout'])
+        elif settings['render_servers']:
+            self._render_client = get_sharded_client(
+                settings['render_servers'], settings['render_server_connect_timeout'],
+                settings['render_server_read_timeout'])
         self._chromesession_temp_dir = _get_chromesession_temp_dir()
 
         os.makedirs(self._chromesession_temp_dir, exist_ok=True)
@@ -40,25 +74,171 @@ class ChromePdfMaker:
         self._clazz = get_webdriver_maker_class(self._use_selenium)
 
         # download chromedriver if we have chrome, and downloads are enabled
-        if self._chrome_path is not None and self._chromedriver_path is None and self._chromedriver_downloads:
-            chrome_version = get_chrome_version(self._chrome_path, as_tuple=False)
-            self._chromedriver_path = download_chromedriver_version(chrome_version)
+        init_timer = PhaseTimer()
+        with init_timer.activate(), get_tracer().start_span('chromepdf.maker_init'):
+            if (self._render_client is None and self._chromedriver_url is None and self._chrome_path is not None
+                    and self._chromedriver_path is None and self._chromedriver_downloads):
+                with phase('chrome_version'):
+                    chrome_version = get_chrome_version(self._chrome_path, as_tuple=False)
+                self._chromedriver_path = download_chromedriver_version(chrome_version)
+        self.init_timings = init_timer.timings  # phase name => seconds, for the work done by this constructor.
+
+        # With SHARE_CHROMEDRIVER, every session is created on one chromedriver, which runs until close() is called or
+        # the maker is garbage collected. Otherwise, each session starts and ends its own chromedriver.
+        self._chromedriver_service = None
+        if (settings['share_chromedriver'] and self._render_client is None and self._chromedriver_url is None
+                and self._chromedriver_path is not None):
+            self._chromedriver_service = ChromedriverService(self._chromedriver_path, self._chrome_path)
 
         self._webdriver_kwargs = {
             'chrome_args': settings['chrome_args'],
+            'block_network': settings['block_network'],
+            'network_allowlist': settings['network_allowlist'],
+            'wait_for': settings['wait_for'],
+            'wait_timeout': settings['wait_timeout'],
+            'javascript': settings['javascript'],
+            'user_data_dir': settings['user_data_dir'],
+            'collect_performance_metrics': settings['collect_performance_metrics'],
+            'trace_dir': settings['trace_dir'],
+            'trace_threshold': settings['trace_threshold'],
             'chrome_path': self._chrome_path,
             'chromedriver_path': self._chromedriver_path,
+            'chromedriver_url': self._chromedriver_url,
+            'chrome_debugger_address': self._chrome_debugger_address,
             '_chromesession_temp_dir': self._chromesession_temp_dir,
+            '_chromedriver_service': self._chromedriver_service,
         }
 
-    def generate_pdf(self, html, pdf_kwargs=None):
-        """Generate a PDF file from an html string and return the PDF as a bytes object."""
+        # With STANDBY_BROWSER, a browser is launched in the background for the next render to take. See
+        # chromepdf.standby. It is shared with other makers of the same settings, unless this maker has its own
+        # chromedriver to start it with.
+        self._standby_browser = None
+        self._own_standby_browser = None
+        if settings['standby_browser'] and self._render_client is None:
+            if self._chromedriver_service is None:
+                self._standby_browser = get_standby_browser(self._clazz, self._webdriver_kwargs)
+            else:
+                self._standby_browser = self._own_standby_browser = StandbyBrowser(self._clazz, self._webdriver_kwargs)
+
+        if self._chromedriver_service is not None:
+            weakref.finalize(self, _close_chromedriver_service, self._chromedriver_service, self._own_standby_browser)
+
+    def close(self):
+        """
+        End the chromedriver shared by this maker's sessions, if SHARE_CHROMEDRIVER is set, along with its standby
+        browser. Any sessions still open on it will fail. If the maker is used again, a new chromedriver is started.
+        """
+
+        if self._chromedriver_service is not None:
+            _close_chromedriver_service(self._chromedriver_service, self._own_standby_browser)
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager that starts a chromedriver and Chrome, and returns a ChromePdfSession that generates PDFs with
+        them. They are reused by every PDF the session generates, and closed when the context exits. Usage:
+
+        with maker.session() as session:
+            for html in documents:
+                pdf_bytes = session.generate_pdf(html)
+
+        If a DAEMON or RENDER_SERVERS are set, no browser is started: the session sends its renders to them.
+        """
+
+        if self._render_client is not None:
+            yield ChromePdfSession(self, None)
+            return
+
+        with self._use_webdriver_maker() as wrapper:
+            yield ChromePdfSession(self, wrapper)
+
+    @contextmanager
+    def _use_webdriver_maker(self, wrapper=None):
+        """
+        Context manager that returns the webdriver maker of a session, or a new one if it is None.
+        A new one is quit when the context exits.
+        """
+
+        if wrapper is None and self._standby_browser is not None:
+            with self._standby_browser.webdriver_maker() as wrapper:
+                yield wrapper
+            return
+
+        if wrapper is None:
+            with get_webdriver_maker(self._clazz, **self._webdriver_kwargs) as wrapper:
+                yield wrapper
+            return
+
+        try:
+            yield wrapper
+        except ChromePdfException:
+            raise
+        except Exception as ex:
+            # raise the same exception type as get_webdriver_maker() does.
+            raise ChromePdfException(str(ex)) from ex
+
+    def generate_pdf(self, html, pdf_kwargs=None, result=None):
+        """
+        Generate a PDF file from an html string and return the PDF as a bytes object.
+        If a RenderResult is passed as the result, it will be filled with details about the render.
+        """
+
+        return self._generate_pdf(html, pdf_kwargs, result)
+
+    def write_pdf(self, html, output, pdf_kwargs=None, result=None):
+        """
+        Generate a PDF file from an html string, and write it to output (a binary file object) as Chrome streams it.
+        Return the number of bytes written. Unlike generate_pdf(), the PDF is never held in memory all at once.
+        If a RenderResult is passed as the result, it will be filled with details about the render, except pdf_bytes.
+        """
+
+        return self._generate_pdf(html, pdf_kwargs, result, output=output)
+
+    def _generate_pdf(self, html, pdf_kwargs=None, result=None, wrapper=None, output=None):
+        """
+        Generate a PDF file from an html string, with a session's webdriver maker, or a new one if it is None.
+        Return its bytes, or if an output file is given, write it there and return the number of bytes written.
+        """
+
+        if self._render_client is not None:
+            # static files are found via this process's Django settings, so they are inlined before being sent.
+            content = inline_static_assets(html) if self._inline_static_assets else html
+            return self._render_client.generate_pdf(content, pdf_kwargs, result, output)
+
+        timer = PhaseTimer()
+        try:
+            with timer.activate(), phase('render'), _track_render(len(html.encode('utf8'))):
+                content = html
+                if self._inline_static_assets:
+                    with phase('inline_assets'):
+                        content = inline_static_assets(content)
+
+                with self._use_webdriver_maker(wrapper) as wrapper:
+                    if output is None:
+                        pdf_bytes = wrapper.generate_pdf(content, pdf_kwargs)
+                        pdf_size = len(pdf_bytes)
+                    else:
+                        pdf_bytes = None
+                        pdf_size = wrapper.generate_pdf(content, pdf_kwargs, output)
+        except Exception as ex:
+            self._log_if_slow(html, pdf_kwargs, timer, error=ex)
+            raise
+        self._log_if_slow(html, pdf_kwargs, timer, pdf_bytes=pdf_bytes, pdf_size=pdf_size)
+
+        metrics.BYTES_OUT.inc(pdf_size)
+        _fill_render_result(result, pdf_bytes, timer, wrapper)
+        return pdf_bytes if output is None else pdf_size
+
+    def generate_pdf_url(self, url, pdf_kwargs=None, result=None):
+        """
+        Generate a PDF file from a url (such as a file:/// url) and return the PDF as a bytes object.
+        If a RenderResult is passed as the result, it will be filled with details about the render.
+        """
 
-        with get_webdriver_maker(self._clazz, **self._webdriver_kwargs) as wrapper:
-            return wrapper.generate_pdf(html, pdf_kwargs)
+        return self._generate_pdf_url(url, pdf_kwargs, result)
 
-    def generate_pdf_url(self, url, pdf_kwargs=None):
-        """Generate a PDF file from a url (such as a file:/// url) and return the PDF as a bytes object."""
+    def _generate_pdf_url(self, url, pdf_kwargs=None, result=None, wrapper=None):
+        """Generate a PDF file from a url, with a session's webdriver maker, or a new one if it is None."""
 
         # throw an early exception if we receive a string that Chrome would return a 400 error (Bad Request) if given.
         parseresult = urlparse(url)
@@ -67,5 +247,96 @@ class ChromePdfMaker:
                              'You can use: import pathlib; pathlib.Path(absolute_path).as_uri() to '
                              'convert an absolute path into such a file URI.')
 
-        with get_webdriver_maker(self._clazz, **self._webdriver_kwargs) as wrapper:
-            return wrapper.generate_pdf_url(url, pdf_kwargs)
+        if self._render_client is not None:
+            return self._render_client.generate_pdf_url(url, pdf_kwargs, result)
+
+        timer = PhaseTimer()
+        with timer.activate(), phase('render'), _track_render(0):
+            with self._use_webdriver_maker(wrapper) as wrapper:
+                pdf_bytes = wrapper.generate_pdf_url(url, pdf_kwargs)
+
+        metrics.BYTES_OUT.inc(len(pdf_bytes))
+        _fill_render_result(result, pdf_bytes, timer, wrapper)
+        return pdf_bytes
+
+    def _log_if_slow(self, html, pdf_kwargs, timer, pdf_bytes=None, error=None, pdf_size=None):
+        """Log the render to the slow render log if it took at least SLOW_RENDER_THRESHOLD seconds."""
+
+        if self._slow_render_threshold is None or timer.timings['render'] < self._slow_render_threshold:
+            return
+        metrics.SLOW_RENDERS.inc()
+        log_slow_render(html, pdf_kwargs, dict(timer.timings), pdf_bytes, error, self._slow_render_spool_dir,
+                        self._slow_render_spool_limit, pdf_size)
+
+
+def _close_chromedriver_service(chromedriver_service, standby_browser=None):
+    """End a maker's shared chromedriver, after quitting the standby browser that it started, if any."""
+
+    if standby_browser is not None:
+        standby_browser.close()
+    chromedriver_service.stop()
+
+
+class ChromePdfSession:
+    """
+    Generates PDF files with a chromedriver and Chrome that stay open between renders. Returned by
+    ChromePdfMaker.session(). A session generates one PDF at a time: use one session per thread to render in parallel.
+    """
+
+    def __init__(self, maker, wrapper):
+        self._maker = maker
+        self._wrapper = wrapper
+        self._lock = threading.Lock()
+
+    def generate_pdf(self, html, pdf_kwargs=None, result=None):
+        """Like ChromePdfMaker.generate_pdf(), but using the session's browser."""
+
+        with self._lock:
+            return self._maker._generate_pdf(html, pdf_kwargs, result, self._wrapper)
+
+    def write_pdf(self, html, output, pdf_kwargs=None, result=None):
+        """Like ChromePdfMaker.write_pdf(), but using the session's browser."""
+
+        with self._lock:
+            return self._maker._generate_pdf(html, pdf_kwargs, result, self._wrapper, output)
+
+    def generate_pdf_url(self, url, pdf_kwargs=None, result=None):
+        """Like ChromePdfMaker.generate_pdf_url(), but using the session's browser."""
+
+        with self._lock:
+            return self._maker._generate_pdf_url(url, pdf_kwargs, result, self._wrapper)
+
+    def is_alive(self):
+        """
+        Return True if the session's browser still responds to commands. A session that sends its renders to a DAEMON
+        or RENDER_SERVERS has no browser of its own, and is always alive.
+        """
+
+        with self._lock:
+            return self._wrapper is None or self._wrapper.is_alive()
+
+
+@contextmanager
+def _track_render(bytes_in):
+    """Count a render, and its input size, in the metrics. Count it as failed if it raises an exception."""
+
+    metrics.RENDERS.inc()
+    metrics.BYTES_IN.inc(bytes_in)
+    try:
+        yield
+    except BaseException:
+        metrics.RENDER_FAILURES.inc()
+        raise
+
+
+def _fill_render_result(result, pdf_bytes, timer, wrapper):
+    """Store the details of a completed render on the RenderResult, if one was provided."""
+
+    if result is None:
+        return
+    result.pdf_bytes = pdf_bytes
+    result.timings = dict(timer.timings)
+    result.resources = wrapper.render_resources
+    result.performance_metrics = wrapper.performance_metrics
+    result.browser_resources = wrapper.browser_resources
+    result.trace_path = wrapper.trace_path
@@ -0,0 +1,201 @@
+"""
+Counters and histograms describing ChromePDF's work, exposed in the Prometheus text format.
+This uses only the standard library. To serve them, call REGISTRY.exposition(), or use chromepdf.views.metrics_view.
+"""
+
+import math
+import threading
+
+from chromepdf.instrumentation import register_hook
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for k, v in labels]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+class _Metric:
+    """Base class for a metric with a name, help text, and optional labels."""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # tuple of (labelname, labelvalue) pairs => value
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'Metric {self.name} requires labels: {", ".join(self.labelnames)}')
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def get(self, **labels):
+        """Return the current value for the given labels."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        """Return a list of (name suffix, labels, value) tuples for the exposition."""
+        with self._lock:
+            return [('', key, value) for key, value in sorted(self._values.items())]
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, labels, value in self._samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """A value that only ever increases."""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Counters can only be increased.')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that may go up and down."""
+
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Counts observed values into cumulative buckets, and tracks their sum and count."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def get(self, **labels):
+        """Return a (count, sum) tuple for the given labels."""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0] * len(self.buckets), 0))
+            return counts[-1], total
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append(('_bucket', key + (('le', _format_value(bound)),), count))
+                samples.append(('_sum', key, total))
+                samples.append(('_count', key, counts[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """A collection of metrics that can be rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'A metric named {metric.name} is already registered.')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def exposition(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return ''.join(f'{m.exposition()}\n' for m in metrics)
+
+
+REGISTRY = MetricsRegistry()
+
+RENDERS = REGISTRY.register(Counter('chromepdf_renders_total', 'PDF renders started.'))
+RENDER_FAILURES = REGISTRY.register(Counter('chromepdf_render_failures_total', 'PDF renders that raised an exception.'))
+BYTES_IN = REGISTRY.register(Counter('chromepdf_input_bytes_total', 'Bytes of HTML received for rendering.'))
+BYTES_OUT = REGISTRY.register(Counter('chromepdf_output_bytes_total', 'Bytes of PDF files generated.'))
+BROWSER_LAUNCHES = REGISTRY.register(Counter('chromepdf_browser_launches_total', 'Chrome browsers launched.'))
+CHROMEDRIVER_DOWNLOADS = REGISTRY.register(Counter('chromepdf_chromedriver_downloads_total', 'Chromedrivers downloaded.'))
+CHROMEDRIVER_RESTARTS = REGISTRY.register(Counter(
+    'chromepdf_chromedriver_restarts_total',
+    'Chromedrivers or browsers relaunched because the previous one exited or stopped responding.', ['source']))
+ASSET_CACHE_HITS = REGISTRY.register(Counter('chromepdf_asset_cache_hits_total', 'Static assets read from the in-memory cache.'))
+ASSET_CACHE_MISSES = REGISTRY.register(Counter('chromepdf_asset_cache_misses_total', 'Static assets read from disk.'))
+SLOW_RENDERS = REGISTRY.register(Counter('chromepdf_slow_renders_total', 'Renders that took at least SLOW_RENDER_THRESHOLD seconds.'))
+RENDER_CPU_SECONDS = REGISTRY.register(Histogram(
+    'chromepdf_render_cpu_seconds', 'CPU time used by the chromedriver and Chrome processes during each render.'))
+RENDER_SUMMED_PEAK_RSS_BYTES = REGISTRY.register(Histogram(
+    'chromepdf_render_summed_peak_rss_bytes',
+    'Sum of the peak resident memory of each chromedriver and Chrome process during each render.',
+    buckets=MEMORY_BUCKETS))
+BROWSER_CPU_SECONDS = REGISTRY.register(Counter(
+    'chromepdf_browser_cpu_seconds_total', 'CPU time used by the chromedriver and Chrome processes, over their lifetime.'))
+BROWSER_SUMMED_PEAK_RSS_BYTES = REGISTRY.register(Histogram(
+    'chromepdf_browser_summed_peak_rss_bytes',
+    'Sum of the peak resident memory of each chromedriver and Chrome process, over their lifetime.',
+    buckets=MEMORY_BUCKETS))
+POOL_SIZE = REGISTRY.register(Gauge('chromepdf_pool_size', 'Browsers that BrowserPools may hold open.'))
+POOL_IN_USE = REGISTRY.register(Gauge('chromepdf_pool_in_use', 'Browsers of BrowserPools that are rendering.'))
+POOL_WAITING = REGISTRY.register(Gauge('chromepdf_pool_waiting', 'Renders waiting for a browser of a BrowserPool.'))
+POOL_CHECKOUTS = REGISTRY.register(Counter('chromepdf_pool_checkouts_total', 'Browsers lent out by BrowserPools.'))
+POOL_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'chromepdf_pool_wait_seconds', 'Time spent waiting for a browser of a BrowserPool.'))
+STANDBY_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'chromepdf_standby_wait_seconds', 'Time renders spent waiting for a standby browser to finish launching.'))
+PHASE_SECONDS = REGISTRY.register(Histogram('chromepdf_phase_seconds', 'Time spent in each phase of PDF generation.', ['phase']))
+
+
+def _observe_phase(name, seconds):
+    """Instrumentation hook that records every completed phase of work."""
+
+    PHASE_SECONDS.observe(seconds, phase=name)
+    if name == 'browser_launch':
+        BROWSER_LAUNCHES.inc()
+    elif name == 'chromedriver_download':
+        CHROMEDRIVER_DOWNLOADS.inc()
+
+
+register_hook(_observe_phase)
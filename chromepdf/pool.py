@@ -0,0 +1,167 @@
+"""
+A fixed-size pool of browsers, shared by many threads. Used by the render daemon (see chromepdf.daemon), so that every
+process on a host can share one pool of warm browsers.
+"""
+
+import queue
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from chromepdf import metrics
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.pdfconf import clean_pdf_kwargs
+
+
+# Put in the queue of slots once the pool is closed, to wake up any threads still waiting for a session.
+_CLOSED = object()
+
+
+class BrowserPool:
+    """
+    Lends up to `size` ChromePdfSessions of a ChromePdfMaker to threads, one thread at a time each. Usage:
+
+    with BrowserPool(maker, size=4) as pool:
+        pdf_bytes = pool.generate_pdf(html)  # from any thread
+
+    Browsers are started when they are first needed, and kept open until the pool is closed. If a render fails and its
+    browser no longer responds, the browser is closed, and a new one is started the next time its slot is lent out.
+    Failures that leave the browser working (EG, invalid pdf_kwargs, or an output file that cannot be written to) keep
+    it in the pool.
+    """
+
+    def __init__(self, maker, size):
+        if size < 1:
+            raise ValueError('A BrowserPool must have a size of 1 or greater.')
+        self._maker = maker
+        self.size = size
+        # Each slot is an (ExitStack, ChromePdfSession) tuple, or None if its browser has not been started.
+        # Most recently returned slots are lent first, so that idle browsers are the ones that stay unused.
+        self._slots = queue.LifoQueue()
+        for _i in range(size):
+            self._slots.put(None)
+        self._closed = False
+        self._close_lock = threading.Lock()
+        metrics.POOL_SIZE.inc(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def session(self):
+        """Context manager that borrows a ChromePdfSession from the pool, waiting until one is free."""
+
+        if self._closed:
+            raise ChromePdfException('The BrowserPool is closed.')
+
+        start = time.monotonic()
+        metrics.POOL_WAITING.inc()
+        try:
+            slot = self._slots.get()
+        finally:
+            metrics.POOL_WAITING.dec()
+        if slot is _CLOSED:
+            self._slots.put(slot)  # for the next waiting thread
+            raise ChromePdfException('The BrowserPool is closed.')
+        metrics.POOL_WAIT_SECONDS.observe(time.monotonic() - start)
+        metrics.POOL_CHECKOUTS.inc()
+        metrics.POOL_IN_USE.inc()
+
+        try:
+            if slot is None:
+                stack = ExitStack()
+                slot = (stack, stack.enter_context(self._maker.session()))
+            yield slot[1]
+        except Exception:
+            if slot is not None and not slot[1].is_alive():
+                # the browser crashed, or its chromedriver exited. Start a new one the next time this slot is used.
+                slot = _close_dead_slot(slot)
+            raise
+        finally:
+            metrics.POOL_IN_USE.dec()
+            self._slots.put(slot)
+
+    def check_health(self):
+        """
+        Raise an exception if the pool cannot provide a working browser. An idle browser is checked to still respond,
+        and if none has been started yet, or it no longer responds, one is started in its place. If every browser is
+        busy, the pool is assumed to be working.
+        """
+
+        if self._closed:
+            raise ChromePdfException('The BrowserPool is closed.')
+        try:
+            slot = self._slots.get_nowait()
+        except queue.Empty:
+            return
+        if slot is _CLOSED:
+            self._slots.put(slot)
+            raise ChromePdfException('The BrowserPool is closed.')
+
+        try:
+            if slot is not None and not slot[1].is_alive():
+                slot = _close_dead_slot(slot)
+            if slot is None:
+                stack = ExitStack()
+                slot = (stack, stack.enter_context(self._maker.session()))
+        finally:
+            self._slots.put(slot)
+
+    def generate_pdf(self, html, pdf_kwargs=None, result=None):
+        """Like ChromePdfMaker.generate_pdf(), but using one of the pool's browsers."""
+
+        _validate_pdf_kwargs(pdf_kwargs)
+        with self.session() as session:
+            return session.generate_pdf(html, pdf_kwargs, result)
+
+    def write_pdf(self, html, output, pdf_kwargs=None, result=None):
+        """Like ChromePdfMaker.write_pdf(), but using one of the pool's browsers."""
+
+        _validate_pdf_kwargs(pdf_kwargs)
+        with self.session() as session:
+            return session.write_pdf(html, output, pdf_kwargs, result)
+
+    def generate_pdf_url(self, url, pdf_kwargs=None, result=None):
+        """Like ChromePdfMaker.generate_pdf_url(), but using one of the pool's browsers."""
+
+        _validate_pdf_kwargs(pdf_kwargs)
+        with self.session() as session:
+            return session.generate_pdf_url(url, pdf_kwargs, result)
+
+    def close(self):
+        """Stop lending sessions, wait for the borrowed ones to be returned, and then close every browser."""
+
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        try:
+            with ExitStack() as stacks:
+                for _i in range(self.size):
+                    slot = self._slots.get()
+                    if slot is not None:
+                        stacks.push(slot[0])
+        finally:
+            self._slots.put(_CLOSED)
+            metrics.POOL_SIZE.dec(self.size)
+
+
+def _close_dead_slot(slot):
+    """Close the browser of a slot that no longer responds, and return None, the slot of a browser yet to be started."""
+
+    metrics.CHROMEDRIVER_RESTARTS.inc(source='pool')
+    try:
+        slot[0].close()
+    except Exception:
+        pass  # it is already dead. Any exception from quitting it is of no use.
+    return None
+
+
+def _validate_pdf_kwargs(pdf_kwargs):
+    """Raise ValueError or TypeError for invalid pdf_kwargs, before a browser is taken from the pool for them."""
+
+    clean_pdf_kwargs(**(pdf_kwargs or {}))
@@ -0,0 +1,150 @@
+"""
+Accounting of the CPU time and memory used by the chromedriver, and the Chrome processes beneath it.
+This reads the /proc filesystem, so it is only available on Linux. Elsewhere, no usage is recorded.
+"""
+
+import os
+
+
+_PROC_DIR = '/proc'
+
+
+def _read_stat(pid):
+    """
+    Return a (ppid, starttime, cpu_seconds) tuple for a process, from /proc/<pid>/stat.
+    The cpu time includes that of the process's children that have exited and been reaped.
+    Return None if the process no longer exists.
+    """
+
+    try:
+        with open(os.path.join(_PROC_DIR, str(pid), 'stat'), encoding='utf8') as f:
+            contents = f.read()
+    except OSError:
+        return None
+
+    # The process name is in parentheses and may itself contain spaces or parentheses, so split after the last one.
+    fields = contents[contents.rindex(')') + 2:].split()
+    ppid = int(fields[1])
+    utime, stime, cutime, cstime = (int(f) for f in fields[11:15])
+    starttime = int(fields[19])
+    return ppid, starttime, (utime + stime + cutime + cstime) / os.sysconf('SC_CLK_TCK')
+
+
+def _read_memory(pid):
+    """Return a (rss_bytes, peak_rss_bytes) tuple for a process, from /proc/<pid>/status. Or None if it has exited."""
+
+    values = {}
+    try:
+        with open(os.path.join(_PROC_DIR, str(pid), 'status'), encoding='utf8') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    key, value = line.split(':', 1)
+                    values[key] = int(value.split()[0]) * 1024  # reported in kB
+    except OSError:
+        return None
+    return values.get('VmRSS', 0), values.get('VmHWM', 0)
+
+
+def get_process_tree(root_pid):
+    """Return a dict of pid => (starttime, cpu_seconds) for a process and all of its descendants."""
+
+    stats = {}
+    children = {}  # ppid => [pid, ...]
+    for name in os.listdir(_PROC_DIR):
+        if not name.isdigit():
+            continue
+        stat = _read_stat(int(name))
+        if stat is not None:
+            stats[int(name)] = stat
+            children.setdefault(stat[0], []).append(int(name))
+
+    tree = {}
+    pending = [root_pid] if root_pid in stats else []
+    while pending:
+        pid = pending.pop()
+        tree[pid] = stats[pid][1:]
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def is_supported():
+    "Return True if process resource accounting is available on this system."
+
+    return os.path.isdir(os.path.join(_PROC_DIR, 'self'))
+
+
+class ProcessTreeTracker:
+    """
+    Samples the CPU time and memory of a process and its descendants (EG, a chromedriver, and the browser, GPU, and
+    renderer processes of the Chrome that it started).
+    """
+
+    def __init__(self, root_pid):
+        self.root_pid = root_pid
+        self._pids = []  # the processes seen by the last sample
+        self._peak_rss = {}  # (pid, starttime) => highest peak rss seen over the tracker's lifetime, in bytes
+        self._peak_rss_since_reset = {}  # (pid, starttime) => highest peak rss seen since reset_peaks(), in bytes
+
+    def sample(self, since_reset=False):
+        """
+        Return the current usage of the process tree, as a dict with the keys:
+        cpu_seconds: Total CPU time used by the processes so far.
+        rss_bytes: The current resident memory of all the processes.
+        summed_peak_rss_bytes: The sum of each process's peak resident memory, including processes that have since
+            exited. Over the tracker's lifetime, or since reset_peaks() was last called if since_reset is True.
+            The processes need not have peaked at the same time, so the tree as a whole may have used less than this.
+        processes: The number of processes currently running.
+        """
+
+        cpu_seconds = 0
+        rss_bytes = 0
+        tree = get_process_tree(self.root_pid)
+        for pid, (starttime, process_cpu_seconds) in tree.items():
+            memory = _read_memory(pid)
+            if memory is None:
+                continue
+            cpu_seconds += process_cpu_seconds
+            rss_bytes += memory[0]
+            key = (pid, starttime)
+            self._peak_rss[key] = max(self._peak_rss.get(key, 0), memory[1])
+            self._peak_rss_since_reset[key] = max(self._peak_rss_since_reset.get(key, 0), memory[1])
+        self._pids = list(tree)
+
+        peak_rss = self._peak_rss_since_reset if since_reset else self._peak_rss
+        return {
+            'cpu_seconds': cpu_seconds,
+            'rss_bytes': rss_bytes,
+            'summed_peak_rss_bytes': sum(peak_rss.values()),
+            'processes': len(tree),
+        }
+
+    def reset_peaks(self):
+        """
+        Start measuring peak memory from now, EG at the start of each render in a browser that is reused.
+        The kernel's peak resident memory (VmHWM) of each process seen by the last sample is reset to its current
+        resident memory, by writing 5 to /proc/<pid>/clear_refs. The tracker keeps the lifetime peaks seen so far.
+        """
+
+        self._peak_rss_since_reset = {}
+        for pid in self._pids:
+            try:
+                with open(os.path.join(_PROC_DIR, str(pid), 'clear_refs'), 'w', encoding='utf8') as f:
+                    f.write('5')
+            except OSError:
+                pass  # the process has exited.
+
+    @staticmethod
+    def usage_between(start, end):
+        """Return the usage between two samples, with the CPU time being the amount used in between."""
+
+        usage = dict(end)
+        usage['cpu_seconds'] = max(0, end['cpu_seconds'] - start['cpu_seconds'])
+        return usage
+
+
+def get_process_tree_tracker(root_pid):
+    """Return a ProcessTreeTracker for the process, or None if there is no process or accounting is unsupported."""
+
+    if root_pid is None or not is_supported():
+        return None
+    return ProcessTreeTracker(root_pid)
@@ -3,6 +3,10 @@ def chromepdf_run(args):
     """
     A method of generating PDF files from the command line. To execute, run:
     > python -m chromepdf generate-pdf [args] [kwargs]
+    > python -m chromepdf render-manifest path/to/manifest.jsonl [kwargs]
+    > python -m chromepdf bench [kwargs]
+    > python -m chromepdf serve --socket=path/to/chromepdf.sock [kwargs]
+    > python -m chromepdf http --port=8181 [kwargs]
     """
 
     parser = _get_parser()
@@ -10,6 +14,14 @@ def chromepdf_run(args):
 
     if namespace.command == 'generate-pdf':
         _command_generate_pdf(parser, namespace)
+    elif namespace.command == 'render-manifest':
+        _command_render_manifest(parser, namespace)
+    elif namespace.command == 'bench':
+        _command_bench(parser, namespace)
+    elif namespace.command == 'serve':
+        _command_serve(parser, namespace)
+    elif namespace.command == 'http':
+        _command_http(parser, namespace)
     else:
         parser.print_help()
         # 'Unix programs generally use 2 for command line syntax errors and 1 for all other kind of errors.'
@@ -25,58 +37,227 @@ def _get_parser():
 
     subparsers = parser.add_subparsers(help='You may call the following commands:', dest='command')
 
-    # For now, we only have one sub-command: generate-pdf.
-    # Other sub-commands may be added in the future
-    genpdf_parser = subparsers.add_parser('generate-pdf', help='Generate a PDF file. Followed by one or two args: The part to the input HTML file, and path to the output PDF file. EG: "generate-pdf path/to/file.html path/to/file.pdf"')
+    genpdf_parser = subparsers.add_parser('generate-pdf', help='Generate a PDF file. Followed by one or two args: The part to the input HTML file, and path to the output PDF file. EG: "generate-pdf path/to/file.html path/to/file.pdf". Use "-" to read the HTML from stdin, or write the PDF to stdout. Or, to generate many PDF files: any number of HTML files, globs, and directories, with --jobs or --out-dir. EG: "generate-pdf --jobs=4 --out-dir=pdfs html/"')
     genpdf_parser.add_argument('paths', nargs='*')
     genpdf_parser.add_argument("--pdf-kwargs-json", help="Path to a JSON file whose contents can decode to a pdf_kwargs dict.")
-    genpdf_parser.add_argument("--chrome-path", help="Path to Chrome executable")
-    genpdf_parser.add_argument("--chromedriver-path", help="Path to Chrome executable")
-    genpdf_parser.add_argument("--chromedriver-chmod", help="Chmod permission to use for chromedrivers downloaded. This must be an octal value of the form: 0o---")
-    genpdf_parser.add_argument("--chromedriver-downloads", type=int, choices=(0, 1), help='1 or 0, to indicate whether to use Chromedriver downloads or not.')
+    _add_chrome_arguments(genpdf_parser)
     genpdf_parser.add_argument("--use-selenium", type=int, choices=(0, 1, -1), help='1=yes, 0=no, -1=use Selenium if present, else do not.')
-    genpdf_parser.add_argument("--chrome-args", help='A string of all arguments to pass to Chrome, separated by spaces.')
+    genpdf_parser.add_argument("--trace-dir", help="Path to a directory to write Chrome's trace of the render to, in Chrome's trace-event JSON format.")
+    genpdf_parser.add_argument("--jobs", type=int, help='Generate many PDF files, with this many browsers at once. Each browser is reused for many files.')
+    genpdf_parser.add_argument("--out-dir", help='Generate many PDF files, and write them to this directory instead of beside the HTML files.')
+    genpdf_parser.add_argument("--manifest", help='Generate many PDF files, from the HTML file paths listed in this file, one per line.')
+    genpdf_parser.add_argument("--trace-threshold", type=float, help='Only write a trace if the render takes at least this many seconds.')
+    genpdf_parser.add_argument("--watch", action='store_true', help='Keep Chrome open, and generate the PDF again each time the HTML file, the --pdf-kwargs-json file, or a local file referenced by the HTML is saved. Press Ctrl+C to stop.')
+
+    manifest_parser = subparsers.add_parser('render-manifest', help='Generate a PDF file for each record of a JSON-lines manifest, and write a JSON-lines log of the results. Each record is a JSON object with an "input" path or "html" string, an "output" path, and optional "pdf_kwargs", "profile", and "id" values.')
+    manifest_parser.add_argument('manifest', help='Path to the JSON-lines manifest file.')
+    manifest_parser.add_argument("--jobs", type=int, default=1, help='Number of browsers to render with at once. Each browser is reused for many records.')
+    manifest_parser.add_argument("--results", help='Path of a file to write the JSON-lines results to. Defaults to stdout.')
+    manifest_parser.add_argument("--profiles", help='Path to a JSON file containing a dict of profile name => dict of settings (EG, "javascript") and "pdf_kwargs", for records with a "profile".')
+    manifest_parser.add_argument("--pdf-kwargs-json", help="Path to a JSON file whose contents can decode to a pdf_kwargs dict. Used by every record, unless overridden.")
+    _add_chrome_arguments(manifest_parser)
+    manifest_parser.add_argument("--use-selenium", type=int, choices=(0, 1, -1), help='1=yes, 0=no, -1=use Selenium if present, else do not.')
+
+    bench_parser = subparsers.add_parser('bench', help='Benchmark PDF generation for every combination of the given backends, HTML sizes, page counts, and concurrency levels. Outputs the results as JSON.')
+    bench_parser.add_argument("--backends", nargs='+', choices=('selenium', 'noselenium', 'pooled'), default=['selenium', 'noselenium', 'pooled'], help='The webdriver makers to benchmark. "pooled" reuses a pool of browsers (without Selenium) across renders.')
+    bench_parser.add_argument("--html-sizes", nargs='+', type=_parse_size, default=[1000, 100 * 1000, 1000 * 1000], help='Sizes of HTML to render, EG: 1KB 10MB. (1KB = 1000 bytes)')
+    bench_parser.add_argument("--pages", nargs='+', type=int, default=[1], help='Numbers of pages to split the HTML across.')
+    bench_parser.add_argument("--concurrency", nargs='+', type=int, default=[1], help='Numbers of renders to run at the same time.')
+    bench_parser.add_argument("--renders", type=int, default=10, help='Number of renders for each combination.')
+    bench_parser.add_argument("--output", help='Path of a file to write the JSON results to. Defaults to stdout.')
+    _add_chrome_arguments(bench_parser)
+
+    serve_parser = subparsers.add_parser('serve', help='Run a render daemon, which keeps a pool of browsers open, and generates PDFs for other processes that connect to its Unix socket. Use it via ChromePdfMaker(daemon="path/to/chromepdf.sock") or the DAEMON setting.')
+    serve_parser.add_argument("--socket", required=True, help='Path of the Unix socket to listen on.')
+    serve_parser.add_argument("--pool-size", type=int, default=1, help='Number of browsers to keep open, and render with at once.')
+    _add_chrome_arguments(serve_parser)
+    serve_parser.add_argument("--use-selenium", type=int, choices=(0, 1, -1), help='1=yes, 0=no, -1=use Selenium if present, else do not.')
+
+    http_parser = subparsers.add_parser('http', help='Run an HTTP render server, which keeps a pool of browsers open. POST HTML to /pdf to receive its PDF. GET /health and /metrics to monitor it.')
+    http_parser.add_argument("--host", default='127.0.0.1', help='Address to listen on. Use 0.0.0.0 to listen on every interface.')
+    http_parser.add_argument("--port", type=int, default=8181, help='Port to listen on.')
+    http_parser.add_argument("--pool-size", type=int, default=1, help='Number of browsers to keep open, and render with at once.')
+    http_parser.add_argument("--queue-size", type=int, default=16, help='Number of requests that may wait for a browser before further requests are rejected with a 503.')
+    _add_chrome_arguments(http_parser)
+    http_parser.add_argument("--use-selenium", type=int, choices=(0, 1, -1), help='1=yes, 0=no, -1=use Selenium if present, else do not.')
 
     return parser
 
 
+def _add_chrome_arguments(subparser):
+    """Add the arguments for locating and configuring Chrome and the chromedriver."""
+
+    subparser.add_argument("--chrome-path", help="Path to Chrome executable")
+    subparser.add_argument("--chromedriver-path", help="Path to Chrome executable")
+    subparser.add_argument("--chromedriver-chmod", help="Chmod permission to use for chromedrivers downloaded. This must be an octal value of the form: 0o---")
+    subparser.add_argument("--chromedriver-downloads", type=int, choices=(0, 1), help='1 or 0, to indicate whether to use Chromedriver downloads or not.')
+    subparser.add_argument("--chrome-args", help='A string of all arguments to pass to Chrome, separated by spaces.')
+    subparser.add_argument("--chromedriver-url", help='URL of an already-running chromedriver to use, instead of starting one. EG: http://localhost:9515')
+    subparser.add_argument("--share-chromedriver", type=int, choices=(0, 1), help='1 or 0, to indicate whether all browsers should be started by one shared chromedriver, rather than one chromedriver each.')
+    subparser.add_argument("--chrome-debugger-address", help='host:port of an already-running Chrome (started with --remote-debugging-port) to use, instead of starting one.')
+
+
+def _get_chrome_kwargs(parser, namespace):
+    """Return a dict of ChromePdfMaker kwargs from the arguments added by _add_chrome_arguments()."""
+
+    kwargs = {}
+    if namespace.chrome_path is not None:
+        kwargs['chrome_path'] = namespace.chrome_path
+    if namespace.chromedriver_path is not None:
+        kwargs['chromedriver_path'] = namespace.chromedriver_path
+    if namespace.chromedriver_downloads is not None:
+        kwargs['chromedriver_downloads'] = bool(namespace.chromedriver_downloads)
+    if namespace.chromedriver_chmod is not None:
+        if not namespace.chromedriver_chmod.startswith('0o'):
+            parser.error('--chromedriver-chmod must be an octal value of the form: 0o---')
+        kwargs['chromedriver_chmod'] = int(namespace.chromedriver_chmod[2:], 8)
+    if namespace.chrome_args is not None:
+        kwargs['chrome_args'] = namespace.chrome_args.strip().split()
+    if namespace.chromedriver_url is not None:
+        kwargs['chromedriver_url'] = namespace.chromedriver_url
+    if namespace.share_chromedriver is not None:
+        kwargs['share_chromedriver'] = bool(namespace.share_chromedriver)
+    if namespace.chrome_debugger_address is not None:
+        kwargs['chrome_debugger_address'] = namespace.chrome_debugger_address
+    return kwargs
+
+
+def _parse_size(value):
+    """Convert a size such as "500", "1KB", or "10MB" into a number of bytes."""
+
+    import argparse
+
+    units = {'KB': 1000, 'MB': 1000 * 1000}
+    number = value.strip().upper()
+    multiplier = 1
+    for suffix, unit_multiplier in units.items():
+        if number.endswith(suffix):
+            number = number[:-len(suffix)]
+            multiplier = unit_multiplier
+            break
+    try:
+        return int(float(number) * multiplier)
+    except ValueError as ex:
+        raise argparse.ArgumentTypeError(f'invalid size: "{value}". Use a number of bytes, or a number with KB or MB.') from ex
+
+
 def _command_generate_pdf(parser, namespace):
     """Call the generate_pdf() function using command-line arguments."""
 
     import os
 
+    if _is_batch(namespace):
+        if namespace.watch:
+            parser.error('generate-pdf: --watch can only be used to generate one PDF file.')
+        return _command_generate_pdf_batch(parser, namespace)
+
     if namespace.paths is None or len(namespace.paths) == 0:
         parser.error('generate-pdf: requires one or two path arguments for an infile and optional outfile.')
 
     if len(namespace.paths) == 1:
         inpath = namespace.paths[0]
-        outpath = os.path.splitext(inpath)[0] + '.pdf'  # replace extension with pdf. OR append if has none.
+        if inpath == '-':
+            outpath = '-'  # from stdin to stdout
+        else:
+            outpath = os.path.splitext(inpath)[0] + '.pdf'  # replace extension with pdf. OR append if has none.
     elif len(namespace.paths) == 2:
         inpath, outpath = namespace.paths
     else:
         parser.error('generate-pdf: requires one or two path arguments for an infile and optional outfile.')
 
-    if not os.path.exists(inpath):
+    if inpath != '-' and not os.path.exists(inpath):
         parser.error(f'generate-pdf: could not find input html file: "{inpath}"')
 
-    with open(inpath, 'r', encoding='utf8') as f:
-        html_str = f.read()
+    if namespace.watch:
+        return _command_generate_pdf_watch(parser, namespace, inpath, outpath)
 
-    kwargs = {}
-    if namespace.chrome_path is not None:
-        kwargs['chrome_path'] = namespace.chrome_path
-    if namespace.chromedriver_path is not None:
-        kwargs['chromedriver_path'] = namespace.chromedriver_path
-    if namespace.chromedriver_downloads is not None:
-        kwargs['chromedriver_downloads'] = bool(namespace.chromedriver_downloads)
-    if namespace.chromedriver_chmod is not None:
-        if not namespace.chromedriver_chmod.startswith('0o'):
-            parser.error('--chromedriver-chmod must be an octal value of the form: 0o---')
-        kwargs['chromedriver_chmod'] = int(namespace.chromedriver_chmod[2:], 8)
+    if inpath == '-':
+        import sys
+        html_str = sys.stdin.buffer.read().decode('utf8')
+    else:
+        with open(inpath, 'r', encoding='utf8') as f:
+            html_str = f.read()
+
+    kwargs = _get_generate_pdf_kwargs(parser, namespace)
+    pdf_kwargs = _get_pdf_kwargs(parser, namespace)
+
+    # Stream the PDF to its output as Chrome produces it, rather than holding all of it in memory first.
+    from .maker import ChromePdfMaker
+    maker = ChromePdfMaker(**kwargs)
+    if outpath == '-':
+        import sys
+        maker.write_pdf(html_str, sys.stdout.buffer, pdf_kwargs)
+        sys.stdout.buffer.flush()
+        return
+
+    outpath_dir = os.path.dirname(outpath)
+    if outpath_dir:  # makedirs() will fail if we try passing the current dir via "", so don't.
+        os.makedirs(outpath_dir, exist_ok=True)
+    # Write to a temporary name and then rename it, so that a failed render leaves no partial file behind.
+    temp_path = f'{outpath}.partial'
+    try:
+        with open(temp_path, 'wb') as f:
+            maker.write_pdf(html_str, f, pdf_kwargs)
+        os.replace(temp_path, outpath)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _command_generate_pdf_watch(parser, namespace, inpath, outpath):
+    """Generate a PDF file, and generate it again each time its files are saved, until interrupted."""
+
+    if inpath == '-' or outpath == '-':
+        parser.error('generate-pdf: --watch cannot read from stdin or write to stdout.')
+
+    kwargs = _get_generate_pdf_kwargs(parser, namespace)
+    _get_pdf_kwargs(parser, namespace)  # fail now if the file is invalid. It is read again for each render.
+
+    from .maker import ChromePdfMaker
+    from .watch import watch
+    maker = ChromePdfMaker(**kwargs)
+
+    print(f'Watching "{inpath}". Press Ctrl+C to stop.', flush=True)
+    try:
+        for result in watch(maker, inpath, outpath, namespace.pdf_kwargs_json):
+            changed = ', '.join(result['changed'])
+            if result['status'] == 'ok':
+                print(f'ok     {result["seconds"]:8.3f}s  {changed} -> {outpath}', flush=True)
+            else:
+                print(f'error  {result["seconds"]:8.3f}s  {changed}: {result["error"]}', flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+def _is_batch(namespace):
+    """Return True if the generate-pdf arguments ask for many PDF files to be generated, rather than just one."""
+
+    import os
+
+    from .batch import _is_glob
+
+    if namespace.jobs is not None or namespace.out_dir is not None or namespace.manifest is not None:
+        return True
+    return any(_is_glob(path) or os.path.isdir(path) for path in namespace.paths)
+
+
+def _get_generate_pdf_kwargs(parser, namespace):
+    """Return a dict of ChromePdfMaker kwargs from the generate-pdf or render-manifest arguments."""
+
+    kwargs = _get_chrome_kwargs(parser, namespace)
     if namespace.use_selenium is not None:
         kwargs['use_selenium'] = None if namespace.use_selenium == -1 else bool(namespace.use_selenium)
-    if namespace.chrome_args is not None:
-        kwargs['chrome_args'] = namespace.chrome_args.strip().split()
+    if getattr(namespace, 'trace_dir', None) is not None:
+        kwargs['trace_dir'] = namespace.trace_dir
+    if getattr(namespace, 'trace_threshold', None) is not None:
+        kwargs['trace_threshold'] = namespace.trace_threshold
+    return kwargs
+
+
+def _get_pdf_kwargs(parser, namespace):
+    """Return the pdf_kwargs dict in the --pdf-kwargs-json file, or None if there is no file."""
+
+    import os
 
     pdf_kwargs = None
     if namespace.pdf_kwargs_json is not None:
@@ -91,11 +272,207 @@ def _command_generate_pdf(parser, namespace):
                 parser.error('--pdf-kwargs-json: must be a path to a file containing a JSON dict {} of key-value pairs. The JSON in this file is a different data type.')
         except json.JSONDecodeError:
             parser.error('--pdf-kwargs-json: must be a path to a file containing a JSON dict {} of key-value pairs. The JSON in this file is not valid JSON.')
+    return pdf_kwargs
 
-    from .shortcuts import generate_pdf
-    pdf_bytes = generate_pdf(html_str, pdf_kwargs, **kwargs)
-    outpath_dir = os.path.dirname(outpath)
-    if outpath_dir:  # makedirs() will fail if we try passing the current dir via "", so don't.
-        os.makedirs(outpath_dir, exist_ok=True)
-    with open(outpath, 'wb') as f:
-        f.write(pdf_bytes)
+
+def _command_generate_pdf_batch(parser, namespace):
+    """Generate a PDF file for each HTML file found via the paths, globs, directories, and manifest."""
+
+    import os
+    import sys
+    import time
+
+    if namespace.jobs is not None and namespace.jobs < 1:
+        parser.error('generate-pdf: --jobs must be 1 or greater.')
+
+    paths = list(namespace.paths)
+    if namespace.manifest is not None:
+        if not os.path.exists(namespace.manifest):
+            parser.error(f'generate-pdf: could not find manifest file: "{namespace.manifest}"')
+        from .batch import read_manifest
+        paths.extend(read_manifest(namespace.manifest))
+    if not paths:
+        parser.error('generate-pdf: requires paths to HTML files, globs, or directories, or a --manifest.')
+
+    from .batch import find_inputs, get_output_path, run_jobs
+    try:
+        inputs = find_inputs(paths)
+    except (FileNotFoundError, ValueError) as ex:
+        parser.error(f'generate-pdf: {ex}')
+
+    kwargs = _get_generate_pdf_kwargs(parser, namespace)
+    pdf_kwargs = _get_pdf_kwargs(parser, namespace)
+    jobs = ({'input': path, 'output': get_output_path(path, relative_path, namespace.out_dir), 'pdf_kwargs': pdf_kwargs}
+            for path, relative_path in inputs)
+
+    from .maker import ChromePdfMaker
+    maker = ChromePdfMaker(**kwargs)
+
+    start = time.monotonic()
+    failures = 0
+    for result in run_jobs(maker, jobs, namespace.jobs or 1):
+        if result['status'] == 'ok':
+            print(f'ok     {result["seconds"]:8.3f}s  {result["input"]} -> {result["output"]}', flush=True)
+        else:
+            failures += 1
+            print(f'error  {result["seconds"]:8.3f}s  {result["input"]}: {result["error"]}', flush=True)
+
+    seconds = time.monotonic() - start
+    print(f'Generated {len(inputs) - failures} of {len(inputs)} PDF files in {seconds:.3f}s.', flush=True)
+    if failures:
+        sys.exit(1)
+
+
+def _command_bench(parser, namespace):
+    """Run the benchmarks using command-line arguments, and output the results as JSON."""
+
+    import json
+    import os
+
+    for name in ('pages', 'concurrency'):
+        if any(n < 1 for n in getattr(namespace, name)):
+            parser.error(f'bench: --{name} values must be 1 or greater.')
+    if namespace.renders < 1:
+        parser.error('bench: --renders must be 1 or greater.')
+
+    kwargs = _get_chrome_kwargs(parser, namespace)
+
+    from .bench import run_matrix
+    results = run_matrix(namespace.backends, namespace.html_sizes, namespace.pages, namespace.concurrency,
+                         namespace.renders, **kwargs)
+    output = json.dumps(results, indent=2)
+
+    if namespace.output is None:
+        print(output)
+    else:
+        outpath_dir = os.path.dirname(namespace.output)
+        if outpath_dir:
+            os.makedirs(outpath_dir, exist_ok=True)
+        with open(namespace.output, 'w', encoding='utf8') as f:
+            f.write(output)
+
+
+def _command_render_manifest(parser, namespace):
+    """Generate a PDF file for each record of a JSON-lines manifest, and output a JSON-lines log of the results."""
+
+    import json
+    import os
+    import sys
+
+    if namespace.jobs < 1:
+        parser.error('render-manifest: --jobs must be 1 or greater.')
+    if not os.path.exists(namespace.manifest):
+        parser.error(f'render-manifest: could not find manifest file: "{namespace.manifest}"')
+
+    from .conf import DEFAULT_SETTINGS
+    from .maker import ChromePdfMaker
+
+    kwargs = _get_generate_pdf_kwargs(parser, namespace)
+    pdf_kwargs = _get_pdf_kwargs(parser, namespace)
+
+    profiles = {}
+    profile_makers = {}
+    if namespace.profiles is not None:
+        if not os.path.exists(namespace.profiles):
+            parser.error(f'render-manifest: could not find profiles file: "{namespace.profiles}"')
+        try:
+            with open(namespace.profiles, 'r', encoding='utf8') as f:
+                profiles = json.load(f)
+        except json.JSONDecodeError:
+            parser.error('--profiles: must be a path to a file containing valid JSON.')
+        if not isinstance(profiles, dict) or not all(isinstance(p, dict) for p in profiles.values()):
+            parser.error('--profiles: must be a path to a file containing a JSON dict of profile name => dict of settings.')
+
+        setting_names = {k.lower() for k in DEFAULT_SETTINGS}
+        for name, profile in profiles.items():
+            unknown = sorted(k for k in profile if k not in setting_names and k != 'pdf_kwargs')
+            if unknown:
+                parser.error(f'--profiles: profile "{name}" has unknown settings: {", ".join(unknown)}')
+            profile_kwargs = {k: v for k, v in profile.items() if k != 'pdf_kwargs'}
+            profile_makers[name] = ChromePdfMaker(**{**kwargs, **profile_kwargs})
+
+    from .batch import read_render_manifest, run_jobs
+    maker = ChromePdfMaker(**kwargs)
+
+    failures = 0
+    output = sys.stdout if namespace.results is None else open(namespace.results, 'w', encoding='utf8')
+    try:
+        with open(namespace.manifest, 'r', encoding='utf8') as f:
+            jobs = read_render_manifest(f, pdf_kwargs, profiles)
+            for result in run_jobs(maker, jobs, namespace.jobs, profile_makers):
+                if result['status'] != 'ok':
+                    failures += 1
+                output.write(json.dumps(result, default=str) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if failures:
+        sys.exit(1)
+
+
+def _command_serve(parser, namespace):
+    """Run a render daemon on a Unix socket until interrupted or terminated."""
+
+    import signal
+    import socket
+    import sys
+
+    if namespace.pool_size < 1:
+        parser.error('serve: --pool-size must be 1 or greater.')
+    if not hasattr(socket, 'AF_UNIX'):
+        parser.error('serve: Unix sockets are not supported on this platform.')
+
+    kwargs = _get_generate_pdf_kwargs(parser, namespace)
+    # the daemon renders with its own browsers, even if the DAEMON or RENDER_SERVERS settings are set.
+    kwargs['daemon'] = None
+    kwargs['render_servers'] = []
+
+    from .daemon import serve
+    from .maker import ChromePdfMaker
+    maker = ChromePdfMaker(**kwargs)
+
+    # exit cleanly on "kill" as well as Ctrl+C, so that the browsers are closed and the socket file is removed.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f'Listening on "{namespace.socket}", with {namespace.pool_size} browser(s). Press Ctrl+C to stop.', flush=True)
+    try:
+        serve(namespace.socket, maker, namespace.pool_size)
+    except KeyboardInterrupt:
+        pass
+    except OSError as ex:
+        print(f'serve: {ex}', file=sys.stderr)
+        sys.exit(1)
+
+
+def _command_http(parser, namespace):
+    """Run an HTTP render server until interrupted or terminated."""
+
+    import signal
+    import sys
+
+    if namespace.pool_size < 1:
+        parser.error('http: --pool-size must be 1 or greater.')
+    if namespace.queue_size < 0:
+        parser.error('http: --queue-size must be 0 or greater.')
+
+    kwargs = _get_generate_pdf_kwargs(parser, namespace)
+    # the server renders with its own browsers, even if the DAEMON or RENDER_SERVERS settings are set.
+    kwargs['daemon'] = None
+    kwargs['render_servers'] = []
+
+    from .httpserver import serve_http
+    from .maker import ChromePdfMaker
+    maker = ChromePdfMaker(**kwargs)
+
+    # exit cleanly on "kill" as well as Ctrl+C, so that the browsers are closed.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f'Listening on http://{namespace.host}:{namespace.port}, with {namespace.pool_size} browser(s). '
+          'Press Ctrl+C to stop.', flush=True)
+    try:
+        serve_http(namespace.host, namespace.port, maker, namespace.pool_size, namespace.queue_size)
+    except KeyboardInterrupt:
+        pass
+    except OSError as ex:
+        print(f'http: {ex}', file=sys.stderr)
+        sys.exit(1)
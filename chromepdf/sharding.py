@@ -0,0 +1,322 @@
+"""
+A client that spreads renders across many HTTP render servers (see chromepdf.httpserver), to scale horizontally.
+Use it via ChromePdfMaker(render_servers=['http://render1:8181', 'http://render2:8181']), or the RENDER_SERVERS setting.
+
+Each HTML string is sent to a server chosen by consistent hashing on its fingerprint, so that identical HTML goes to
+the same server, and adding or removing a server only moves the HTML that hashes to it.
+A server is skipped if it already has more than its share of the outstanding requests (consistent hashing with
+bounded loads), if it is busy (503), or if it could not be connected to in time. Unreachable servers are skipped until
+their /health endpoint, which is checked in the background, responds again.
+A render that a server accepted is never sent to another server, even if the server then fails or does not respond in
+time, since it may already be rendering it. The render raises ChromePdfException instead.
+"""
+
+import bisect
+import hashlib
+import http.client
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.httpapi import PDF_KWARGS_HEADER
+from chromepdf.slowrenders import fingerprint_html
+
+
+# The number of points that each server has on the hash ring. More points spread the documents more evenly.
+DEFAULT_REPLICAS = 100
+
+# How far above the average number of outstanding requests a server may go, before its documents go elsewhere.
+DEFAULT_LOAD_FACTOR = 1.25
+
+# Seconds that an unreachable server is skipped for, before its /health endpoint is checked again.
+DEFAULT_RETRY_INTERVAL = 5
+
+# Seconds to wait for a connection to a server, and for each read of its response. A render may take several reads.
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 300
+
+# The size of the chunks that a PDF is copied in, when it is written to a file.
+CHUNK_SIZE = 1024 * 1024
+
+_clients = {}  # tuple of urls => ShardedRenderClient, shared by every ChromePdfMaker with the same RENDER_SERVERS
+_clients_lock = threading.Lock()
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.sha256(key.encode('utf8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """A consistent hash ring, which maps keys to nodes such that adding or removing a node moves few keys."""
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        self.nodes = list(nodes)
+        self._ring = sorted((_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(replicas))
+        self._hashes = [h for h, _node in self._ring]
+
+    def get_nodes(self, key):
+        """Return every node, in the order that they follow the key around the ring. The first one owns the key."""
+
+        start = bisect.bisect(self._hashes, _hash(key))
+        nodes = []
+        for i in range(len(self._ring)):
+            node = self._ring[(start + i) % len(self._ring)][1]
+            if node not in nodes:
+                nodes.append(node)
+                if len(nodes) == len(self.nodes):
+                    break
+        return nodes
+
+
+class RenderServer:
+    """A render server that the client sends requests to, with its keep-alive connections, load, and health."""
+
+    def __init__(self, url, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise ValueError(f'A render server url must be of the form http://host:port, not: "{url}"')
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.outstanding = 0  # requests that have been sent and not yet answered
+        self.renders = 0  # PDFs successfully rendered
+        self.healthy = True
+        self.failed_at = None  # monotonic time of the last failure to reach the server
+        self._idle = []  # keep-alive connections that are not in use
+        self._checking_health = False  # whether a background health check is running
+        self._lock = threading.Lock()
+
+    def request(self, method, path, body=None, headers=None, output=None):
+        """
+        Send a request, and return its (status, body). If an output file is given, the body of a 200 response is
+        copied to it in chunks instead, and its size is returned as the body.
+        Raise OSError if the server could not be connected to, in which case it never received the request.
+        Raise ChromePdfException if the connection failed, or timed out, once the request was sent, since the server may
+        already be acting on it.
+        """
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None:
+            try:
+                return self._request(conn, method, path, body, headers, output)
+            except (ConnectionError, http.client.RemoteDisconnected):
+                pass  # the server closed the idle connection before reading the request. Try again with a new one.
+            except (OSError, http.client.HTTPException) as ex:
+                raise _get_request_exception(ex) from ex
+        conn = self._connect()
+        try:
+            return self._request(conn, method, path, body, headers, output)
+        except (OSError, http.client.HTTPException) as ex:
+            raise _get_request_exception(ex) from ex
+
+    def _connect(self):
+        """Return a new connection to the server, which waits up to read_timeout seconds for each read."""
+
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def _request(self, conn, method, path, body, headers, output):
+        try:
+            conn.request(method, path, body, headers or {})
+            response = conn.getresponse()
+            if output is None or response.status != 200:
+                data = response.read()
+            else:
+                data = _copy_response(response, output)
+        except BaseException:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            with self._lock:
+                self._idle.append(conn)
+        return response.status, data
+
+    def is_available(self, retry_interval):
+        """
+        Return True if the server is healthy. If it has been unhealthy for retry_interval seconds, start checking its
+        /health endpoint in the background, so that renders do not wait on it, and later renders may use it again.
+        """
+
+        if self.healthy:
+            return True
+        if time.monotonic() - self.failed_at >= retry_interval:
+            with self._lock:
+                start = not self._checking_health
+                self._checking_health = True
+            if start:
+                threading.Thread(target=self._check_health_in_background, daemon=True).start()
+        return False
+
+    def _check_health_in_background(self):
+        try:
+            self.check_health()
+        finally:
+            with self._lock:
+                self._checking_health = False
+
+    def check_health(self):
+        """Request the server's /health endpoint, record whether it is healthy, and return it."""
+
+        try:
+            status, _data = self.request('GET', '/health')
+            healthy = status == 200
+        except (OSError, ChromePdfException):
+            healthy = False
+        if healthy:
+            self.healthy = True
+        else:
+            self.mark_unhealthy()
+        return healthy
+
+    def mark_unhealthy(self):
+        self.healthy = False
+        self.failed_at = time.monotonic()
+
+
+def _get_request_exception(ex):
+    return ChromePdfException(f'The connection failed, or timed out, after the request was sent: {ex}')
+
+
+def _copy_response(response, output):
+    """Copy a response's body to a file in chunks, and return its size."""
+
+    size = 0
+    try:
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                return size
+            output.write(chunk)
+            size += len(chunk)
+    except (OSError, http.client.HTTPException) as ex:
+        raise ChromePdfException(f'The connection failed while receiving the PDF: {ex}') from ex
+
+
+class ShardedRenderClient:
+    """
+    Sends renders to many HTTP render servers. See the module's docstring.
+    urls: The base url of each render server, EG: "http://render1:8181".
+    connect_timeout: Seconds to wait to connect to a server, before trying the next one.
+    read_timeout: Seconds to wait for each read of a server's response, before giving up on the render.
+        None waits forever.
+    A RenderResult passed to generate_pdf() only receives pdf_bytes. Its timings stay empty, since the server streams
+    the PDF before its render's timings are known.
+    """
+
+    def __init__(self, urls, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 replicas=DEFAULT_REPLICAS, load_factor=DEFAULT_LOAD_FACTOR, retry_interval=DEFAULT_RETRY_INTERVAL):
+        if not urls:
+            raise ValueError('A ShardedRenderClient requires at least one render server url.')
+        self.servers = {url: RenderServer(url, connect_timeout, read_timeout) for url in urls}
+        self.load_factor = load_factor
+        self.retry_interval = retry_interval
+        self._ring = HashRing(urls, replicas)
+        self._lock = threading.Lock()
+
+    def generate_pdf(self, html, pdf_kwargs=None, result=None, output=None):
+        """
+        Generate a PDF from an html string, and return its bytes. If an output file is given, write the PDF to it
+        instead, and return its size.
+        """
+
+        body = html.encode('utf8')
+        headers = {'Content-Type': 'text/html; charset=utf-8', PDF_KWARGS_HEADER: json.dumps(pdf_kwargs or {})}
+
+        errors = []
+        for server in self._get_candidates(fingerprint_html(html)):
+            with self._track(server):
+                try:
+                    status, data = server.request('POST', '/pdf', body, headers, output)
+                except OSError as ex:
+                    server.mark_unhealthy()  # it never received the request, so try the next server.
+                    errors.append(f'{server.url}: {ex}')
+                    continue
+                except ChromePdfException as ex:
+                    server.mark_unhealthy()
+                    raise ChromePdfException(f'{server.url} failed to render the PDF: {ex}') from ex
+
+            if status == 200:
+                with self._lock:
+                    server.renders += 1
+                if result is not None:
+                    result.pdf_bytes = data if output is None else None
+                return data
+            elif status == 503:
+                errors.append(f'{server.url}: busy')
+                continue
+
+            message = _get_error_message(data)
+            if status == 400:
+                raise ValueError(message)
+            raise ChromePdfException(f'{server.url} failed to render the PDF: {message}')
+
+        raise ChromePdfException(f'No render server could render the PDF. {"; ".join(errors)}')
+
+    def generate_pdf_url(self, url, pdf_kwargs=None, result=None):
+        raise ChromePdfException('generate_pdf_url() is not supported with RENDER_SERVERS. Use generate_pdf().')
+
+    def check_health(self):
+        """Check the /health endpoint of every server, and return a dict of url => whether it is healthy."""
+
+        return {url: server.check_health() for url, server in self.servers.items()}
+
+    def _get_candidates(self, key):
+        """
+        Return the servers to try for a key, in order. The first is the first available server in the key's ring
+        order that is not over its share of the load. Then come the other available servers, in ring order.
+        If no server is available, every server is tried anyway.
+        """
+
+        servers = [self.servers[url] for url in self._ring.get_nodes(key)]
+        available = [server for server in servers if server.is_available(self.retry_interval)] or servers
+
+        with self._lock:
+            total = sum(server.outstanding for server in available) + 1
+            limit = math.ceil(self.load_factor * total / len(available))
+            first = next((server for server in available if server.outstanding + 1 <= limit), available[0])
+        return [first] + [server for server in available if server is not first]
+
+    @contextmanager
+    def _track(self, server):
+        """Count a request as outstanding on the server for the duration of the context."""
+
+        with self._lock:
+            server.outstanding += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                server.outstanding -= 1
+
+
+def _get_error_message(data):
+    try:
+        return json.loads(data.decode('utf8'))['error']
+    except (ValueError, KeyError, TypeError):
+        return data.decode('utf8', 'replace')
+
+
+def get_sharded_client(urls, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+    """
+    Return the ShardedRenderClient for a list of urls and timeouts, so that its connections and server health are
+    reused.
+    """
+
+    key = (tuple(urls), connect_timeout, read_timeout)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = ShardedRenderClient(urls, connect_timeout, read_timeout)
+        return client
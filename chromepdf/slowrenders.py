@@ -0,0 +1,119 @@
+"""
+Logging of slow renders, so that slow templates can be found and replayed offline.
+
+Each render of ChromePdfMaker.generate_pdf() that takes at least SLOW_RENDER_THRESHOLD seconds is logged as a single
+line of JSON to the "chromepdf.slow_renders" logger, with a warning level. The HTML itself is not logged, only its
+SHA-256 fingerprint. If SLOW_RENDER_SPOOL_DIR is set, a copy of the HTML is also saved to that folder, named after
+its fingerprint, and only the most recently seen SLOW_RENDER_SPOOL_LIMIT files are kept.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+
+from chromepdf.pdfconf import clean_pdf_kwargs
+
+
+logger = logging.getLogger('chromepdf.slow_renders')
+
+DEFAULT_SPOOL_LIMIT = 100
+
+# Matches each page object's dictionary, but not the /Type /Pages dictionaries that group them.
+_PDF_PAGE_RE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+def fingerprint_html(html):
+    """Return the SHA-256 hex digest of an HTML string, as encoded in UTF-8."""
+
+    return hashlib.sha256(html.encode('utf8')).hexdigest()
+
+
+def count_pdf_pages(pdf_bytes):
+    """
+    Return the number of pages in a PDF generated by Chrome.
+    This counts page objects without parsing the file, so it does not work for PDFs whose objects are compressed.
+    """
+
+    return len(_PDF_PAGE_RE.findall(pdf_bytes))
+
+
+def spool_html(spool_dir, fingerprint, html, limit=DEFAULT_SPOOL_LIMIT):
+    """
+    Save the HTML to "<fingerprint>.html" in the spool folder, and return its path.
+    Then delete the least recently saved files, so that no more than `limit` files remain.
+    """
+
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, f'{fingerprint}.html')
+    if os.path.exists(path):
+        os.utime(path)  # the same HTML was saved before. Mark it as recently seen.
+    else:
+        temp_path = f'{path}.{uuid.uuid4().hex[:8]}.partial'
+        with open(temp_path, 'w', encoding='utf8') as f:
+            f.write(html)
+        os.replace(temp_path, path)
+
+    _prune_spool(spool_dir, limit)
+    return path
+
+
+def _prune_spool(spool_dir, limit):
+    """Delete all but the `limit` most recently modified HTML files in the spool folder."""
+
+    entries = []
+    for name in os.listdir(spool_dir):
+        if name.endswith('.html'):
+            try:
+                entries.append((os.path.getmtime(os.path.join(spool_dir, name)), name))
+            except FileNotFoundError:
+                pass  # deleted by another process that is also pruning
+
+    entries.sort(reverse=True)
+    for _mtime, name in entries[limit:]:
+        try:
+            os.remove(os.path.join(spool_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def get_slow_render_record(html, pdf_kwargs, timings, pdf_bytes=None, error=None, pdf_size=None):
+    """
+    Return a JSON-serializable dict describing a render, for the slow render log.
+    pdf_size: The size of the PDF, if it was streamed to a file rather than returned as pdf_bytes.
+    """
+
+    try:
+        pdf_kwargs = clean_pdf_kwargs(**(pdf_kwargs or {}))
+    except Exception:
+        pass  # invalid pdf_kwargs (which likely made the render fail) are logged as they were given.
+
+    return {
+        'event': 'slow_render',
+        'seconds': timings.get('render'),
+        'timings': timings,
+        'html_bytes': len(html.encode('utf8')),
+        'html_sha256': fingerprint_html(html),
+        'pdf_kwargs': pdf_kwargs,
+        'pages': count_pdf_pages(pdf_bytes) if pdf_bytes is not None else None,
+        'pdf_bytes': len(pdf_bytes) if pdf_bytes is not None else pdf_size,
+        'error': str(error) if error is not None else None,
+    }
+
+
+def log_slow_render(html, pdf_kwargs, timings, pdf_bytes=None, error=None, spool_dir=None,
+                    spool_limit=DEFAULT_SPOOL_LIMIT, pdf_size=None):
+    """Log a slow render as a line of JSON, after saving its HTML to the spool folder (if any). Return the record."""
+
+    record = get_slow_render_record(html, pdf_kwargs, timings, pdf_bytes, error, pdf_size)
+    record['spool_path'] = None
+    if spool_dir is not None:
+        try:
+            record['spool_path'] = spool_html(spool_dir, record['html_sha256'], html, spool_limit)
+        except OSError as ex:
+            record['spool_error'] = str(ex)
+
+    logger.warning(json.dumps(record, default=str))
+    return record
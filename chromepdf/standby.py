@@ -0,0 +1,145 @@
+"""
+A standby browser, launched in the background before it is needed, so that a render can take it without waiting for
+the chromedriver and Chrome to start. Used by ChromePdfMaker when the STANDBY_BROWSER setting is enabled.
+
+Each render takes the standby browser, and quits it afterwards, as it would a browser it launched itself. A new
+standby browser is launched as soon as one is taken, so at most one browser is idle at a time. If a render arrives
+while the standby browser is still launching, it waits for that launch, which began earlier than its own would.
+"""
+
+import atexit
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from chromepdf import metrics
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import phase
+from chromepdf.webdrivermakers import get_webdriver_maker
+
+
+_standby_browsers = {}  # key => StandbyBrowser, shared by every ChromePdfMaker with the same browser settings
+_standby_browsers_lock = threading.Lock()
+
+
+class _Launch:
+    """Launches a browser via get_webdriver_maker(), on a background thread."""
+
+    def __init__(self, clazz, webdriver_kwargs):
+        self._stack = ExitStack()
+        self._wrapper = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(clazz, webdriver_kwargs), daemon=True)
+        self._thread.start()
+
+    def _run(self, clazz, webdriver_kwargs):
+        try:
+            self._wrapper = self._stack.enter_context(get_webdriver_maker(clazz, **webdriver_kwargs))
+        except Exception as ex:
+            self._error = ex
+
+    def is_ready(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        """
+        Wait for the launch, and return its (ExitStack, webdriver maker). Closing the ExitStack quits the browser.
+        Raise the launch's exception if it failed.
+        """
+
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._stack, self._wrapper
+
+    def discard(self):
+        """Wait for the launch, and quit the browser if it succeeded."""
+
+        self._thread.join()
+        try:
+            self._stack.close()
+        except ChromePdfException:
+            pass  # the browser already exited.
+
+
+class StandbyBrowser:
+    """Keeps one browser launched in the background, for the next render to take. See the module's docstring."""
+
+    def __init__(self, clazz, webdriver_kwargs):
+        self._clazz = clazz
+        self._webdriver_kwargs = webdriver_kwargs
+        self._lock = threading.Lock()
+        self._closed = False
+        self._standby = _Launch(clazz, webdriver_kwargs)
+
+    @contextmanager
+    def webdriver_maker(self):
+        """
+        Context manager that takes the standby browser's webdriver maker, and launches a new standby browser.
+        The browser is quit when the context exits. If the standby browser failed to launch, no longer responds, or the
+        StandbyBrowser is closed, a browser is launched for the context instead.
+        """
+
+        with self._lock:
+            launch = self._standby
+            self._standby = None if self._closed else _Launch(self._clazz, self._webdriver_kwargs)
+
+        stack = None
+        if launch is not None:
+            start = time.monotonic()
+            try:
+                with phase('standby_wait'):
+                    stack, wrapper = launch.result()
+            except ChromePdfException:
+                pass  # launch one here instead, which will raise the exception if the failure was not a fluke.
+            metrics.STANDBY_WAIT_SECONDS.observe(time.monotonic() - start)
+            if stack is not None and not wrapper.is_alive():
+                metrics.CHROMEDRIVER_RESTARTS.inc(source='standby')
+                launch.discard()  # the browser exited while it waited. Launch one here instead.
+                stack = None
+
+        if stack is None:
+            stack = ExitStack()
+            wrapper = stack.enter_context(get_webdriver_maker(self._clazz, **self._webdriver_kwargs))
+        with stack:
+            yield wrapper
+
+    def is_ready(self):
+        """Return True if a standby browser has finished launching, and is waiting to be taken."""
+
+        with self._lock:
+            return self._standby is not None and self._standby.is_ready()
+
+    def close(self):
+        """Quit the standby browser. Renders that use the StandbyBrowser afterwards launch their own browsers."""
+
+        with self._lock:
+            launch, self._standby = self._standby, None
+            self._closed = True
+        if launch is not None:
+            launch.discard()
+
+
+def get_standby_browser(clazz, webdriver_kwargs):
+    """
+    Return the StandbyBrowser for a webdriver maker class and its kwargs, so that it is shared by every ChromePdfMaker
+    with the same settings, including those created for a single render.
+    """
+
+    key = (clazz, repr(sorted(webdriver_kwargs.items())))
+    with _standby_browsers_lock:
+        standby_browser = _standby_browsers.get(key)
+        if standby_browser is None:
+            standby_browser = _standby_browsers[key] = StandbyBrowser(clazz, webdriver_kwargs)
+        return standby_browser
+
+
+@atexit.register
+def close_standby_browsers():
+    """Quit every standby browser returned by get_standby_browser(). Called when the interpreter exits."""
+
+    with _standby_browsers_lock:
+        standby_browsers = list(_standby_browsers.values())
+        _standby_browsers.clear()
+    for standby_browser in standby_browsers:
+        standby_browser.close()
@@ -0,0 +1,76 @@
+"""
+Tracing spans around the phases of PDF generation.
+
+By default, spans are sent to OpenTelemetry if the `opentelemetry-api` package is installed, and are no-ops otherwise.
+Any object with a start_span(name, attributes=None) method returning a context manager may be used via set_tracer().
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class NoopSpan:
+    """A span that records nothing."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+class NoopTracer:
+    """A tracer whose spans record nothing. Used when OpenTelemetry is not installed."""
+
+    _span = NoopSpan()
+
+    @contextmanager
+    def start_span(self, name, attributes=None):
+        yield self._span
+
+
+class OpenTelemetryTracer:
+    """A tracer that creates spans via the OpenTelemetry API, as children of the current span (if any)."""
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer('chromepdf')
+        self._tracer = tracer
+
+    def start_span(self, name, attributes=None):
+        # OpenTelemetry records any exception on the span, and sets the span's status to error.
+        return self._tracer.start_as_current_span(name, attributes=attributes)
+
+
+def is_opentelemetry_installed():
+    "Return True if the OpenTelemetry API is installed."
+
+    try:
+        import opentelemetry.trace  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Return the tracer used by ChromePDF, creating the default one if set_tracer() has not been called."""
+
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = OpenTelemetryTracer() if is_opentelemetry_installed() else NoopTracer()
+    return _tracer
+
+
+def set_tracer(tracer):
+    """Set the tracer used by ChromePDF. Pass None to restore the default."""
+
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
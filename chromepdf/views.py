@@ -0,0 +1,11 @@
+from chromepdf.conf import get_http_response
+from chromepdf.metrics import CONTENT_TYPE, REGISTRY
+
+
+def metrics_view(request):
+    """
+    A Django view that returns ChromePDF's metrics in the Prometheus text format, for scraping. Add it to your urls:
+    path('metrics/chromepdf/', chromepdf.views.metrics_view)
+    """
+
+    return get_http_response(REGISTRY.exposition(), CONTENT_TYPE)
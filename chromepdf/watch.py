@@ -0,0 +1,145 @@
+"""
+Re-generation of a PDF each time its HTML, its pdf_kwargs JSON, or the local files it references are saved, using a
+browser that is kept open between renders. Intended for developing templates.
+To execute, run:
+> python -m chromepdf generate-pdf --watch path/to/file.html path/to/file.pdf
+"""
+
+import json
+import os
+import re
+import time
+from contextlib import ExitStack
+from urllib.parse import unquote, urlsplit
+
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import RenderResult
+
+
+# Seconds between checks of the watched files' modification times.
+POLL_INTERVAL = 0.05
+
+# Urls in src="", href="", and poster="" attributes, and in CSS url()s.
+_ASSET_URL_RES = (
+    re.compile(r'\b(?:src|href|poster)\s*=\s*(["\'])(?P<url>[^"\'>]+)\1', re.IGNORECASE),
+    re.compile(r'\burl\(\s*(["\']?)(?P<url>[^"\')]+?)\1\s*\)', re.IGNORECASE),
+)
+
+
+def find_local_assets(html, base_dir):
+    """
+    Return the sorted paths of the existing local files referenced by the HTML: relative urls (resolved against
+    base_dir), absolute paths, and file: urls. Urls of other schemes (http:, data:, etc) are ignored.
+    """
+
+    paths = set()
+    for regex in _ASSET_URL_RES:
+        for match in regex.finditer(html):
+            url = urlsplit(match.group('url').strip())
+            if url.scheme not in ('', 'file') or url.netloc or not url.path:
+                continue
+            path = os.path.join(base_dir, unquote(url.path))  # absolute paths are left unchanged by join()
+            if os.path.isfile(path):
+                paths.add(os.path.normpath(path))
+    return sorted(paths)
+
+
+def get_mtimes(paths):
+    """Return a dict of path => (mtime_ns, size) of each file, or None for files that do not exist."""
+
+    mtimes = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            mtimes[path] = None
+        else:
+            mtimes[path] = (stat.st_mtime_ns, stat.st_size)
+    return mtimes
+
+
+def read_pdf_kwargs_json(path):
+    """Return the pdf_kwargs dict in a JSON file. Raise ValueError if it does not contain a JSON dict."""
+
+    with open(path, 'r', encoding='utf8') as f:
+        pdf_kwargs = json.load(f)
+    if not isinstance(pdf_kwargs, dict):
+        raise ValueError(f'"{path}" must contain a JSON dict of pdf_kwargs.')
+    return pdf_kwargs
+
+
+def watch(maker, inpath, outpath, pdf_kwargs_path=None, interval=POLL_INTERVAL):
+    """
+    Generate a PDF from the HTML file at inpath, and write it to outpath. Then, each time the HTML file, the pdf_kwargs
+    JSON file, or a local file referenced by the HTML is modified, generate it again. Files are checked for changes
+    every `interval` seconds. A single ChromePdfSession is used for every render, so Chrome only starts once.
+
+    Yield a result dict after each render, forever, with the keys:
+    status: "ok" or "error".
+    seconds: The time taken to render, including reading and writing the files.
+    timings: The time spent in each phase of the render. See RenderResult.
+    error: The error message, if the render failed.
+    changed: The paths of the files whose changes started the render. For the first render, this is just inpath.
+    watched: The paths of all the files that are watched for the next render.
+
+    A failed render does not stop the watching. If the browser failed, a new one is started for the next render.
+    Close the generator (EG, by breaking out of a for loop) to stop watching and quit the browser.
+    """
+
+    with ExitStack() as stack:
+        session = None
+        changed = [inpath]
+        inputs = [inpath] + ([pdf_kwargs_path] if pdf_kwargs_path is not None else [])
+        while True:
+            # Record the files' states before reading them, so that saves made during a render start another one.
+            mtimes = get_mtimes(inputs)
+            start = time.monotonic()
+            result = {'status': 'ok', 'timings': {}, 'error': None, 'changed': changed}
+            try:
+                with open(inpath, 'r', encoding='utf8') as f:
+                    html = f.read()
+                mtimes.update(get_mtimes(find_local_assets(html, os.path.dirname(os.path.abspath(inpath)))))
+                pdf_kwargs = read_pdf_kwargs_json(pdf_kwargs_path) if pdf_kwargs_path is not None else None
+
+                if session is None:
+                    session = stack.enter_context(maker.session())
+                render_result = RenderResult()
+                pdf_bytes = session.generate_pdf(html, pdf_kwargs, result=render_result)
+                _write_file(outpath, pdf_bytes)
+                result['timings'] = render_result.timings
+            except Exception as ex:
+                result.update(status='error', error=str(ex))
+                if isinstance(ex, ChromePdfException):
+                    # the browser may be in a bad state. Start a new one for the next render.
+                    stack.close()
+                    session = None
+
+            result.update(seconds=time.monotonic() - start, watched=list(mtimes))
+            yield result
+            changed = _wait_for_changes(mtimes, inpath, interval)
+
+
+def _wait_for_changes(mtimes, inpath, interval):
+    """
+    Wait until any of the files in the dict of path => (mtime_ns, size) has changed, and return their paths.
+    Changes are not reported while the HTML file is missing, since editors may briefly remove a file while saving it.
+    """
+
+    while True:
+        time.sleep(interval)
+        current = get_mtimes(mtimes)
+        changed = [path for path, mtime in current.items() if mtime != mtimes[path]]
+        if changed and current[inpath] is not None:
+            return changed
+
+
+def _write_file(path, data):
+    """Write the bytes to a file under a temporary name and then rename it, so PDF viewers never see a partial file."""
+
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    temp_path = f'{path}.partial'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
@@ -5,13 +5,22 @@ import platform
 import shlex
 import socket
 import subprocess
+import threading
+import time
 import urllib
 import warnings
 from contextlib import contextmanager
 
+from chromepdf import metrics
+from chromepdf.chrometrace import LOGGING_PREFS, PERF_LOGGING_PREFS, get_trace_events, get_trace_path, write_trace
 from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import phase
 from chromepdf.pdfconf import clean_pdf_kwargs
-from chromepdf.webdrivers import _get_chrome_webdriver_args, _get_chrome_webdriver_kwargs, devtool_command
+from chromepdf.resources import ProcessTreeTracker, get_process_tree_tracker
+from chromepdf.tracing import get_tracer
+from chromepdf.webdrivers import (
+    _clear_profile_state, _get_chrome_webdriver_args, _get_chrome_webdriver_kwargs, acquire_profile_slot,
+    devtool_command)
 
 
 def is_selenium_installed():
@@ -43,12 +52,16 @@ def get_webdriver_maker(clazz, **kwargs):
     wrapper = None
     try:
         # Init whichever webdriver maker class we will be using.
-        wrapper = clazz(**kwargs)
+        with get_tracer().start_span('chromepdf.webdriver_maker_init', {'chromepdf.webdriver_maker': clazz.__name__}):
+            wrapper = clazz(**kwargs)
         yield wrapper
 
     except Exception as ex:
-        chrome_path = kwargs.get('chrome_path')
-        chromedriver_path = kwargs.get('chromedriver_path')
+        # the paths are not used when attaching to an already-running chromedriver or Chrome.
+        is_chromedriver_running = kwargs.get('chromedriver_url') is not None
+        is_chrome_running = is_chromedriver_running or kwargs.get('chrome_debugger_address') is not None
+        chrome_path = None if is_chrome_running else kwargs.get('chrome_path')
+        chromedriver_path = None if is_chromedriver_running else kwargs.get('chromedriver_path')
         if chrome_path and not os.path.exists(chrome_path):
             raise ChromePdfException(f'Could not find a chrome_path path at: {chrome_path}') from ex
         elif chromedriver_path and not os.path.exists(chromedriver_path):
@@ -73,48 +86,156 @@ class SeleniumWebdriverMaker:
     def __init__(self, **kwargs):
         self.chromedriver_path = kwargs.pop('chromedriver_path', None)
         self.chrome_path = kwargs.pop('chrome_path', None)
-        self.chrome_args = _get_chrome_webdriver_args(**kwargs)
-
-        chrome_webdriver_kwargs = _get_chrome_webdriver_kwargs(self.chrome_path, self.chromedriver_path, **kwargs)
-        from selenium import webdriver
-        self.driver = webdriver.Chrome(**chrome_webdriver_kwargs)
-
-    def generate_pdf(self, html, pdf_kwargs):
-        "Return the bytes of a PDF generated from HTML."
-
-        pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+        # an already-running chromedriver to create the session with, rather than having Selenium start one.
+        self.chromedriver_url = kwargs.pop('chromedriver_url', None)
+        chromedriver_service = kwargs.pop('_chromedriver_service', None)
+        if self.chromedriver_url is None and chromedriver_service is not None:
+            self.chromedriver_url = chromedriver_service.get_url()
+        # an already-running Chrome for the chromedriver to attach to, EG: "localhost:9222".
+        self.chrome_debugger_address = kwargs.get('chrome_debugger_address')
+        self.wait_for = kwargs.pop('wait_for', None)
+        self.wait_timeout = kwargs.pop('wait_timeout', None)
+        self.javascript = kwargs.pop('javascript', True)
+        self.collect_performance_metrics = kwargs.pop('collect_performance_metrics', False)
+        self.performance_metrics = None  # Chrome's metrics for the most recent render, if collected
+        self.trace_dir = kwargs.pop('trace_dir', None)
+        self.trace_threshold = kwargs.pop('trace_threshold', None)
+        self.trace_path = None  # path of the trace file written for the most recent render, if any
+
+        # CPU and memory used by the chromedriver and Chrome processes, if supported on this OS. See chromepdf.resources.
+        self.resource_tracker = None
+        self.render_resources = None  # usage during the most recent render
+        self.browser_resources = None  # usage over the lifetime of the browser, recorded when it quits
+
+        user_data_dir = kwargs.pop('user_data_dir', None)
+        self.profile_slot = acquire_profile_slot(user_data_dir) if user_data_dir else None
+        if self.profile_slot is not None:
+            kwargs['_profile_dir'] = self.profile_slot.path
+
+        if self.trace_dir is not None:
+            kwargs['_trace'] = True
 
-        # we could put the html here. but data urls in Chrome are limited to 2MB.
-        dataurl = "data:text/html;charset=utf-8,"
-        self.driver.get(dataurl)
-
-        # append our html. theoretically no length limit.
-        html = html.replace('\'', '\\\'')  # We wrap the string in '', so escape all other '
-        html = html.replace('\n', ' \\\n')  # Allow newlines within '', and avoid concatenating words
-        html = html.replace('\r', ' \\\r')  # Allow newlines within '', and avoid concatenating words
-        # we do NOT need to escape any other chars (quotes, etc), including unicode
-        self.driver.execute_script("document.write('{}')".format(html))
+        try:
+            self.chrome_args = _get_chrome_webdriver_args(**kwargs)
+
+            chrome_webdriver_kwargs = _get_chrome_webdriver_kwargs(self.chrome_path, self.chromedriver_path,
+                                                                   chromedriver_url=self.chromedriver_url, **kwargs)
+            from selenium import webdriver
+            with phase('browser_launch'):  # Selenium starts the chromedriver and Chrome together.
+                if self.chromedriver_url is not None:
+                    self.driver = webdriver.Remote(**chrome_webdriver_kwargs)
+                else:
+                    self.driver = webdriver.Chrome(**chrome_webdriver_kwargs)
+                if self.chrome_debugger_address is not None:
+                    self._open_tab()
+            service_process = getattr(getattr(self.driver, 'service', None), 'process', None)
+            self.resource_tracker = get_process_tree_tracker(getattr(service_process, 'pid', None))
+        except Exception:
+            if self.profile_slot is not None:
+                self.profile_slot.release()
+            raise
+
+    def generate_pdf(self, html, pdf_kwargs, outfile=None):
+        """
+        Return the bytes of a PDF generated from HTML.
+        If an outfile is given, instead stream the PDF to it, and return the number of bytes written.
+        """
+
+        with _track_render_resources(self), _capture_trace(self):
+            pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+            if self.collect_performance_metrics:
+                self._devtool_command('Performance.enable')
+
+            # we could put the html here. but data urls in Chrome are limited to 2MB.
+            dataurl = "data:text/html;charset=utf-8,"
+            with phase('navigate'):
+                self.driver.get(dataurl)
+
+            with phase('load_content'):
+                if self.javascript:
+                    # append our html. theoretically no length limit.
+                    self.driver.execute_script(_get_document_write_script(html))
+                else:
+                    _set_document_content(self._devtool_command, html)
+
+            _wait_for_ready(self._devtool_command, self.wait_for, self.wait_timeout)
+            return self._get_pdf_bytes(pdf_kwargs, outfile)
+
+    def generate_pdf_url(self, url, pdf_kwargs, outfile=None):
+        """
+        Return the bytes of a PDF generated from a URL.
+        If an outfile is given, instead stream the PDF to it, and return the number of bytes written.
+        """
+
+        with _track_render_resources(self), _capture_trace(self):
+            warnings.warn("generate_pdf_url() is deprecated, use generate_pdf() instead.", DeprecationWarning)
+
+            pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+            if self.collect_performance_metrics:
+                self._devtool_command('Performance.enable')
+
+            if not self.javascript:
+                self._devtool_command('Emulation.setScriptExecutionDisabled', {'value': True})
+            with phase('navigate'):
+                self.driver.get(url)
+
+            _wait_for_ready(self._devtool_command, self.wait_for, self.wait_timeout)
+            return self._get_pdf_bytes(pdf_kwargs, outfile)
+
+    def _open_tab(self):
+        """
+        Open a new tab in an attached Chrome, and switch to it. Sessions attached to the same Chrome would otherwise
+        all render in its first tab at once. If the tab cannot be opened, end the session.
+        """
 
-        return self._get_pdf_bytes(pdf_kwargs)
+        try:
+            self.driver.switch_to.new_window('tab')
+        except Exception:
+            self.driver.quit()
+            raise
 
-    def generate_pdf_url(self, url, pdf_kwargs):
-        "Return the bytes of a PDF generated from a URL."
+    def is_alive(self):
+        "Return True if the chromedriver and Chrome still respond to commands."
 
-        warnings.warn("generate_pdf_url() is deprecated, use generate_pdf() instead.", DeprecationWarning)
+        return _is_browser_alive(self._devtool_command)
 
-        pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+    def _devtool_command(self, cmd, params=None):
+        return devtool_command(self.driver, cmd, params)
 
-        self.driver.get(url)
+    def _get_performance_log(self):
+        "Return the entries in the chromedriver's performance log since it was last read."
 
-        return self._get_pdf_bytes(pdf_kwargs)
+        return self.driver.get_log('performance')
 
-    def _get_pdf_bytes(self, pdf_kwargs):
+    def _get_pdf_bytes(self, pdf_kwargs, outfile=None):
 
-        result = devtool_command(self.driver, "Page.printToPDF", pdf_kwargs)
-        return base64.b64decode(result['data'])
+        with phase('print'):
+            result = self._devtool_command("Page.printToPDF", _get_print_params(pdf_kwargs, outfile))
+        if outfile is not None:
+            with phase('stream'):
+                size = _read_stream(self._devtool_command, result['stream'], outfile)
+        if self.collect_performance_metrics:
+            self.performance_metrics = _get_performance_metrics(self._devtool_command)
+        if self.profile_slot is not None:
+            with phase('clear_profile'):
+                _clear_profile_state(self._devtool_command)
+        if outfile is not None:
+            return size
+        with phase('decode'):
+            return base64.b64decode(result['data'])
 
     def quit(self):
-        self.driver.quit()
+        _record_browser_resources(self)
+        with phase('quit'):
+            if self.chrome_debugger_address is not None:
+                # A Chrome attached to via its debugger address keeps running, so close the tab that we opened in it.
+                try:
+                    self.driver.close()
+                except Exception:
+                    pass  # quit regardless, so that the session is ended.
+            self.driver.quit()
+        if self.profile_slot is not None:
+            self.profile_slot.release()
 
 
 class NoSeleniumWebdriverMaker:
@@ -123,112 +244,553 @@ class NoSeleniumWebdriverMaker:
     def __init__(self, **kwargs):
         self.chromedriver_path = kwargs.pop('chromedriver_path', None)
         self.chrome_path = kwargs.pop('chrome_path', None)
-
-        if self.chromedriver_path is None:
+        # an already-running chromedriver to create the session with, EG: "http://localhost:9515".
+        self.chromedriver_url = kwargs.pop('chromedriver_url', None)
+        # an already-running Chrome for the chromedriver to attach to, EG: "localhost:9222".
+        self.chrome_debugger_address = kwargs.pop('chrome_debugger_address', None)
+        # a chromedriver shared with other sessions, used if no chromedriver_url is given. See ChromedriverService.
+        chromedriver_service = kwargs.pop('_chromedriver_service', None)
+
+        if self.chromedriver_path is None and self.chromedriver_url is None:
             raise ChromePdfException('You must ideally provide a chrome_path, if chromedriver downloads are enabled. Or, less commonly, a chromedriver_path, if Chrome if on your PATH and your are certain that they are compatible.')
 
-        self.chrome_args = _get_chrome_webdriver_args(**kwargs)
+        self.wait_for = kwargs.pop('wait_for', None)
+        self.wait_timeout = kwargs.pop('wait_timeout', None)
+        self.javascript = kwargs.pop('javascript', True)
+        self.collect_performance_metrics = kwargs.pop('collect_performance_metrics', False)
+        self.performance_metrics = None  # Chrome's metrics for the most recent render, if collected
+        self.trace_dir = kwargs.pop('trace_dir', None)
+        self.trace_threshold = kwargs.pop('trace_threshold', None)
+        self.trace_path = None  # path of the trace file written for the most recent render, if any
+
+        # CPU and memory used by the chromedriver and Chrome processes, if supported on this OS. See chromepdf.resources.
+        self.resource_tracker = None
+        self.render_resources = None  # usage during the most recent render
+        self.browser_resources = None  # usage over the lifetime of the browser, recorded when it quits
+
+        user_data_dir = kwargs.pop('user_data_dir', None)
+        self.profile_slot = acquire_profile_slot(user_data_dir) if user_data_dir else None
+        if self.profile_slot is not None:
+            kwargs['_profile_dir'] = self.profile_slot.path
 
-        # Get an available port
-        self.sock = socket.socket()
-        self.sock.bind(('', 0))
-        self.port = self.sock.getsockname()[1]
+        self.chrome_args = _get_chrome_webdriver_args(**kwargs)
 
         self.proc = None
         try:
-            # Start Chromedriver
-            args = [self.chromedriver_path, self.chrome_path, f'--port={self.port}']
-            args = [a for a in args if a is not None]  # skip chrome_path if it is None
-            is_windows = platform.system() == 'Windows'
-            if not is_windows:
-                # Linux needs these to be quoted in case of spaces in paths. Windows is okay though.
-                args = [shlex.quote(s) if not s.startswith('--') else s for s in args]
-
-            try:
-                # This process will be closed by calling self.quit()
-                self.proc = subprocess.Popen(args, stdout=subprocess.PIPE)
-            except Exception as ex:
-                raise OSError(f'Failed to start chromedriver process: {args}') from ex
-
-            # Start Chrome
-            driverurl = f'http://localhost:{self.port}/session'
+            if self.chromedriver_url is None and chromedriver_service is not None:
+                self.chromedriver_url = chromedriver_service.get_url()
+            elif self.chromedriver_url is None:
+                self.proc, port = _start_chromedriver(self.chromedriver_path, self.chrome_path)
+                self.chromedriver_url = f'http://localhost:{port}'
+            self.chromedriver_url = self.chromedriver_url.rstrip('/')
+
+            # Start Chrome, or attach to the running one.
+            driverurl = f'{self.chromedriver_url}/session'
+            chrome_options = {
+                "args": self.chrome_args,
+                'excludeSwitches': ['enable-logging'],  # Disables "DevTools listening" output
+            }
+            if self.chrome_debugger_address is not None:
+                # A running Chrome's arguments cannot be changed, so they are not sent.
+                chrome_options = {'debuggerAddress': self.chrome_debugger_address}
             data = {
                 "desiredCapabilities": {
                     "browser": "chrome",
-                    "chromeOptions": {
-                        "args": self.chrome_args,
-                        'excludeSwitches': ['enable-logging'],  # Disables "DevTools listening" output
-                    }
+                    "chromeOptions": chrome_options,
                 }
             }
-            output = get_chromedriver_response(driverurl, data)
-            self.session_id = output['sessionId']
+            if self.trace_dir is not None:
+                # Enables the chromedriver's performance log of trace events. See chromepdf.chrometrace.
+                data['desiredCapabilities']['goog:loggingPrefs'] = LOGGING_PREFS
+                data['desiredCapabilities']['chromeOptions']['perfLoggingPrefs'] = PERF_LOGGING_PREFS
+            with phase('browser_launch'):
+                output = get_chromedriver_response(driverurl, data)
+                self.session_id = output['sessionId']
+                if self.chrome_debugger_address is not None:
+                    self._open_tab()
+            if self.proc is not None:
+                self.resource_tracker = get_process_tree_tracker(self.proc.pid)
 
         except Exception as ex:
+            if self.proc is not None:
+                # the context manager will not call quit() if we fail here, so end the chromedriver ourselves.
+                self.proc.kill()
+                self.proc.wait()
+            if self.profile_slot is not None:
+                self.profile_slot.release()
             raise ex
 
     def _get_driver_command_url(self, suffix=None):
         suffix = f'/{suffix}' if suffix else ''
-        return f'http://localhost:{self.port}/session/{self.session_id}{suffix}'
+        return f'{self.chromedriver_url}/session/{self.session_id}{suffix}'
 
-    def generate_pdf(self, html, pdf_kwargs):
-        "Return the bytes of a PDF generated from HTML."
+    def _open_tab(self):
+        """
+        Open a new tab in an attached Chrome, and switch to it. Sessions attached to the same Chrome would otherwise
+        all render in its first tab at once. If the tab cannot be opened, end the session.
+        """
 
-        pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+        try:
+            output = get_chromedriver_response(self._get_driver_command_url('window/new'), {'type': 'tab'})
+            handle = output['value']['handle']
+            # "handle" is the W3C protocol's parameter, and "name" the legacy protocol's.
+            get_chromedriver_response(self._get_driver_command_url('window'), {'handle': handle, 'name': handle})
+        except Exception:
+            try:
+                get_chromedriver_response(self._get_driver_command_url(), method='DELETE')
+            except OSError:
+                pass
+            raise
+
+    def generate_pdf(self, html, pdf_kwargs, outfile=None):
+        """
+        Return the bytes of a PDF generated from HTML.
+        If an outfile is given, instead stream the PDF to it, and return the number of bytes written.
+        """
+
+        with _track_render_resources(self), _capture_trace(self):
+            pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+            if self.collect_performance_metrics:
+                self._devtool_command('Performance.enable')
+
+            # Go to data url that we will turn into the PDF
+            driverurl = self._get_driver_command_url('url')
+            data = {'url': "data:text/html;charset=utf-8,"}
+            with phase('navigate'):
+                output = get_chromedriver_response(driverurl, data)
+
+            # Write the HTML for the PDF
+            with phase('load_content'):
+                if self.javascript:
+                    driverurl = self._get_driver_command_url('execute/sync')
+                    data = {"script": _get_document_write_script(html), 'args': []}
+                    output = get_chromedriver_response(driverurl, data)
+                else:
+                    _set_document_content(self._devtool_command, html)
+
+            _wait_for_ready(self._devtool_command, self.wait_for, self.wait_timeout)
+            return self._get_pdf_bytes(pdf_kwargs, outfile)
+
+    def generate_pdf_url(self, url, pdf_kwargs, outfile=None):
+        """
+        Return the bytes of a PDF generated from a URL.
+        If an outfile is given, instead stream the PDF to it, and return the number of bytes written.
+        """
+
+        with _track_render_resources(self), _capture_trace(self):
+            pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+            if self.collect_performance_metrics:
+                self._devtool_command('Performance.enable')
+
+            if not self.javascript:
+                self._devtool_command('Emulation.setScriptExecutionDisabled', {'value': True})
+
+            # Go to data url that we will turn into the PDF
+            driverurl = self._get_driver_command_url('url')
+            data = {'url': url}
+            with phase('navigate'):
+                output = get_chromedriver_response(driverurl, data)
+
+            _wait_for_ready(self._devtool_command, self.wait_for, self.wait_timeout)
+            return self._get_pdf_bytes(pdf_kwargs, outfile)
+
+    def _devtool_command(self, cmd, params=None):
+        "Send a command to Chrome via the chromedriver, and return the result."
 
-        # Go to data url that we will turn into the PDF
-        driverurl = self._get_driver_command_url('url')
-        data = {'url': "data:text/html;charset=utf-8,"}
-        output = get_chromedriver_response(driverurl, data)
+        driverurl = self._get_driver_command_url('chromium/send_command_and_get_result')
+        data = {'cmd': cmd, 'params': params if params is not None else {}}
+        with get_tracer().start_span('chromepdf.devtool_command', {'chromepdf.devtool.command': cmd}):
+            output = get_chromedriver_response(driverurl, data)
+        return output['value']
 
-        # Write the HTML for the PDF
-        driverurl = self._get_driver_command_url('execute/sync')
+    def is_alive(self):
+        "Return True if the chromedriver and Chrome still respond to commands."
 
-        html = html.replace('\'', '\\\'')  # We wrap the string in '', so escape all other '
-        html = html.replace('\n', ' \\\n')  # Allow newlines within '', and avoid concatenating words
-        html = html.replace('\r', ' \\\r')  # Allow newlines within '', and avoid concatenating words
-        script = "document.write('{}')".format(html)
-        data = {"script": script, 'args': []}
-        output = get_chromedriver_response(driverurl, data)
+        return _is_browser_alive(self._devtool_command)
 
-        return self._get_pdf_bytes(pdf_kwargs)
+    def _get_performance_log(self):
+        "Return the entries in the chromedriver's performance log since it was last read."
 
-    def generate_pdf_url(self, url, pdf_kwargs):
-        "Return the bytes of a PDF generated from a URL."
+        driverurl = self._get_driver_command_url('se/log')
+        return get_chromedriver_response(driverurl, {'type': 'performance'})['value']
 
-        pdf_kwargs = _clean_pdf_kwargs(pdf_kwargs)
+    def _get_pdf_bytes(self, pdf_kwargs, outfile=None):
 
-        # Go to data url that we will turn into the PDF
-        driverurl = self._get_driver_command_url('url')
-        data = {'url': url}
-        output = get_chromedriver_response(driverurl, data)
+        # Generate PDF and bet bytes back
+        with phase('print'):
+            result = self._devtool_command("Page.printToPDF", _get_print_params(pdf_kwargs, outfile))
+        if outfile is not None:
+            with phase('stream'):
+                size = _read_stream(self._devtool_command, result['stream'], outfile)
+        if self.collect_performance_metrics:
+            self.performance_metrics = _get_performance_metrics(self._devtool_command)
+        if self.profile_slot is not None:
+            with phase('clear_profile'):
+                _clear_profile_state(self._devtool_command)
+        if outfile is not None:
+            return size
+        with phase('decode'):
+            return base64.b64decode(result.get('data'))
 
-        return self._get_pdf_bytes(pdf_kwargs)
+    def quit(self):
 
-    def _get_pdf_bytes(self, pdf_kwargs):
+        _record_browser_resources(self)
+        with phase('quit'):
+            # Exit Chrome by terminating our session. A Chrome attached to via its debugger address keeps running,
+            # so close the tab that we opened in it first.
+            driverurl = self._get_driver_command_url()
+            try:
+                if self.chrome_debugger_address is not None:
+                    get_chromedriver_response(self._get_driver_command_url('window'), method='DELETE')
+                output = get_chromedriver_response(driverurl, method='DELETE')
+            except OSError:
+                # The chromedriver already exited, EG, because a Ctrl+C in the terminal interrupted it too.
+                # If we started it, it is killed below regardless, so that no process is left running.
+                pass
+
+            if self.proc is not None:
+                # Send command to kill chromedriver process
+                # Then wait until it's killed, otherwise current process may display ResourceError if it ends first.
+                self.proc.kill()
+                self.proc.wait()
+
+        if self.profile_slot is not None:
+            self.profile_slot.release()
+
+
+# The JavaScript promise to wait on for each of the named WAIT_FOR values. Each resolves from the page's own events, so
+# none are polled. Any other WAIT_FOR value is treated as a JavaScript expression. See _get_wait_for_expression().
+_WAIT_FOR_EXPRESSIONS = {
+    # the window's load event, which fires after all images, stylesheets, etc have loaded.
+    'load': """new Promise(resolve => {
+        if (document.readyState === 'complete') { resolve(); } else { window.addEventListener('load', () => resolve()); }
+    })""",
+    # all web fonts used by the document have finished loading.
+    'fonts': 'document.fonts.ready',
+    # the load event, followed by 500ms in which no further resources finished loading.
+    # A PerformanceObserver sees the page's resources finish loading, without enabling CDP's Network events.
+    'network-idle': """new Promise(resolve => {
+        const waitForIdle = () => {
+            let timer = setTimeout(resolve, 500);
+            new PerformanceObserver(() => { clearTimeout(timer); timer = setTimeout(resolve, 500); })
+                .observe({entryTypes: ['resource']});
+        };
+        if (document.readyState === 'complete') { waitForIdle(); } else { window.addEventListener('load', waitForIdle); }
+    })""",
+    # a promise set by the page itself, EG: window.chromepdfReady = renderCharts();
+    # If the page has not set it yet, a setter resolves with the promise as soon as the page does.
+    'signal': """new Promise(resolve => {
+        if (window.chromepdfReady !== undefined) { resolve(window.chromepdfReady); return; }
+        const property = {configurable: true, enumerable: true};
+        Object.defineProperty(window, 'chromepdfReady', {...property, get: () => undefined, set: value => {
+            Object.defineProperty(window, 'chromepdfReady', {...property, value, writable: true});
+            resolve(value);
+        }});
+    })""",
+}
+
+DEFAULT_WAIT_TIMEOUT = 30  # seconds
+
+WAIT_FOR_POLL_INTERVAL = 0.05  # seconds between evaluations of a custom WAIT_FOR predicate that is not ready yet
+
+STREAM_CHUNK_SIZE = 1024 * 1024  # bytes of a streamed PDF to read per IO.read command
+
+CHROMEDRIVER_START_TIMEOUT = 20  # seconds
+
+
+def _start_chromedriver(chromedriver_path, chrome_path=None):
+    """Start a chromedriver process on an available port, and return the (process, port)."""
+
+    # Get an available port. Release it before starting the chromedriver, or else the chromedriver will be unable
+    # to listen on it via IPv4, and will only be reachable if "localhost" also resolves to an IPv6 address.
+    with socket.socket() as sock:
+        sock.bind(('', 0))
+        port = sock.getsockname()[1]
+
+    args = [chromedriver_path, chrome_path, f'--port={port}']
+    args = [a for a in args if a is not None]  # skip chrome_path if it is None
+    is_windows = platform.system() == 'Windows'
+    if not is_windows:
+        # Linux needs these to be quoted in case of spaces in paths. Windows is okay though.
+        args = [shlex.quote(s) if not s.startswith('--') else s for s in args]
+
+    proc = None
+    try:
+        # The caller must end this process when it is finished with it.
+        with phase('chromedriver_spawn'):
+            proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+            _wait_for_chromedriver(proc, port)
+    except Exception as ex:
+        if proc is not None:
+            proc.kill()
+            proc.wait()
+        raise OSError(f'Failed to start chromedriver process: {args}') from ex
+    return proc, port
 
-        # Generate PDF and bet bytes back
-        driverurl = self._get_driver_command_url('chromium/send_command_and_get_result')
-        cmd = "Page.printToPDF"
-        data = {'cmd': cmd, 'params': pdf_kwargs}
-        output = get_chromedriver_response(driverurl, data)
-        return base64.b64decode(output['value'].get('data'))
 
-    def quit(self):
+class ChromedriverService:
+    """
+    A chromedriver process that many sessions are created on, rather than each starting its own chromedriver.
+    It is started when a session first needs it, started again if it has exited, and ended by stop().
+    """
 
-        if self.proc is not None:
+    def __init__(self, chromedriver_path, chrome_path=None):
+        self.chromedriver_path = chromedriver_path
+        self.chrome_path = chrome_path
+        self.proc = None
+        self.port = None
+        self._lock = threading.Lock()
 
-            # Exit Chrome by terminating our session
-            driverurl = self._get_driver_command_url()
-            output = get_chromedriver_response(driverurl, method='DELETE')
+    def get_url(self):
+        """Return the url of the chromedriver, starting it if it is not running."""
+
+        with self._lock:
+            if self.proc is None or self.proc.poll() is not None:
+                if self.proc is not None:
+                    metrics.CHROMEDRIVER_RESTARTS.inc(source='shared_chromedriver')
+                self.proc, self.port = _start_chromedriver(self.chromedriver_path, self.chrome_path)
+            return f'http://localhost:{self.port}'
+
+    def stop(self):
+        """End the chromedriver process, if it is running. Its sessions' Chromes exit along with it."""
+
+        with self._lock:
+            if self.proc is not None:
+                self.proc.kill()
+                self.proc.wait()
+                self.proc = None
+
+
+def _wait_for_chromedriver(proc, port, timeout=CHROMEDRIVER_START_TIMEOUT):
+    """
+    Wait until the chromedriver process is accepting connections on its port.
+    Raise OSError if it exits, or is not accepting connections within the timeout (in seconds).
+    """
 
-            # Send command to kill chromedriver process
-            # Then wait until it's killed, otherwise current process may display ResourceError if it ends first.
-            self.proc.kill()
-            self.proc.wait()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(('localhost', port), timeout=1):
+                return
+        except OSError:
+            if proc.poll() is not None:
+                raise OSError(f'The chromedriver exited with return code {proc.returncode} before it started.')
+            if time.monotonic() > deadline:
+                raise OSError(f'The chromedriver did not start listening on port {port} within {timeout} seconds.')
+            time.sleep(0.01)
+
+
+@contextmanager
+def _track_render_resources(maker):
+    """
+    Context manager that records the CPU and memory used by a webdriver maker's processes during a render
+    to its render_resources attribute, and to the metrics. The usage is recorded even if the render fails.
+    """
+
+    tracker = maker.resource_tracker
+    if tracker is None:
+        yield
+        return
 
-        # Unbind socket
-        self.sock.close()
+    start = tracker.sample()
+    tracker.reset_peaks()  # so that the peak memory is that of this render, not of the browser's earlier renders.
+    try:
+        yield
+    finally:
+        maker.render_resources = ProcessTreeTracker.usage_between(start, tracker.sample(since_reset=True))
+        metrics.RENDER_CPU_SECONDS.observe(maker.render_resources['cpu_seconds'])
+        metrics.RENDER_SUMMED_PEAK_RSS_BYTES.observe(maker.render_resources['summed_peak_rss_bytes'])
+
+
+@contextmanager
+def _capture_trace(maker):
+    """
+    Context manager that writes Chrome's trace of a render to a new file in the webdriver maker's trace_dir, if the
+    render takes at least trace_threshold seconds. Slow renders are traced even if they fail.
+    """
+
+    maker.trace_path = None
+    if maker.trace_dir is None:
+        yield
+        return
+
+    with phase('trace'):
+        maker._get_performance_log()  # discard the events from before the render, such as the browser's launch
+    start = time.monotonic()
+    try:
+        yield
+    except Exception:
+        try:
+            _write_render_trace(maker, start)
+        except Exception:
+            pass  # raise the render's own exception, rather than one from tracing it
+        raise
+    else:
+        _write_render_trace(maker, start)
+
+
+def _write_render_trace(maker, start):
+    """Write the trace of a render that began at the start time (per time.monotonic()), if it was slow enough."""
+
+    if time.monotonic() - start < (maker.trace_threshold or 0):
+        return
+    with phase('trace'):
+        path = get_trace_path(maker.trace_dir)
+        maker.trace_path = write_trace(path, get_trace_events(maker._get_performance_log()))
+
+
+def _record_browser_resources(maker):
+    """Record the CPU and memory used by a webdriver maker's processes over their lifetime, just before they exit."""
+
+    if maker.resource_tracker is None:
+        return
+    maker.browser_resources = maker.resource_tracker.sample()
+    metrics.BROWSER_CPU_SECONDS.inc(maker.browser_resources['cpu_seconds'])
+    metrics.BROWSER_SUMMED_PEAK_RSS_BYTES.observe(maker.browser_resources['summed_peak_rss_bytes'])
+
+
+def _get_print_params(pdf_kwargs, outfile=None):
+    """Return the params of the Page.printToPDF command. If the PDF will be written to an outfile, stream it."""
+
+    if outfile is None:
+        return pdf_kwargs
+    return dict(pdf_kwargs, transferMode='ReturnAsStream')
+
+
+def _read_stream(devtool_command_func, handle, outfile, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Write the contents of a DevTools stream (EG, a PDF printed with transferMode=ReturnAsStream) to the outfile,
+    one chunk at a time, and then close the stream. Return the number of bytes written.
+    """
+
+    size = 0
+    try:
+        while True:
+            result = devtool_command_func('IO.read', {'handle': handle, 'size': chunk_size})
+            data = result.get('data', '')
+            data = base64.b64decode(data) if result.get('base64Encoded') else data.encode('utf8')
+            outfile.write(data)
+            size += len(data)
+            if result.get('eof'):
+                return size
+    finally:
+        devtool_command_func('IO.close', {'handle': handle})
+
+
+def _get_performance_metrics(devtool_command_func):
+    """
+    Return a dict of Chrome's performance metrics for the current page, such as LayoutCount, RecalcStyleCount,
+    LayoutDuration, and JSHeapUsedSize. The Performance domain must have been enabled before the page was loaded.
+    """
+
+    with phase('performance_metrics'):
+        result = devtool_command_func('Performance.getMetrics')
+        devtool_command_func('Performance.disable')
+    return {m['name']: m['value'] for m in result['metrics']}
+
+
+def _get_wait_for_expression(wait_for, timeout):
+    """
+    Return a JavaScript expression that evaluates to a promise of {ready: true} once the page is ready, or of
+    {ready: false, error: "..."} if it is not ready within the timeout.
+
+    The named WAIT_FOR values are promises that resolve from the page's own events. Any other WAIT_FOR expression is
+    evaluated, and if it evaluates to a function, the function is called. If the result is a promise, the page is ready
+    when the promise resolves. Otherwise, the result is a predicate, which is evaluated again every
+    WAIT_FOR_POLL_INTERVAL seconds until it is truthy. Errors from evaluating the predicate, such as a TypeError from a
+    property that the page has not set yet, mean that it is not ready yet.
+    """
+
+    if wait_for in _WAIT_FOR_EXPRESSIONS:
+        ready = f'Promise.resolve({_WAIT_FOR_EXPRESSIONS[wait_for]}).then(() => ({{ready: true}}))'
+    else:
+        interval_ms = int(WAIT_FOR_POLL_INTERVAL * 1000)
+        ready = f"""(async () => {{
+            while (!timedOut) {{
+                let value;
+                try {{
+                    value = ({wait_for});
+                    if (typeof value === 'function') {{ value = value(); }}
+                }} catch (error) {{
+                    lastError = error;
+                    value = null;
+                }}
+                if (value && typeof value.then === 'function') {{ await value; return {{ready: true}}; }}
+                if (value) {{ return {{ready: true}}; }}
+                await new Promise(resolve => setTimeout(resolve, {interval_ms}));
+            }}
+        }})()"""
+    timeout_ms = int((timeout if timeout is not None else DEFAULT_WAIT_TIMEOUT) * 1000)
+
+    # Pages written via document.write() are not finished loading until document.close() is called.
+    # Calling it on a page that was not written this way does nothing.
+    return f"""(() => {{
+        document.close();
+        let timedOut = false;
+        let lastError = null;
+        return Promise.race([
+            {ready},
+            new Promise(resolve => setTimeout(() => {{
+                timedOut = true;
+                resolve({{ready: false, error: lastError && String(lastError)}});
+            }}, {timeout_ms})),
+        ]);
+    }})()"""
+
+
+def _wait_for_ready(devtool_command_func, wait_for, timeout):
+    """
+    Wait until the page is ready to be printed, as determined by the WAIT_FOR setting.
+    Raise ChromePdfException if it does not become ready within the timeout (given in seconds).
+    """
+
+    if not wait_for:
+        return
+
+    params = {'expression': _get_wait_for_expression(wait_for, timeout), 'awaitPromise': True, 'returnByValue': True}
+    with phase('wait'):
+        result = devtool_command_func('Runtime.evaluate', params)
+
+    if result.get('exceptionDetails'):
+        details = result['exceptionDetails']
+        message = details.get('exception', {}).get('description') or details.get('text')
+        raise ChromePdfException(f'wait_for="{wait_for}" failed: {message}')
+    value = result.get('result', {}).get('value') or {}
+    if value.get('ready') is not True:
+        timeout = timeout if timeout is not None else DEFAULT_WAIT_TIMEOUT
+        error = f' The last error was: {value["error"]}' if value.get('error') else ''
+        raise ChromePdfException(f'wait_for="{wait_for}" did not complete within {timeout} seconds.{error}')
+
+
+def _get_document_write_script(html):
+    """Return a JavaScript statement that will write the html to the current page."""
+
+    html = html.replace('\'', '\\\'')  # We wrap the string in '', so escape all other '
+    html = html.replace('\n', ' \\\n')  # Allow newlines within '', and avoid concatenating words
+    html = html.replace('\r', ' \\\r')  # Allow newlines within '', and avoid concatenating words
+    # we do NOT need to escape any other chars (quotes, etc), including unicode
+    return "document.write('{}')".format(html)
+
+
+def _set_document_content(devtool_command_func, html):
+    """
+    Replace the current page's contents with the html, with JavaScript disabled.
+    Unlike document.write(), this does not require V8 to parse the html as a (potentially huge) string literal.
+    """
+
+    devtool_command_func('Emulation.setScriptExecutionDisabled', {'value': True})
+    frame_id = devtool_command_func('Page.getFrameTree')['frameTree']['frame']['id']
+    devtool_command_func('Page.setDocumentContent', {'frameId': frame_id, 'html': html})
+
+
+def _is_browser_alive(devtool_command_func):
+    """Return True if a cheap DevTools command succeeds, meaning that the chromedriver and Chrome still respond."""
+
+    try:
+        devtool_command_func('Browser.getVersion')
+    except Exception:
+        return False
+    return True
 
 
 def _clean_pdf_kwargs(pdf_kwargs):
@@ -13,7 +13,10 @@ from urllib import request as urllib_request
 
 from selenium.webdriver.remote.command import Command
 
+from chromepdf.chrometrace import LOGGING_PREFS, PERF_LOGGING_PREFS
 from chromepdf.exceptions import ChromePdfException
+from chromepdf.instrumentation import phase
+from chromepdf.tracing import get_tracer
 
 
 def _version_to_tuple(version):
@@ -278,11 +281,12 @@ def download_chromedriver_version(version, force=False, chmod=None):
     if os.path.exists(chromedriver_download_path) and not force:
         return chromedriver_download_path
 
-    # chromedrivers have their own version strings. fetch the one for our chrome version.
-    chromedriver_version = _fetch_chromedriver_version_for_chrome_version(version)
+    with phase('chromedriver_download'):
+        # chromedrivers have their own version strings. fetch the one for our chrome version.
+        chromedriver_version = _fetch_chromedriver_version_for_chrome_version(version)
 
-    # Download the zip file containing our chromedriver
-    zip_bytes = _fetch_chromedriver_zip_bytes(chromedriver_version)
+        # Download the zip file containing our chromedriver
+        zip_bytes = _fetch_chromedriver_zip_bytes(chromedriver_version)
 
     # Open the zip file, find the chromedriver, and save it to the specified path.
     # Be advised: pre-115 zip files contain no subfolders, but 115+ contains one subfolder with the chromedriver.
@@ -358,13 +362,25 @@ def _get_chrome_webdriver_args(**kwargs):
     # this lets us generate PDFs in a thread- and process-safe way since they will not be
     # fighting over reading/writing the same files in the --user-data-dir
     # passing --incognito AND --user-data-dir= WILL cause the user-data-dir folder to be populated, so don't.
-    args.append("--incognito")
+    # The exception is a USER_DATA_DIR profile slot, which is locked for use by only one Chrome at a time.
+    # It keeps the HTTP and V8 code caches between renders, which incognito mode disables.
+    profile_dir = kwargs.get('_profile_dir')
+    if profile_dir is not None:
+        args.append(f"--user-data-dir={profile_dir}")
+    else:
+        args.append("--incognito")
 
     temp_dir = kwargs.get('_chromesession_temp_dir')
     if temp_dir is not None:
         crash_dumps_dir = os.path.join(temp_dir, 'crash-dumps-dir')
         args.append(f"--crash-dumps-dir={crash_dumps_dir}")
 
+    # Network lockdown: fail every hostname lookup immediately, except for allowlisted hosts.
+    # This keeps a stray external <img>/<link> from stalling the render until the network times out,
+    # and keeps Chrome from fetching anything the caller did not explicitly allow.
+    if kwargs.get('block_network'):
+        args.extend(_get_network_lockdown_args(kwargs.get('network_allowlist', [])))
+
     # add extra chrome args
     chrome_args = kwargs.get('chrome_args', [])
     for argv in chrome_args:
@@ -373,8 +389,39 @@ def _get_chrome_webdriver_args(**kwargs):
     return args
 
 
+# A proxy that refuses every connection at once: the "discard" port of the loopback address, which nothing listens on.
+# Given as an IP address, so that Chrome need not resolve it.
+_UNREACHABLE_PROXY = 'http://127.0.0.1:9'
+
+
+def _get_network_lockdown_args(allowlist):
+    """
+    Return arguments to pass to Chrome that block all network access, except to the hosts in the allowlist.
+    Allowlist entries are hostnames or IP addresses, and may use wildcards, EG: "*.example.com".
+
+    Every request is sent to a proxy that cannot be reached, except requests to allowlisted hosts, which bypass it.
+    This blocks urls that use IP addresses as well as hostnames. "<-loopback>" stops Chrome from bypassing the proxy for
+    localhost and 127.0.0.1, as it otherwise would. Hostname lookups are blocked too, so that nothing is prefetched.
+    """
+
+    rules = ['MAP * ~NOTFOUND'] + [f'EXCLUDE {host}' for host in allowlist]
+    return [
+        f'--host-resolver-rules={", ".join(rules)}',
+        f'--proxy-server={_UNREACHABLE_PROXY}',
+        f'--proxy-bypass-list={";".join(list(allowlist) + ["<-loopback>"])}',
+        '--dns-prefetch-disable',
+        '--disable-background-networking',
+        '--disable-component-update',
+        '--disable-domain-reliability',
+        '--no-pings',
+    ]
+
+
 def _get_chrome_webdriver_kwargs(chrome_path, chromedriver_path, **kwargs):
-    """Return the kwargs needed to pass to webdriver.Chrome(), given the CHROMEPDF settings."""
+    """
+    Return the kwargs needed to pass to webdriver.Chrome(), given the CHROMEPDF settings.
+    Or, if a chromedriver_url is given, to webdriver.Remote().
+    """
 
     import selenium
     from selenium import webdriver
@@ -383,13 +430,23 @@ def _get_chrome_webdriver_kwargs(chrome_path, chromedriver_path, **kwargs):
 
     options = webdriver.ChromeOptions()
 
-    args = _get_chrome_webdriver_args(**kwargs)
-    for arg in args:
-        options.add_argument(arg)
+    debugger_address = kwargs.get('chrome_debugger_address')
+    if debugger_address is not None:
+        # Attach to a running Chrome. Its arguments cannot be changed, so they are not sent.
+        options.debugger_address = debugger_address  # Selenium API
+    else:
+        args = _get_chrome_webdriver_args(**kwargs)
+        for arg in args:
+            options.add_argument(arg)
+
+        # silence the "DevTools started" message on windows
+        # https://bugs.chromium.org/p/chromedriver/issues/detail?id=2907#c3
+        options.add_experimental_option('excludeSwitches', ['enable-logging'])
 
-    # silence the "DevTools started" message on windows
-    # https://bugs.chromium.org/p/chromedriver/issues/detail?id=2907#c3
-    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    if kwargs.get('_trace'):
+        # Enables the chromedriver's performance log of trace events. See chromepdf.chrometrace.
+        options.set_capability('goog:loggingPrefs', LOGGING_PREFS)
+        options.add_experimental_option('perfLoggingPrefs', PERF_LOGGING_PREFS)
 
     # In Selenium 4, we must tell the driver to ignore any os.environ['http_proxy'/'https_proxy'] values.
     # Calling this function preserves Selenium 3 behavior, which did not check them at all.
@@ -397,11 +454,14 @@ def _get_chrome_webdriver_kwargs(chrome_path, chromedriver_path, **kwargs):
     if hasattr(options, 'ignore_local_proxy_environment_variables') and callable(options.ignore_local_proxy_environment_variables):
         options.ignore_local_proxy_environment_variables()
 
-    if chrome_path is not None:
+    if chrome_path is not None and debugger_address is None:
         options.binary_location = chrome_path  # Selenium API
 
     chrome_kwargs = {'options': options}
-    if chromedriver_path is not None:
+    if kwargs.get('chromedriver_url') is not None:
+        # For webdriver.Remote(), which creates a session with a running chromedriver rather than starting one.
+        chrome_kwargs['command_executor'] = kwargs['chromedriver_url']
+    elif chromedriver_path is not None:
         if is_selenium_3:
             chrome_kwargs['executable_path'] = chromedriver_path
         else:
@@ -430,7 +490,8 @@ def devtool_command(driver, cmd, params=None):
         url = f'{driver.command_executor._client_config.remote_server_addr}{resource}'
 
     body = json.dumps({'cmd': cmd, 'params': params})
-    response = driver.command_executor._request('POST', url, body)
+    with get_tracer().start_span('chromepdf.devtool_command', {'chromepdf.devtool.command': cmd}):
+        response = driver.command_executor._request('POST', url, body)
 
     if 'status' in response:
         # response dict only contains a "status" key if an error occurred.
@@ -439,6 +500,80 @@ def devtool_command(driver, cmd, params=None):
     return response.get('value')
 
 
+class ProfileSlot:
+    """
+    A Chrome --user-data-dir folder that has been locked for use by a single Chrome instance.
+    Call release() when Chrome has exited, so that another instance may reuse it.
+    """
+
+    def __init__(self, path, lock_path, lock_file):
+        self.path = path
+        self.lock_path = lock_path
+        self._lock_file = lock_file
+
+    def release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()  # closing the file releases its lock.
+            self._lock_file = None
+
+
+def _try_lock_file(f):
+    """
+    Try to take an exclusive lock on an open file, without waiting. Return True if it was taken.
+    The lock is held until the file is closed, or the process exits, even if it crashes.
+    """
+
+    try:
+        if platform.system() == 'Windows':
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def acquire_profile_slot(user_data_dir):
+    """
+    Lock and return the first available ProfileSlot ("slot-0", "slot-1", etc) within the user_data_dir folder.
+    Each concurrent Chrome instance needs its own profile folder, so each one gets its own slot.
+    """
+
+    os.makedirs(user_data_dir, exist_ok=True)
+    slot_num = 0
+    while True:
+        path = os.path.join(user_data_dir, f'slot-{slot_num}')
+        lock_path = f'{path}.lock'
+        # The lock file is never removed, since another process may be about to lock it.
+        f = os.fdopen(os.open(lock_path, os.O_CREAT | os.O_RDWR), 'r+', encoding='utf8')
+        if not _try_lock_file(f):
+            f.close()
+            slot_num += 1
+            continue
+
+        f.truncate()
+        f.write(str(os.getpid()))  # for troubleshooting only. the lock itself is what reserves the slot.
+        f.flush()
+        os.makedirs(path, exist_ok=True)
+        return ProfileSlot(path, lock_path, f)
+
+
+# Storage to clear between renders when reusing a profile. The HTTP cache and V8 code cache are deliberately kept.
+_PROFILE_STORAGE_TYPES = 'cookies,local_storage,indexeddb,websql,service_workers,cache_storage,file_systems'
+
+
+def _clear_profile_state(devtool_command_func):
+    """Clear the cookies and storage left behind by a render, so they will not leak into the next render."""
+
+    devtool_command_func('Network.clearBrowserCookies')
+    result = devtool_command_func('Runtime.evaluate', {'expression': 'location.origin', 'returnByValue': True})
+    origin = result.get('result', {}).get('value')
+    if origin and origin != 'null':  # data: urls have an opaque "null" origin, with no storage to clear.
+        devtool_command_func('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': _PROFILE_STORAGE_TYPES})
+
+
 def _get_chromesession_temp_dir():
     """
     Return an absolute path to a folder to use for storing Chrome's files while making a PDF.
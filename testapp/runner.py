@@ -0,0 +1,14 @@
+from django.test.runner import DiscoverRunner
+
+
+class ChromePdfTestRunner(DiscoverRunner):
+    """
+    Excludes the benchmark tests (see testapp/tests/generate/test_benchmark.py) unless they are asked for with
+    --tag=benchmark, since their timings depend on the machine running them.
+    """
+
+    def __init__(self, tags=None, exclude_tags=None, **kwargs):
+        exclude_tags = set(exclude_tags or ())
+        if 'benchmark' not in (tags or ()):
+            exclude_tags.add('benchmark')
+        super().__init__(tags=tags, exclude_tags=exclude_tags, **kwargs)
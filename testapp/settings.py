@@ -15,6 +15,9 @@ INSTALLED_APPS = [
 
 WSGI_APPLICATION = 'testapp.wsgi.application'
 
+# Excludes the benchmark tests unless run with --tag=benchmark.
+TEST_RUNNER = 'testapp.runner.ChromePdfTestRunner'
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -0,0 +1,106 @@
+"""
+Benchmarks of ChromePDF's hot paths, compared against the timings stored in benchmark_baseline.json.
+Each benchmark fails if it takes longer than its baseline multiplied by its tolerance. The baseline is scaled by how
+long a fixed calibration workload takes on this machine, compared to the machine that recorded it.
+These are excluded by default, since their timings depend on the machine and how busy it is. Run them with:
+manage.py test testapp --tag=benchmark
+To re-record the baseline on the current machine, set the environment variable CHROMEPDF_UPDATE_BENCHMARKS=1.
+"""
+
+import base64
+import json
+import os
+import tempfile
+import timeit
+from unittest.case import TestCase
+
+from django.test.utils import tag
+
+from chromepdf import generate_pdf
+from chromepdf.fakedriver import FakeChromedriver, write_fake_chromedriver
+from chromepdf.pdfconf import clean_pdf_kwargs
+from chromepdf.sizes import convert_to_inches
+from chromepdf.webdrivermakers import _get_document_write_script, get_chromedriver_response
+from testapp.tests.utils import getFakeMakerKwargs
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+DEFAULT_TOLERANCE = 5.0
+
+
+def _calibrate():
+    """Return the seconds that a fixed, pure-Python workload takes on this machine."""
+
+    return min(timeit.repeat(lambda: sorted(str(i * i) for i in range(10000)), number=10, repeat=5)) / 10
+
+
+@tag('benchmark')
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(BASELINE_PATH, 'r', encoding='utf8') as f:
+            cls.baseline = json.load(f)
+        cls.measured = {'calibration': _calibrate()}
+        # how much slower this machine is than the one that recorded the baseline.
+        cls.slowdown = cls.measured['calibration'] / cls.baseline['calibration']['seconds']
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get('CHROMEPDF_UPDATE_BENCHMARKS') == '1':
+            for name, seconds in cls.measured.items():
+                cls.baseline.setdefault(name, {'tolerance': DEFAULT_TOLERANCE})['seconds'] = round(seconds, 9)
+            with open(BASELINE_PATH, 'w', encoding='utf8') as f:
+                json.dump(cls.baseline, f, indent=4, sort_keys=True)
+                f.write('\n')
+        super().tearDownClass()
+
+    def assertWithinBaseline(self, name, func, number=100, repeat=5):
+        """
+        Time func, and fail if its best time per call exceeds the baseline's seconds times its tolerance, scaled by
+        this machine's slowdown.
+        """
+
+        seconds = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+        self.measured[name] = seconds
+        if os.environ.get('CHROMEPDF_UPDATE_BENCHMARKS') == '1':
+            return
+
+        entry = self.baseline[name]
+        limit = entry['seconds'] * entry.get('tolerance', DEFAULT_TOLERANCE) * self.slowdown
+        self.assertLessEqual(seconds, limit, f'{name} took {seconds:.6f}s per call; baseline is {entry["seconds"]:.6f}s, '
+                                             f'and this machine is {self.slowdown:.2f}x as slow.')
+
+    def test_clean_pdf_kwargs(self):
+        pdf_kwargs = {'paperFormat': 'A4', 'margin': '1cm', 'landscape': True, 'scale': 0.9,
+                      'displayHeaderFooter': True, 'headerTemplate': '<span class="title"></span>'}
+        self.assertWithinBaseline('clean_pdf_kwargs', lambda: clean_pdf_kwargs(**pdf_kwargs), number=1000)
+
+    def test_convert_to_inches(self):
+        self.assertWithinBaseline('convert_to_inches', lambda: convert_to_inches('2.54cm'), number=10000)
+
+    def test_html_escaping(self):
+        html = '<p class="x">It\'s "two"\nlines</p>\r\n' * (1000 * 1000 // 40)  # 1 MB
+        self.assertWithinBaseline('html_escaping_1mb', lambda: _get_document_write_script(html), number=5)
+
+    def test_base64_decode(self):
+        encoded = base64.b64encode(os.urandom(1000 * 1000)).decode('ascii')  # a 1 MB PDF
+        self.assertWithinBaseline('base64_decode_1mb', lambda: base64.b64decode(encoded), number=20)
+
+    def test_get_chromedriver_response(self):
+        """Round trips of chromedriver commands to the fake chromedriver."""
+
+        with FakeChromedriver() as fake:
+            session_id = get_chromedriver_response(f'{fake.url}/session', {})['sessionId']
+            url = f'{fake.url}/session/{session_id}/chromium/send_command_and_get_result'
+            data = {'cmd': 'Page.printToPDF', 'params': {}}
+            self.assertWithinBaseline('get_chromedriver_response', lambda: get_chromedriver_response(url, data), number=20)
+
+    def test_generate_pdf(self):
+        """End-to-end renders with the fake chromedriver, including starting and quitting it."""
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            chromedriver_path = write_fake_chromedriver(os.path.join(tempdir, 'chromedriver'))
+            kwargs = getFakeMakerKwargs(chromedriver_path)
+            self.assertWithinBaseline('generate_pdf', lambda: generate_pdf('Two Words', **kwargs), number=1, repeat=3)
@@ -1,6 +1,11 @@
+import http.server
+import json
 import os
 import pathlib
 import platform
+import tempfile
+import threading
+import unittest
 from io import BytesIO
 from multiprocessing import Pool
 from multiprocessing.pool import ThreadPool
@@ -12,11 +17,12 @@ from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfpage import PDFPage
 from pdfminer.pdfparser import PDFParser
 
-from chromepdf import generate_pdf, generate_pdf_url
+from chromepdf import RenderResult, generate_pdf, generate_pdf_url
 from chromepdf.conf import parse_settings
 from chromepdf.exceptions import ChromePdfException
 from chromepdf.maker import ChromePdfMaker
 from chromepdf.pdfconf import clean_pdf_kwargs
+from chromepdf.resources import is_supported
 from chromepdf.webdrivermakers import get_webdriver_maker, get_webdriver_maker_class, is_selenium_installed
 from testapp.tests.utils import createTempFile, extractText, findChromePath
 
@@ -107,6 +113,77 @@ class GeneratePdfSimpleTests(TestCase):
                     quit_func.assert_called_once_with()
 
 
+class GeneratePdfResultTests(TestCase):
+    """Test the details recorded to a RenderResult."""
+
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_result_timings(self):
+        """Every phase of a render should be timed."""
+
+        html = 'Two Words'
+        result = RenderResult()
+        pdfbytes = ChromePdfMaker().generate_pdf(html, result=result)
+        self.assertEqual(pdfbytes, result.pdf_bytes)
+        for name in ('browser_launch', 'navigate', 'load_content', 'print', 'decode', 'quit', 'render'):
+            self.assertIn(name, result.timings)
+        self.assertNotIn('wait', result.timings)  # WAIT_FOR not set
+
+        file = createTempFile(html)
+        result = RenderResult()
+        pdfbytes = ChromePdfMaker().generate_pdf_url(pathlib.Path(file.name).as_uri(), result=result)
+        self.assertEqual(pdfbytes, result.pdf_bytes)
+        for name in ('browser_launch', 'navigate', 'print', 'decode', 'quit', 'render'):
+            self.assertIn(name, result.timings)
+
+    @unittest.skipUnless(is_supported(), 'Requires a /proc filesystem.')
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_result_resources(self):
+        """The CPU and memory of the chromedriver and Chrome processes should be recorded."""
+
+        result = RenderResult()
+        ChromePdfMaker().generate_pdf('Two Words', result=result)
+        self.assertGreater(result.resources['processes'], 1)  # the chromedriver and Chrome's processes
+        self.assertGreater(result.resources['summed_peak_rss_bytes'], 0)
+        self.assertGreaterEqual(result.browser_resources['cpu_seconds'], result.resources['cpu_seconds'])
+
+    @override_settings(CHROMEPDF={'COLLECT_PERFORMANCE_METRICS': True})
+    def test_generate_pdf_result_performance_metrics(self):
+        """Chrome's performance metrics should only be collected if enabled."""
+
+        result = RenderResult()
+        ChromePdfMaker().generate_pdf('<p style="width: 50%">Two Words</p>', result=result)
+        self.assertGreater(result.performance_metrics['LayoutCount'], 0)
+        self.assertIn('RecalcStyleCount', result.performance_metrics)
+        self.assertIn('JSHeapUsedSize', result.performance_metrics)
+
+        result = RenderResult()
+        ChromePdfMaker(collect_performance_metrics=False).generate_pdf('Two Words', result=result)
+        self.assertIsNone(result.performance_metrics)
+
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_result_trace(self):
+        """Chrome's trace of the render should be written to the TRACE_DIR, and include its layout."""
+
+        with tempfile.TemporaryDirectory() as trace_dir:
+            result = RenderResult()
+            ChromePdfMaker(trace_dir=trace_dir).generate_pdf('<p style="width: 50%">Two Words</p>', result=result)
+            self.assertEqual(trace_dir, os.path.dirname(result.trace_path))
+            with open(result.trace_path, 'r', encoding='utf8') as f:
+                events = json.load(f)['traceEvents']
+            self.assertIn('Layout', [e.get('name') for e in events])
+
+    @override_settings(CHROMEPDF={'SLOW_RENDER_THRESHOLD': 0})
+    def test_generate_pdf_slow_render_log(self):
+        """Slow renders should be logged, with the number of pages that Chrome generated."""
+
+        html = 'Page One<div style="page-break-after: always"></div>Page Two'
+        with self.assertLogs('chromepdf.slow_renders', 'WARNING') as cm:
+            pdfbytes = ChromePdfMaker().generate_pdf(html)
+        record = json.loads(cm.records[0].getMessage())
+        self.assertEqual(2, record['pages'])
+        self.assertEqual(len(pdfbytes), record['pdf_bytes'])
+
+
 class GeneratePdfUrlSimpleTests(TestCase):
 
     @override_settings(CHROMEPDF={})
@@ -363,6 +440,120 @@ Line 3\r\nLine 4"""
         self.assertNotIn("Line 1Line 2Line 3Line 4", extracted_text)
 
 
+class GeneratePdfWaitForTests(TestCase):
+    """Test the WAIT_FOR setting, which delays printing until the page is ready."""
+
+    html = """<body>Early Words<script>
+        window.chromepdfReady = new Promise(resolve => setTimeout(() => {
+            document.body.insertAdjacentText('beforeend', 'Late Words');
+            resolve();
+        }, 500));
+    </script></body>"""
+
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_wait_for_signal(self):
+        """The PDF should only contain content added late by JavaScript if we wait for it."""
+
+        pdfbytes = generate_pdf(self.html)
+        self.assertEqual(0, extractText(pdfbytes).count('Late Words'))
+
+        pdfbytes = generate_pdf(self.html, wait_for='signal')
+        self.assertEqual(1, extractText(pdfbytes).count('Early Words'))
+        self.assertEqual(1, extractText(pdfbytes).count('Late Words'))
+
+        # a custom expression that evaluates to a promise works too
+        pdfbytes = generate_pdf(self.html, wait_for='window.chromepdfReady.then(() => null)')
+        self.assertEqual(1, extractText(pdfbytes).count('Late Words'))
+
+        # the named waits should work with plain html
+        for wait_for in ('load', 'fonts', 'network-idle'):
+            with self.subTest(wait_for=wait_for):
+                pdfbytes = generate_pdf('Two Words', wait_for=wait_for)
+                self.assertEqual(1, extractText(pdfbytes).count('Two Words'))
+
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_wait_for_delayed_signal(self):
+        """A page that sets window.chromepdfReady after a delay should be waited for, as should a late predicate."""
+
+        html = """<body>Early Words<script>
+            setTimeout(() => {
+                window.chromepdfReady = new Promise(resolve => setTimeout(() => {
+                    document.body.insertAdjacentText('beforeend', 'Late Words');
+                    window.chartsDone = true;
+                    resolve();
+                }, 300));
+            }, 300);
+        </script></body>"""
+        for wait_for in ('signal', 'window.chartsDone', '() => window.chartsDone'):
+            with self.subTest(wait_for=wait_for):
+                pdfbytes = generate_pdf(html, wait_for=wait_for)
+                self.assertEqual(1, extractText(pdfbytes).count('Late Words'))
+
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_wait_for_timeout(self):
+        """A page that never becomes ready should raise an exception once the timeout is reached."""
+
+        with self.assertRaisesRegex(ChromePdfException, 'did not complete within 0.1 seconds'):
+            generate_pdf(self.html, wait_for='signal', wait_timeout=0.1)
+
+
+class GeneratePdfBlockNetworkTests(TestCase):
+    """Test the BLOCK_NETWORK setting, which stops Chrome from fetching anything that is not in the NETWORK_ALLOWLIST."""
+
+    def setUp(self):
+        self.requests = []
+        requests = self.requests
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_block_network_ip_address(self):
+        """A url with an IP address rather than a hostname should be blocked, unless it is allowlisted."""
+
+        html = f'Two Words<img src="http://127.0.0.1:{self.server.server_port}/image.png">'
+        generate_pdf(html, wait_for='load', block_network=True)
+        self.assertEqual([], self.requests)
+
+        generate_pdf(html, wait_for='load', block_network=True, network_allowlist=['127.0.0.1'])
+        self.assertEqual(['/image.png'], self.requests)
+
+
+class GeneratePdfJavascriptTests(TestCase):
+    """Test the JAVASCRIPT setting, which can disable scripts for static HTML."""
+
+    @override_settings(CHROMEPDF={})
+    def test_generate_pdf_javascript_disabled(self):
+        """Scripts should only run if JavaScript is enabled."""
+
+        html = "Two Words<script>document.write('Script Words')</script>"
+
+        pdfbytes = generate_pdf(html)
+        self.assertEqual(1, extractText(pdfbytes).count('Two Words'))
+        self.assertEqual(1, extractText(pdfbytes).count('Script Words'))
+
+        pdfbytes = generate_pdf(html, javascript=False)
+        self.assertEqual(1, extractText(pdfbytes).count('Two Words'))
+        self.assertEqual(0, extractText(pdfbytes).count('Script Words'))
+
+        # special characters do not need any escaping when JavaScript is disabled.
+        html = 'Quotes \' " ` ${x} \\ and\nnewlines'
+        pdfbytes = generate_pdf(html, javascript=False)
+        self.assertEqual(1, extractText(pdfbytes).count("Quotes ' \" ` ${x} \\ and"))
+
+
 class PdfPageSizeTests(TestCase):
     """
     Test the functions that actually generate the PDFs.
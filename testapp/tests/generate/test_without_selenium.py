@@ -25,6 +25,12 @@ class NS_GeneratePdfSimpleTests(test_generate_pdf.GeneratePdfSimpleTests):
     pass
 
 
+@hide_selenium_install
+@tag("noselenium")
+class NS_GeneratePdfResultTests(test_generate_pdf.GeneratePdfResultTests):
+    pass
+
+
 @hide_selenium_install
 @tag("noselenium")
 class NS_GeneratePdfPathTests(test_generate_pdf.GeneratePdfPathTests):
@@ -49,6 +55,24 @@ class NS_GeneratePdfEncodingTests(test_generate_pdf.GeneratePdfEncodingTests):
     pass
 
 
+@hide_selenium_install
+@tag("noselenium")
+class NS_GeneratePdfWaitForTests(test_generate_pdf.GeneratePdfWaitForTests):
+    pass
+
+
+@hide_selenium_install
+@tag("noselenium")
+class NS_GeneratePdfBlockNetworkTests(test_generate_pdf.GeneratePdfBlockNetworkTests):
+    pass
+
+
+@hide_selenium_install
+@tag("noselenium")
+class NS_GeneratePdfJavascriptTests(test_generate_pdf.GeneratePdfJavascriptTests):
+    pass
+
+
 @hide_selenium_install
 @tag("noselenium")
 class NS_PdfPageSizeTests(test_generate_pdf.PdfPageSizeTests):
@@ -0,0 +1,127 @@
+import base64
+import os
+import shutil
+import tempfile
+from unittest.case import TestCase
+from unittest.mock import patch
+
+from django.test.utils import override_settings
+
+from chromepdf.assets import StaticAssetCache, inline_static_assets
+from chromepdf.conf import find_static_file
+from chromepdf.maker import ChromePdfMaker
+
+
+class InlineStaticAssetsTests(TestCase):
+    """Test resolving {% static %} urls via the staticfiles finders and inlining them as data: URIs."""
+
+    def setUp(self):
+        self.static_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.static_dir, 'fonts'))
+        self.font_path = os.path.join(self.static_dir, 'fonts', 'my font.woff2')
+        with open(self.font_path, 'wb') as f:
+            f.write(b'FONTBYTES')
+        self.image_path = os.path.join(self.static_dir, 'logo.png')
+        with open(self.image_path, 'wb') as f:
+            f.write(b'PNGBYTES')
+
+    def tearDown(self):
+        shutil.rmtree(self.static_dir)
+
+    def _data_uri(self, mime_type, contents):
+        return f'data:{mime_type};base64,{base64.b64encode(contents).decode("ascii")}'
+
+    def test_inline_attributes_and_css(self):
+        """Urls in src/href attributes and in CSS url() should be inlined."""
+
+        html = ('<style>@font-face { src: url("/static/fonts/my%20font.woff2?v=2"); }</style>'
+                "<img src='/static/logo.png'><a href=\"/static/logo.png#top\">")
+        with override_settings(STATIC_URL='/static/', STATICFILES_DIRS=[self.static_dir]):
+            output = inline_static_assets(html, cache=StaticAssetCache())
+
+        font_uri = self._data_uri('font/woff2', b'FONTBYTES')
+        image_uri = self._data_uri('image/png', b'PNGBYTES')
+        self.assertEqual(f'<style>@font-face {{ src: url("{font_uri}"); }}</style>'
+                         f"<img src='{image_uri}'><a href=\"{image_uri}\">", output)
+
+    def test_unresolved_urls_unchanged(self):
+        """Urls that are missing, or not static urls at all, should be left as-is."""
+
+        html = '<img src="/static/missing.png"><img src="/media/logo.png"><img src="https://example.com/logo.png">'
+        with override_settings(STATIC_URL='/static/', STATICFILES_DIRS=[self.static_dir]):
+            self.assertEqual(html, inline_static_assets(html, cache=StaticAssetCache()))
+
+        # No STATIC_URL at all means nothing to resolve.
+        self.assertEqual(html, inline_static_assets(html, static_url=''))
+
+    def test_cache_mtime_invalidation(self):
+        """A cached file should only be re-read when its mtime or size changes."""
+
+        cache = StaticAssetCache()
+        output1 = cache.get_data_uri(self.image_path)
+        output2 = cache.get_data_uri(self.image_path)
+        self.assertEqual(output1, output2)
+        self.assertEqual((1, 1), (cache.misses, cache.hits))
+
+        with open(self.image_path, 'wb') as f:
+            f.write(b'NEWPNGBYTES')
+        stat = os.stat(self.image_path)
+        os.utime(self.image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        output3 = cache.get_data_uri(self.image_path)
+        self.assertEqual(self._data_uri('image/png', b'NEWPNGBYTES'), output3)
+        self.assertEqual((2, 1), (cache.misses, cache.hits))
+
+    def test_cache_size_limit(self):
+        """Once the data: URIs exceed max_bytes, the least recently used should be dropped."""
+
+        image_uri = self._data_uri('image/png', b'PNGBYTES')
+        cache = StaticAssetCache(max_bytes=len(image_uri) + len(self._data_uri('font/woff2', b'FONTBYTES')))
+        cache.get_data_uri(self.image_path)
+        cache.get_data_uri(self.font_path)
+        cache.get_data_uri(self.image_path)  # now the most recently used
+        self.assertEqual((2, 1), (cache.misses, cache.hits))
+
+        other_path = os.path.join(self.static_dir, 'other.png')
+        with open(other_path, 'wb') as f:
+            f.write(b'PNG')
+        cache.get_data_uri(other_path)  # drops the font
+        self.assertEqual(image_uri, cache.get_data_uri(self.image_path))
+        self.assertEqual((3, 2), (cache.misses, cache.hits))
+        cache.get_data_uri(self.font_path)
+        self.assertEqual((4, 2), (cache.misses, cache.hits))
+
+        # a file too large for the cache is read every time.
+        cache = StaticAssetCache(max_bytes=len(image_uri) - 1)
+        cache.get_data_uri(self.image_path)
+        cache.get_data_uri(self.image_path)
+        self.assertEqual((2, 0), (cache.misses, cache.hits))
+
+    def test_cache_finder_lookups(self):
+        """Found static files should only be looked up via the finders once, until they are no longer files."""
+
+        cache = StaticAssetCache()
+        with override_settings(STATIC_URL='/static/', STATICFILES_DIRS=[self.static_dir]):
+            with patch('chromepdf.assets.find_static_file', wraps=find_static_file) as func:
+                self.assertEqual(self.image_path, cache.find('logo.png'))
+                self.assertEqual(self.image_path, cache.find('logo.png'))
+                self.assertIsNone(cache.find('missing.png'))
+                self.assertIsNone(cache.find('missing.png'))
+                self.assertEqual(3, func.call_count)  # missing files are looked up again, in case they are added
+
+                os.remove(self.image_path)
+                self.assertIsNone(cache.find('logo.png'))
+                self.assertEqual(4, func.call_count)
+
+    @override_settings(CHROMEPDF={'CHROMEDRIVER_DOWNLOADS': False, 'INLINE_STATIC_ASSETS': True})
+    def test_maker_inlines_when_enabled(self):
+        """ChromePdfMaker.generate_pdf() should only inline assets if the INLINE_STATIC_ASSETS setting is on."""
+
+        with patch('chromepdf.maker.get_webdriver_maker'):
+            with patch('chromepdf.maker.inline_static_assets', return_value='inlined') as func:
+                ChromePdfMaker().generate_pdf('<img src="/static/logo.png">')
+                func.assert_called_once_with('<img src="/static/logo.png">')
+
+            with patch('chromepdf.maker.inline_static_assets') as func:
+                ChromePdfMaker(inline_static_assets=False).generate_pdf('<img src="/static/logo.png">')
+                func.assert_not_called()
@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+from unittest.case import TestCase
+from unittest.mock import patch
+
+from chromepdf import RenderResult
+from chromepdf.batch import find_inputs, get_output_path, read_manifest, read_render_manifest, run_jobs
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.fakedriver import FAKE_PDF_BYTES
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+class FindInputsTests(TestCase):
+    """Test finding the HTML files to generate PDFs from."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.root = self.tempdir.name
+        os.makedirs(os.path.join(self.root, 'html', 'sub'))
+        for name in ('a.html', 'b.HTM', 'notes.txt', os.path.join('sub', 'c.html')):
+            with open(os.path.join(self.root, 'html', name), 'w', encoding='utf8') as f:
+                f.write('Two Words')
+
+    def test_find_inputs(self):
+        html_dir = os.path.join(self.root, 'html')
+        a_path = os.path.join(html_dir, 'a.html')
+        expected = [
+            (a_path, 'a.html'),
+            (os.path.join(html_dir, 'b.HTM'), 'b.HTM'),
+            (os.path.join(html_dir, 'sub', 'c.html'), os.path.join('sub', 'c.html')),
+        ]
+        self.assertEqual(expected, find_inputs([html_dir]))
+        self.assertEqual(expected, find_inputs([html_dir, a_path]))  # duplicates are skipped
+        self.assertEqual([(a_path, 'a.html')], find_inputs([os.path.join(html_dir, '*.html')]))
+        self.assertEqual([expected[2][0]], [p for p, _r in find_inputs([os.path.join(html_dir, '**', 'c.html')])])
+
+        # files with the same name in different folders keep the folders that tell them apart.
+        other_a_path = os.path.join(self.root, 'other', 'a.html')
+        os.makedirs(os.path.dirname(other_a_path))
+        with open(other_a_path, 'w', encoding='utf8') as f:
+            f.write('Two Words')
+        self.assertEqual([(a_path, os.path.join('html', 'a.html')), (other_a_path, os.path.join('other', 'a.html'))],
+                         find_inputs([a_path, os.path.join(self.root, 'other', '*.html')]))
+        self.assertEqual([os.path.join('html', 'sub', 'c.html'), os.path.join('other', 'a.html')],
+                         [r for _p, r in find_inputs([os.path.join(html_dir, 'sub'), other_a_path])])
+
+        with self.assertRaises(FileNotFoundError):
+            find_inputs([os.path.join(html_dir, 'missing.html')])
+        with self.assertRaises(FileNotFoundError):
+            find_inputs([os.path.join(html_dir, '*.pdf')])
+
+    def test_get_output_path(self):
+        self.assertEqual(os.path.join('html', 'a.pdf'), get_output_path(os.path.join('html', 'a.html'), 'a.html'))
+        self.assertEqual(os.path.join('out', 'sub', 'c.pdf'),
+                         get_output_path(os.path.join('html', 'sub', 'c.html'), os.path.join('sub', 'c.html'), 'out'))
+
+    def test_read_manifest(self):
+        path = os.path.join(self.root, 'manifest.txt')
+        with open(path, 'w', encoding='utf8') as f:
+            f.write('# inputs\na.html\n\n  b.html  \n')
+        self.assertEqual(['a.html', 'b.html'], read_manifest(path))
+
+
+class RenderManifestTests(TestCase):
+    """Test reading the records of a JSON-lines manifest."""
+
+    def test_read_render_manifest(self):
+        lines = [
+            json.dumps({'id': 1, 'input': 'a.html', 'output': 'a.pdf'}),
+            '',
+            json.dumps({'html': 'Two Words', 'output': 'b.pdf', 'profile': 'letter', 'pdf_kwargs': {'scale': 0.5}}),
+            '{not json',
+            json.dumps({'input': 'a.html', 'html': 'Two Words', 'output': 'c.pdf'}),
+            json.dumps({'input': 'a.html'}),
+            json.dumps({'input': 'a.html', 'output': 'd.pdf', 'profile': 'missing'}),
+            json.dumps(['a.html']),
+        ]
+        profiles = {'letter': {'javascript': False, 'pdf_kwargs': {'paperFormat': 'Letter', 'scale': 0.8}}}
+        jobs = list(read_render_manifest(lines, {'landscape': True}, profiles))
+
+        self.assertEqual({'line': 1, 'id': 1, 'input': 'a.html', 'output': 'a.pdf', 'pdf_kwargs': {'landscape': True}},
+                         jobs[0])
+        self.assertEqual({'line': 3, 'html': 'Two Words', 'output': 'b.pdf', 'profile': 'letter',
+                          'pdf_kwargs': {'landscape': True, 'paperFormat': 'Letter', 'scale': 0.5}}, jobs[1])
+        self.assertEqual([4, 5, 6, 7, 8], [job['line'] for job in jobs[2:]])
+        for job in jobs[2:]:
+            self.assertIn('invalid', job)
+        self.assertIn('Unknown profile', jobs[5]['invalid'])
+
+
+class SessionTests(FakeChromedriverTestCase):
+    """Test reusing a browser for many renders, with the fake chromedriver."""
+
+    def test_session(self):
+        with self.makeFakeMaker().session() as session:
+            for _i in range(3):
+                result = RenderResult()
+                self.assertEqual(FAKE_PDF_BYTES, session.generate_pdf('Two Words', result=result))
+                self.assertIn('print', result.timings)
+                self.assertNotIn('browser_launch', result.timings)  # the browser was launched by the session
+
+    def test_session_failure(self):
+        with self.makeFakeMaker(fake_options={'fail': ['Page.printToPDF']}).session() as session:
+            with self.assertRaises(ChromePdfException):
+                session.generate_pdf('Two Words')
+
+    def test_run_jobs(self):
+        jobs = []
+        for i in range(5):
+            inpath = os.path.join(self.tempdir.name, f'{i}.html')
+            with open(inpath, 'w', encoding='utf8') as f:
+                f.write('Two Words')
+            jobs.append({'input': inpath, 'output': os.path.join(self.tempdir.name, 'out', f'{i}.pdf')})
+        jobs.append({'input': os.path.join(self.tempdir.name, 'missing.html'), 'output': 'missing.pdf'})
+
+        results = list(run_jobs(self.makeFakeMaker(), iter(jobs), workers=2))
+        self.assertEqual(6, len(results))
+        ok = [r for r in results if r['status'] == 'ok']
+        self.assertEqual(5, len(ok))
+        for result in ok:
+            self.assertIn('print', result['timings'])
+            with open(result['output'], 'rb') as f:
+                self.assertEqual(FAKE_PDF_BYTES, f.read())
+        error = [r for r in results if r['status'] == 'error'][0]
+        self.assertIn('missing.html', error['error'])
+
+    def test_run_jobs_failures(self):
+        inpath = os.path.join(self.tempdir.name, 'a.html')
+        with open(inpath, 'w', encoding='utf8') as f:
+            f.write('Two Words')
+        jobs = [{'input': inpath, 'output': os.path.join(self.tempdir.name, f'{i}.pdf')} for i in range(3)]
+        results = list(run_jobs(self.makeFakeMaker(fake_options={'fail': ['Page.printToPDF']}), jobs))
+        self.assertEqual(['error'] * 3, [r['status'] for r in results])
+
+    def test_run_jobs_invalid_pdf_kwargs(self):
+        """A job with invalid pdf_kwargs should fail without closing the browser used for the other jobs."""
+
+        jobs = [
+            {'html': 'Two Words', 'output': os.path.join(self.tempdir.name, 'a.pdf')},
+            {'html': 'Two Words', 'output': os.path.join(self.tempdir.name, 'b.pdf'), 'pdf_kwargs': {'scale': 'big'}},
+            {'html': 'Two Words', 'output': os.path.join(self.tempdir.name, 'c.pdf'), 'pdf_kwargs': {'nonsense': 1}},
+            {'html': 'Two Words', 'output': os.path.join(self.tempdir.name, 'd.pdf'), 'pdf_kwargs': {'scale': 2}},
+        ]
+        maker = self.makeFakeMaker()
+        with patch.object(maker, 'session', wraps=maker.session) as session:
+            results = {r['output']: r for r in run_jobs(maker, jobs)}
+        self.assertEqual(['ok', 'error', 'error', 'ok'], [results[job['output']]['status'] for job in jobs])
+        self.assertEqual(1, session.call_count)
+
+    def test_run_jobs_profiles(self):
+        """Jobs may use HTML strings, and be rendered with the maker of their profile."""
+
+        profiles = {'other': self.makeFakeMaker(
+            chromedriver_path=self.writeFakeChromedriver('failing-chromedriver', fail=['Page.printToPDF']))}
+        jobs = [
+            {'html': 'Two Words', 'output': os.path.join(self.tempdir.name, 'a.pdf')},
+            {'html': 'Two Words', 'output': os.path.join(self.tempdir.name, 'b.pdf'), 'profile': 'other'},
+            {'line': 3, 'invalid': 'Invalid record'},
+        ]
+        results = {r['output'] if 'output' in r else None: r for r in run_jobs(self.makeFakeMaker(), jobs, profiles=profiles)}
+        self.assertEqual('ok', results[jobs[0]['output']]['status'])
+        self.assertEqual('error', results[jobs[1]['output']]['status'])  # the "other" profile fails every render
+        self.assertEqual('Invalid record', results[None]['error'])
+        self.assertNotIn('html', results[jobs[0]['output']])
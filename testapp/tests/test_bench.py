@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.case import TestCase
+from unittest.mock import patch
+
+from chromepdf.bench import _percentile, make_html, run_benchmark, run_matrix
+from chromepdf.run import chromepdf_run
+
+
+class BenchTests(TestCase):
+    """Test the benchmark helpers and the statistics they report."""
+
+    def test_make_html(self):
+        html = make_html(1000 * 1000, pages=4)
+        self.assertAlmostEqual(1000 * 1000, len(html), delta=1000)
+        self.assertEqual(3, html.count('page-break-after'))
+        self.assertIn('123456789', make_html(1))
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(3, _percentile(values, 50))
+        self.assertEqual(5, _percentile(values, 100))
+        self.assertAlmostEqual(4.8, _percentile(values, 95))
+        self.assertIsNone(_percentile([], 50))
+
+    def test_run_benchmark(self):
+        """Latencies, startup times, and memory should be summarized across renders, and errors counted."""
+
+        calls = []
+
+        def generate_pdf(html, result):
+            calls.append(html)
+            if len(calls) == 3:
+                raise ValueError('render failed')
+            result.timings = {'chromedriver_spawn': 0.25, 'browser_launch': 0.5}
+            result.resources = {'summed_peak_rss_bytes': 100 * len(calls)}
+            return b'%PDF'
+
+        with patch('chromepdf.bench.ChromePdfMaker') as clazz:
+            clazz.return_value.generate_pdf.side_effect = generate_pdf
+            output = run_benchmark('noselenium', 2000, pages=2, renders=4, chrome_path='/chrome')
+
+        clazz.assert_called_once_with(use_selenium=False, chrome_path='/chrome')
+        self.assertEqual(4, len(calls))
+        self.assertEqual(1, output['errors'])
+        self.assertEqual('render failed', output['error'])
+        self.assertEqual(0.75, output['startup_mean'])
+        self.assertEqual(400, output['summed_peak_rss_bytes'])
+        self.assertLessEqual(output['latency_p50'], output['latency_p99'])
+        self.assertGreater(output['throughput'], 0)
+
+    def test_run_benchmark_pooled(self):
+        """The pooled backend should render with a BrowserPool of `concurrency` browsers, and close it afterwards."""
+
+        def generate_pdf(html, result):
+            result.resources = {'summed_peak_rss_bytes': 100}  # pooled browsers are only quit after the renders
+            return b'%PDF'
+
+        with patch('chromepdf.bench.ChromePdfMaker') as clazz, patch('chromepdf.bench.BrowserPool') as pool_clazz:
+            pool = pool_clazz.return_value.__enter__.return_value
+            pool.generate_pdf.side_effect = generate_pdf
+            output = run_benchmark('pooled', 1000, concurrency=2, renders=4)
+
+        clazz.assert_called_once_with(use_selenium=False)
+        pool_clazz.assert_called_once_with(clazz.return_value, 2)
+        self.assertEqual(4, pool.generate_pdf.call_count)
+        self.assertTrue(pool_clazz.return_value.__exit__.called)
+        self.assertFalse(clazz.return_value.generate_pdf.called)
+        self.assertEqual(0, output['errors'])
+        self.assertIsNone(output['startup_mean'])
+        self.assertEqual(100, output['summed_peak_rss_bytes'])
+
+    def test_run_matrix(self):
+        with patch('chromepdf.bench.run_benchmark', side_effect=lambda *args, **kwargs: {'args': args}) as func:
+            output = run_matrix(['selenium', 'noselenium'], [1000, 2000], [1], [1, 4], renders=3)
+        self.assertEqual(8, func.call_count)
+        self.assertEqual(('noselenium', 2000, 1, 4, 3), output['results'][-1]['args'])
+        self.assertIn('chromepdf_version', output)
+
+    def test_bench_command(self):
+        """The bench subcommand should parse the matrix axes and write the results as JSON."""
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            outpath = os.path.join(tempdir, 'results', 'bench.json')
+            with patch('chromepdf.bench.run_matrix', return_value={'results': []}) as func:
+                chromepdf_run(['bench', '--backends', 'noselenium', '--html-sizes', '1KB', '2.5MB', '300',
+                               '--concurrency', '1', '4', '--renders', '5', '--chrome-path', '/chrome',
+                               '--output', outpath])
+            func.assert_called_once_with(['noselenium'], [1000, 2500000, 300], [1], [1, 4], 5, chrome_path='/chrome')
+            with open(outpath, encoding='utf8') as f:
+                self.assertEqual({'results': []}, json.load(f))
+
+        with patch('chromepdf.bench.run_matrix', return_value={'results': []}):
+            with redirect_stdout(io.StringIO()) as stdout:
+                chromepdf_run(['bench'])
+        self.assertEqual({'results': []}, json.loads(stdout.getvalue()))
+
+        with redirect_stderr(io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit):
+                chromepdf_run(['bench', '--html-sizes', '10GB'])
+        self.assertIn('invalid size', stderr.getvalue())
@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from unittest.case import TestCase, skipUnless
+
+from chromepdf import RenderResult
+from chromepdf.chrometrace import get_trace_events, get_trace_path, write_trace
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.webdrivermakers import is_selenium_installed
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+def _log_entry(method, params):
+    return {'level': 'INFO', 'timestamp': 0, 'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+
+class ChromeTraceTests(TestCase):
+    """Test reading trace events from the chromedriver's performance log, and writing them to trace files."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+    def test_get_trace_events(self):
+        entries = [
+            _log_entry('Tracing.dataCollected', {'name': 'Layout', 'ph': 'X'}),
+            _log_entry('Tracing.bufferUsage', {'percentFull': 0.5}),
+            _log_entry('Tracing.dataCollected', {'name': 'Paint', 'ph': 'X'}),
+        ]
+        self.assertEqual([{'name': 'Layout', 'ph': 'X'}, {'name': 'Paint', 'ph': 'X'}], list(get_trace_events(entries)))
+
+    def test_write_trace(self):
+        path = get_trace_path(os.path.join(self.tempdir.name, 'traces'))
+        self.assertEqual(path, write_trace(path, iter([{'name': 'Layout'}, {'name': 'Paint'}])))
+        with open(path, 'r', encoding='utf8') as f:
+            self.assertEqual({'traceEvents': [{'name': 'Layout'}, {'name': 'Paint'}]}, json.load(f))
+
+        path = write_trace(get_trace_path(self.tempdir.name), [])
+        with open(path, 'r', encoding='utf8') as f:
+            self.assertEqual({'traceEvents': []}, json.load(f))
+
+    def test_write_trace_failure(self):
+        """A trace that fails to be written should leave no file behind."""
+
+        def events():
+            yield {'name': 'Layout'}
+            raise ValueError('no more events')
+
+        path = get_trace_path(self.tempdir.name)
+        with self.assertRaises(ValueError):
+            write_trace(path, events())
+        self.assertEqual([], os.listdir(self.tempdir.name))
+
+
+class TraceCaptureTests(FakeChromedriverTestCase):
+    """Test capturing traces of renders, with the fake chromedriver."""
+
+    def setUp(self):
+        super().setUp()
+        self.trace_dir = os.path.join(self.tempdir.name, 'traces')
+
+    def _assertTrace(self, path):
+        self.assertEqual(self.trace_dir, os.path.dirname(path))
+        with open(path, 'r', encoding='utf8') as f:
+            self.assertEqual(['Layout'], [e['name'] for e in json.load(f)['traceEvents']])
+
+    def test_trace(self):
+        result = RenderResult()
+        self.makeFakeMaker(trace_dir=self.trace_dir).generate_pdf('Two Words', result=result)
+        self._assertTrace(result.trace_path)
+        self.assertIn('trace', result.timings)
+
+    @skipUnless(is_selenium_installed(), 'Requires Selenium.')
+    def test_trace_with_selenium(self):
+        result = RenderResult()
+        self.makeFakeMaker(use_selenium=True, trace_dir=self.trace_dir).generate_pdf('Two Words', result=result)
+        self._assertTrace(result.trace_path)
+
+    def test_trace_threshold(self):
+        """Renders faster than the threshold should not be traced."""
+
+        result = RenderResult()
+        self.makeFakeMaker(trace_dir=self.trace_dir, trace_threshold=60).generate_pdf('Two Words', result=result)
+        self.assertIsNone(result.trace_path)
+        self.assertFalse(os.path.exists(self.trace_dir))
+
+    def test_trace_failed_render(self):
+        """Renders that fail should still be traced."""
+
+        with self.assertRaises(ChromePdfException):
+            self.makeFakeMaker(fake_options={'fail': ['Page.printToPDF']}, trace_dir=self.trace_dir).generate_pdf('Two Words')
+        paths = os.listdir(self.trace_dir)
+        self.assertEqual(1, len(paths))
+        self._assertTrace(os.path.join(self.trace_dir, paths[0]))
+
+    def test_no_trace(self):
+        result = RenderResult()
+        self.makeFakeMaker().generate_pdf('Two Words', result=result)
+        self.assertIsNone(result.trace_path)
+        self.assertNotIn('trace', result.timings)
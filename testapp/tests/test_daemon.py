@@ -0,0 +1,221 @@
+import io
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from unittest.case import skipUnless
+
+from chromepdf import RenderResult, daemon, metrics
+from chromepdf.daemon import DaemonClient, recv_message, send_message
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.fakedriver import FAKE_PDF_BYTES
+from chromepdf.maker import ChromePdfMaker
+from chromepdf.pool import BrowserPool
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+class BrowserPoolTests(FakeChromedriverTestCase):
+    """Test lending the browsers of a pool to many threads."""
+
+    def test_pool(self):
+        checkouts = metrics.POOL_CHECKOUTS.get()
+        with BrowserPool(self.makeFakeMaker(), size=2) as pool:
+            self.assertEqual(2, metrics.POOL_SIZE.get())
+            with pool.session() as session1, pool.session() as session2:
+                self.assertIsNot(session1, session2)
+                self.assertEqual(2, metrics.POOL_IN_USE.get())
+            with pool.session() as session3:
+                self.assertIs(session1, session3)  # the most recently returned session is reused
+
+            threads = [threading.Thread(target=pool.generate_pdf, args=('Two Words',)) for _i in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(checkouts + 9, metrics.POOL_CHECKOUTS.get())
+        self.assertEqual(0, metrics.POOL_SIZE.get())
+        self.assertEqual(0, metrics.POOL_IN_USE.get())
+        with self.assertRaises(ChromePdfException):
+            pool.generate_pdf('Two Words')
+
+    def test_failed_browser_is_replaced(self):
+        restarts = metrics.CHROMEDRIVER_RESTARTS.get(source='pool')
+        with BrowserPool(self.makeFakeMaker(), size=1) as pool:
+            with pool.session() as session1:
+                pass
+            with self.assertRaises(ChromePdfException):
+                with pool.session() as session:
+                    session._wrapper.proc.kill()  # as if the chromedriver crashed
+                    session._wrapper.proc.wait()
+                    raise ChromePdfException('browser crashed')
+            with pool.session() as session2:
+                self.assertIsNot(session1, session2)
+                self.assertEqual(FAKE_PDF_BYTES, session2.generate_pdf('Two Words'))
+        self.assertEqual(restarts + 1, metrics.CHROMEDRIVER_RESTARTS.get(source='pool'))
+
+    def test_working_browser_is_kept(self):
+        """A failure that is not the browser's, such as a client disconnecting, should not replace the browser."""
+
+        restarts = metrics.CHROMEDRIVER_RESTARTS.get(source='pool')
+        with BrowserPool(self.makeFakeMaker(), size=1) as pool:
+            with pool.session() as session1:
+                pass
+            with self.assertRaises(BrokenPipeError):
+                with pool.session():
+                    raise BrokenPipeError()
+            with self.assertRaises(ChromePdfException):
+                with pool.session():
+                    raise ChromePdfException('render failed')
+            with pool.session() as session2:
+                self.assertIs(session1, session2)
+            self.assertEqual(restarts, metrics.CHROMEDRIVER_RESTARTS.get(source='pool'))
+
+            # invalid pdf_kwargs are rejected before a browser is even taken from the pool.
+            checkouts = metrics.POOL_CHECKOUTS.get()
+            for method in (pool.generate_pdf, pool.generate_pdf_url):
+                with self.assertRaisesRegex(ValueError, 'notAKwarg'):
+                    method('Two Words', {'notAKwarg': 1})
+            with self.assertRaisesRegex(ValueError, 'notAKwarg'):
+                pool.write_pdf('Two Words', io.BytesIO(), {'notAKwarg': 1})
+            self.assertEqual(checkouts, metrics.POOL_CHECKOUTS.get())
+
+    def test_check_health(self):
+        """Checking the pool's health should start a browser if needed, and replace one that no longer responds."""
+
+        restarts = metrics.CHROMEDRIVER_RESTARTS.get(source='pool')
+        with BrowserPool(self.makeFakeMaker(), size=1) as pool:
+            pool.check_health()
+            with pool.session() as session1:
+                pass
+            pool.check_health()
+            with pool.session() as session2:
+                self.assertIs(session1, session2)  # the browser started by the health check is used
+                session2._wrapper.proc.kill()  # as if the chromedriver crashed
+                session2._wrapper.proc.wait()
+                pool.check_health()  # every browser is busy
+            pool.check_health()
+            with pool.session() as session3:
+                self.assertIsNot(session1, session3)
+                self.assertEqual(FAKE_PDF_BYTES, session3.generate_pdf('Two Words'))
+        self.assertEqual(restarts + 1, metrics.CHROMEDRIVER_RESTARTS.get(source='pool'))
+        with self.assertRaises(ChromePdfException):
+            pool.check_health()
+
+        with BrowserPool(self.makeFakeMaker(fake_options={'fail': ['session']}), size=1) as pool:
+            with self.assertRaises(ChromePdfException):
+                pool.check_health()
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            BrowserPool(self.makeFakeMaker(), size=0)
+
+
+@skipUnless(hasattr(socket, 'AF_UNIX'), 'Requires Unix sockets.')
+class DaemonTests(FakeChromedriverTestCase):
+    """Test rendering through a render daemon, using the fake chromedriver."""
+
+    def setUp(self):
+        super().setUp()
+        self.socket_path = os.path.join(self.tempdir.name, 'chromepdf.sock')
+        pool = BrowserPool(self.makeFakeMaker(), size=2)
+        self.addCleanup(pool.close)
+        self.server = daemon.RenderDaemonServer(self.socket_path, pool)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_messages(self):
+        sock1, sock2 = socket.socketpair()
+        with sock1, sock2, sock2.makefile('rb') as rfile:
+            send_message(sock1, {'command': 'ping'}, b'body')
+            self.assertEqual(({'command': 'ping'}, b'body'), recv_message(rfile))
+            send_message(sock1, {}, b'x' * 10)
+            output = io.BytesIO()
+            self.assertEqual(({}, 10), recv_message(rfile, output))
+            self.assertEqual(b'x' * 10, output.getvalue())
+
+            # messages that claim to be too large are rejected before they are read.
+            send_message(sock1, {}, b'x' * 10)
+            with self.assertRaisesRegex(ValueError, 'larger than 9 bytes'):
+                recv_message(rfile, max_body_size=9)
+            sock1.sendall(daemon._PREFIX.pack(daemon.MAX_HEADER_SIZE + 1, 0))
+            with self.assertRaisesRegex(ValueError, 'header'):
+                recv_message(rfile)
+
+    def test_generate_pdf(self):
+        maker = ChromePdfMaker(daemon=self.socket_path)
+        result = RenderResult()
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words', result=result))
+        self.assertEqual(FAKE_PDF_BYTES, result.pdf_bytes)
+        self.assertIn('print', result.timings)
+
+        output = io.BytesIO()
+        self.assertEqual(len(FAKE_PDF_BYTES), maker.write_pdf('Two Words', output))
+        self.assertEqual(FAKE_PDF_BYTES, output.getvalue())
+
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf_url('file:///tmp/input.html'))
+        with maker.session() as session:
+            self.assertEqual(FAKE_PDF_BYTES, session.generate_pdf('Two Words'))
+
+    def test_errors(self):
+        maker = ChromePdfMaker(daemon=self.socket_path)
+        with self.assertRaisesRegex(ValueError, 'Unrecognized pdf_kwargs'):
+            maker.generate_pdf('Two Words', {'notAKwarg': 1})
+        with self.assertRaisesRegex(ValueError, 'Unknown command'):
+            DaemonClient(self.socket_path)._request({'command': 'unknown'})
+        with self.assertRaisesRegex(ChromePdfException, 'Could not render with the ChromePDF daemon'):
+            ChromePdfMaker(daemon=os.path.join(self.tempdir.name, 'missing.sock')).generate_pdf('Two Words')
+
+    def test_timeout(self):
+        """A daemon that accepts the connection but never responds should be given up on after the timeout."""
+
+        self.assertEqual(300, ChromePdfMaker(daemon=self.socket_path)._render_client.timeout)
+        self.assertEqual(60, ChromePdfMaker(daemon=self.socket_path, daemon_timeout=60)._render_client.timeout)
+
+        stalled_path = os.path.join(self.tempdir.name, 'stalled.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(stalled_path)
+            sock.listen()
+            start = time.monotonic()
+            with self.assertRaisesRegex(ChromePdfException, 'Could not render with the ChromePDF daemon'):
+                DaemonClient(stalled_path, timeout=0.2).generate_pdf('Two Words')
+            self.assertLess(time.monotonic() - start, 5)
+
+    def test_socket_in_use(self):
+        with self.assertRaisesRegex(OSError, 'another daemon is already listening'):
+            daemon.RenderDaemonServer(self.socket_path, None)
+
+        not_a_socket = os.path.join(self.tempdir.name, 'file.txt')
+        with open(not_a_socket, 'w', encoding='utf8'):
+            pass
+        with self.assertRaisesRegex(OSError, 'is not a socket'):
+            daemon.RenderDaemonServer(not_a_socket, None)
+
+    def test_serve_command(self):
+        """The serve command should render for clients, and remove its socket file when it is terminated."""
+
+        socket_path = os.path.join(self.tempdir.name, 'serve.sock')
+        proc = subprocess.Popen([sys.executable, '-m', 'chromepdf', 'serve', f'--socket={socket_path}',
+                                 '--pool-size=2', f'--chrome-path={sys.executable}', '--use-selenium=0',
+                                 f'--chromedriver-path={self.writeFakeChromedriver()}', '--chromedriver-downloads=0'],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            self.assertIn(b'Listening on', proc.stdout.readline())
+            client = DaemonClient(socket_path)
+            for _i in range(100):
+                try:
+                    client.ping()
+                    break
+                except ChromePdfException:
+                    time.sleep(0.05)
+            self.assertEqual(FAKE_PDF_BYTES, ChromePdfMaker(daemon=socket_path).generate_pdf('Two Words'))
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            _stdout, stderr = proc.communicate(timeout=30)
+        self.assertEqual(0, proc.returncode, stderr)
+        self.assertFalse(os.path.exists(socket_path))
@@ -0,0 +1,221 @@
+import base64
+import gc
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+from unittest.case import TestCase, skipUnless
+
+from chromepdf import RenderResult, metrics
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.fakedriver import FAKE_PDF_BYTES, FakeChromedriver
+from chromepdf.maker import ChromePdfMaker
+from chromepdf.webdrivermakers import _wait_for_chromedriver, get_chromedriver_response, is_selenium_installed
+from testapp.tests.utils import FakeChromedriverTestCase, extractText
+
+
+class FakeChromedriverTests(TestCase):
+    """Test the fake chromedriver's endpoints, and its latency and failure injection."""
+
+    def test_endpoints(self):
+        with FakeChromedriver() as fake:
+            session_id = get_chromedriver_response(f'{fake.url}/session', {'capabilities': {}})['sessionId']
+            session_url = f'{fake.url}/session/{session_id}'
+
+            self.assertEqual({'value': None}, get_chromedriver_response(f'{session_url}/url', {'url': 'data:,'}))
+            get_chromedriver_response(f'{session_url}/execute/sync', {'script': 'document.write("")', 'args': []})
+            output = get_chromedriver_response(f'{session_url}/chromium/send_command_and_get_result',
+                                               {'cmd': 'Page.printToPDF', 'params': {}})
+            self.assertEqual(FAKE_PDF_BYTES, base64.b64decode(output['value']['data']))
+            get_chromedriver_response(session_url, method='DELETE')
+
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                get_chromedriver_response(f'{session_url}/url', {'url': 'data:,'})  # the session was deleted
+            self.assertEqual(404, cm.exception.code)
+
+        self.assertEqual(['session', 'url', 'execute', 'Page.printToPDF', 'quit'], fake.requests)
+        self.assertIn('Fake PDF', extractText(FAKE_PDF_BYTES))
+
+    def test_latency_and_failures(self):
+        with FakeChromedriver(command_latency={'url': 0.2}, fail=['Page.printToPDF']) as fake:
+            session_id = get_chromedriver_response(f'{fake.url}/session', {})['sessionId']
+            session_url = f'{fake.url}/session/{session_id}'
+
+            start = time.monotonic()
+            get_chromedriver_response(f'{session_url}/url', {'url': 'data:,'})
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                get_chromedriver_response(f'{session_url}/chromium/send_command_and_get_result',
+                                          {'cmd': 'Page.printToPDF', 'params': {}})
+            self.assertEqual(500, cm.exception.code)
+
+        with FakeChromedriver(failure_rate=1) as fake:
+            with self.assertRaises(urllib.error.HTTPError):
+                get_chromedriver_response(f'{fake.url}/session', {})
+
+
+class FakeChromedriverProcessTests(FakeChromedriverTestCase):
+    """Test generating PDFs through the webdriver makers, with the fake chromedriver run as their chromedriver."""
+
+    def test_generate_pdf_without_selenium(self):
+        result = RenderResult()
+        pdf_bytes = self.makeFakeMaker().generate_pdf('Two Words', {'scale': 0.5}, result=result)
+        self.assertEqual(FAKE_PDF_BYTES, pdf_bytes)
+        self.assertIn('chromedriver_spawn', result.timings)
+
+    @skipUnless(is_selenium_installed(), 'Requires Selenium.')
+    def test_generate_pdf_with_selenium(self):
+        self.assertEqual(FAKE_PDF_BYTES, self.makeFakeMaker(use_selenium=True).generate_pdf('Two Words'))
+
+    def test_write_pdf(self):
+        outfile = io.BytesIO()
+        result = RenderResult()
+        self.assertEqual(len(FAKE_PDF_BYTES), self.makeFakeMaker().write_pdf('Two Words', outfile, result=result))
+        self.assertEqual(FAKE_PDF_BYTES, outfile.getvalue())
+        self.assertIsNone(result.pdf_bytes)
+        self.assertIn('stream', result.timings)
+
+    def test_injected_failure(self):
+        with self.assertRaises(ChromePdfException):
+            self.makeFakeMaker(fake_options={'fail': ['Page.printToPDF']}).generate_pdf('Two Words')
+
+    def test_chromedriver_exits(self):
+        """A chromedriver that exits before it listens on its port should fail quickly."""
+
+        proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+        with self.assertRaises(OSError):
+            _wait_for_chromedriver(proc, 1, timeout=10)
+
+
+class AttachTests(TestCase):
+    """Test generating PDFs with an already-running chromedriver, and attaching to an already-running Chrome."""
+
+    def test_chromedriver_url_without_selenium(self):
+        with FakeChromedriver() as fake:
+            maker = ChromePdfMaker(use_selenium=False, chromedriver_url=fake.url, chromedriver_downloads=False)
+            for _i in range(2):
+                result = RenderResult()
+                self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words', result=result))
+                self.assertNotIn('chromedriver_spawn', result.timings)
+            self.assertEqual(2, fake.requests.count('session'))
+            self.assertEqual(2, fake.requests.count('quit'))
+            self.assertEqual(set(), fake.sessions)
+            self.assertIn('--headless', fake.new_sessions[0]['desiredCapabilities']['chromeOptions']['args'])
+
+    def test_chrome_debugger_address_without_selenium(self):
+        with FakeChromedriver() as fake:
+            maker = ChromePdfMaker(use_selenium=False, chromedriver_url=f'{fake.url}/',
+                                   chrome_debugger_address='localhost:9222', chromedriver_downloads=False)
+            self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words'))
+            self.assertEqual({'debuggerAddress': 'localhost:9222'},
+                             fake.new_sessions[0]['desiredCapabilities']['chromeOptions'])
+            self.assertEqual(['session', 'new_window', 'switch_window'], fake.requests[:3])
+            self.assertEqual(['close_window', 'quit'], fake.requests[-2:])
+
+            # concurrent sessions render in tabs of their own, which are closed when they end.
+            with maker.session() as session1, maker.session() as session2:
+                self.assertEqual(2, len(fake.windows))
+                self.assertEqual(FAKE_PDF_BYTES, session1.generate_pdf('Two Words'))
+                self.assertEqual(FAKE_PDF_BYTES, session2.generate_pdf('Two Words'))
+            self.assertEqual(set(), fake.windows)
+            self.assertEqual(set(), fake.sessions)
+
+    def test_chrome_debugger_address_with_chrome_args(self):
+        """Settings that change Chrome's arguments cannot apply to a running Chrome, so should not be accepted."""
+
+        kwargs = {'use_selenium': False, 'chromedriver_url': 'http://localhost:9515',
+                  'chrome_debugger_address': 'localhost:9222', 'chromedriver_downloads': False}
+        for name, value in (('chrome_args', ['--lang=de']), ('block_network', True),
+                            ('user_data_dir', os.path.join(tempfile.gettempdir(), 'profiles')),
+                            ('trace_dir', tempfile.gettempdir())):
+            with self.subTest(name=name):
+                with self.assertRaisesRegex(ValueError, f'chrome_debugger_address cannot be combined with {name},'):
+                    ChromePdfMaker(**kwargs, **{name: value})
+        with self.assertRaisesRegex(ValueError, 'combined with block_network, trace_dir, since'):
+            ChromePdfMaker(**kwargs, block_network=True, trace_dir=tempfile.gettempdir())
+
+    def test_chrome_debugger_address_tab_fails(self):
+        """If a tab cannot be opened in the attached Chrome, the session should be ended."""
+
+        with FakeChromedriver(fail=['new_window']) as fake:
+            maker = ChromePdfMaker(use_selenium=False, chromedriver_url=fake.url,
+                                   chrome_debugger_address='localhost:9222', chromedriver_downloads=False)
+            with self.assertRaises(ChromePdfException):
+                maker.generate_pdf('Two Words')
+            self.assertEqual(set(), fake.sessions)
+
+    @skipUnless(is_selenium_installed(), 'Requires Selenium.')
+    def test_attach_with_selenium(self):
+        with FakeChromedriver() as fake:
+            maker = ChromePdfMaker(use_selenium=True, chromedriver_url=fake.url,
+                                   chrome_debugger_address='localhost:9222', chromedriver_downloads=False)
+            self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words'))
+            chrome_options = fake.new_sessions[0]['capabilities']['alwaysMatch']['goog:chromeOptions']
+            self.assertEqual('localhost:9222', chrome_options['debuggerAddress'])
+            self.assertEqual([], chrome_options['args'])
+            self.assertEqual(set(), fake.sessions)
+            self.assertIn('new_window', fake.requests)
+            self.assertIn('close_window', fake.requests)
+            self.assertEqual(set(), fake.windows)
+
+    def test_chromedriver_url_not_running(self):
+        with self.assertRaises(ChromePdfException):
+            ChromePdfMaker(use_selenium=False, chromedriver_url='http://127.0.0.1:1').generate_pdf('Two Words')
+
+
+class SharedChromedriverTests(FakeChromedriverTestCase):
+    """Test creating many sessions on one chromedriver, with the SHARE_CHROMEDRIVER setting."""
+
+    def _make(self, use_selenium=False):
+        maker = self.makeFakeMaker(use_selenium, share_chromedriver=True)
+        self.addCleanup(maker.close)
+        return maker
+
+    def test_sessions_share_chromedriver(self):
+        maker = self._make()
+        with maker.session() as session1, maker.session() as session2:
+            self.assertEqual(session1._wrapper.chromedriver_url, session2._wrapper.chromedriver_url)
+            self.assertEqual(FAKE_PDF_BYTES, session1.generate_pdf('Two Words'))
+            self.assertEqual(FAKE_PDF_BYTES, session2.generate_pdf('Two Words'))
+        proc = maker._chromedriver_service.proc
+        self.assertIsNone(proc.poll())  # still running once its sessions are closed
+
+        result = RenderResult()
+        maker.generate_pdf('Two Words', result=result)
+        self.assertNotIn('chromedriver_spawn', result.timings)
+        self.assertIs(proc, maker._chromedriver_service.proc)
+
+        maker.close()
+        self.assertIsNotNone(proc.poll())
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words', result=result))  # started again
+        self.assertIn('chromedriver_spawn', result.timings)
+
+    def test_chromedriver_restarted_after_exit(self):
+        maker = self._make()
+        maker.generate_pdf('Two Words')
+        restarts = metrics.CHROMEDRIVER_RESTARTS.get(source='shared_chromedriver')
+        proc = maker._chromedriver_service.proc
+        proc.kill()
+        proc.wait()
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words'))
+        self.assertIsNot(proc, maker._chromedriver_service.proc)
+        self.assertEqual(restarts + 1, metrics.CHROMEDRIVER_RESTARTS.get(source='shared_chromedriver'))
+
+    @skipUnless(is_selenium_installed(), 'Requires Selenium.')
+    def test_sessions_share_chromedriver_with_selenium(self):
+        maker = self._make(use_selenium=True)
+        with maker.session() as session1, maker.session() as session2:
+            self.assertEqual(session1._wrapper.chromedriver_url, session2._wrapper.chromedriver_url)
+            self.assertEqual(FAKE_PDF_BYTES, session1.generate_pdf('Two Words'))
+
+    def test_chromedriver_ended_with_maker(self):
+        maker = self.makeFakeMaker(share_chromedriver=True)
+        maker.generate_pdf('Two Words')
+        proc = maker._chromedriver_service.proc
+        del maker
+        gc.collect()
+        self.assertIsNotNone(proc.poll())
@@ -0,0 +1,112 @@
+import http.client
+import json
+import threading
+
+from chromepdf.fakedriver import FAKE_PDF_BYTES
+from chromepdf.httpserver import PDF_KWARGS_HEADER, RenderHTTPServer
+from chromepdf.pool import BrowserPool
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+class RenderHTTPServerTests(FakeChromedriverTestCase):
+    """Test rendering through the HTTP render server, using the fake chromedriver."""
+
+    def _start_server(self, queue_size=2, **fake_options):
+        pool = BrowserPool(self.makeFakeMaker(fake_options=fake_options), size=1)
+        self.addCleanup(pool.close)
+        server = RenderHTTPServer(('127.0.0.1', 0), pool, queue_size)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def _connect(self, server):
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=30)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_render(self):
+        """PDFs should be streamed with chunked encoding, and many requests should share one connection."""
+
+        server = self._start_server()
+        conn = self._connect(server)
+        for pdf_kwargs in ({}, {'landscape': True}):
+            headers = {PDF_KWARGS_HEADER: json.dumps(pdf_kwargs)}
+            conn.request('POST', '/pdf', body='Two Words'.encode('utf8'), headers=headers)
+            response = conn.getresponse()
+            self.assertEqual(200, response.status)
+            self.assertEqual('chunked', response.getheader('Transfer-Encoding'))
+            self.assertEqual('application/pdf', response.getheader('Content-Type'))
+            self.assertEqual(FAKE_PDF_BYTES, response.read())
+        self.assertEqual(0, server.active)
+
+    def test_bad_requests(self):
+        server = self._start_server()
+        conn = self._connect(server)
+        for headers in ({PDF_KWARGS_HEADER: '{"notAKwarg": 1}'}, {PDF_KWARGS_HEADER: '[]'}, {PDF_KWARGS_HEADER: '{'}):
+            with self.subTest(headers=headers):
+                conn.request('POST', '/pdf', body=b'Two Words', headers=headers)
+                response = conn.getresponse()
+                self.assertEqual(400, response.status)
+                self.assertIn('error', json.loads(response.read()))
+
+        conn.request('POST', '/missing', body=b'Two Words')
+        response = conn.getresponse()
+        self.assertEqual(404, response.status)
+        response.read()
+
+        conn.putrequest('POST', '/pdf')
+        conn.endheaders()
+        response = conn.getresponse()
+        self.assertEqual(411, response.status)
+
+    def test_busy(self):
+        """Requests beyond the pool size plus the queue size should be rejected."""
+
+        server = self._start_server(queue_size=0)
+        conn = self._connect(server)
+        with server.track_request() as accepted:
+            self.assertTrue(accepted)
+            conn.request('POST', '/pdf', body=b'Two Words')
+            response = conn.getresponse()
+            self.assertEqual(503, response.status)
+            self.assertEqual('1', response.getheader('Retry-After'))
+            response.read()
+
+    def test_render_failure(self):
+        server = self._start_server(fail=['Page.printToPDF'])
+        conn = self._connect(server)
+        with self.assertLogs('chromepdf.http', 'WARNING'):
+            conn.request('POST', '/pdf', body=b'Two Words')
+            response = conn.getresponse()
+        self.assertEqual(500, response.status)
+        self.assertIn('error', json.loads(response.read()))
+
+    def test_health_and_metrics(self):
+        server = self._start_server()
+        conn = self._connect(server)
+        conn.request('GET', '/health')
+        response = conn.getresponse()
+        self.assertEqual(200, response.status)
+        health = json.loads(response.read())
+        self.assertEqual('ok', health['status'])
+        self.assertEqual(1, health['pool_size'])
+
+        conn.request('GET', '/metrics')
+        response = conn.getresponse()
+        self.assertEqual(200, response.status)
+        self.assertIn(b'chromepdf_pool_size', response.read())
+
+    def test_unhealthy(self):
+        """A server whose pool cannot launch a browser should report that it is unhealthy."""
+
+        server = self._start_server(fail=['session'])
+        conn = self._connect(server)
+        with self.assertLogs('chromepdf.http', 'WARNING'):
+            conn.request('GET', '/health')
+            response = conn.getresponse()
+        self.assertEqual(503, response.status)
+        health = json.loads(response.read())
+        self.assertEqual('unhealthy', health['status'])
+        self.assertIn('error', health)
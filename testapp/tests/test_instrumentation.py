@@ -0,0 +1,103 @@
+import threading
+from unittest.case import TestCase
+from unittest.mock import MagicMock, patch
+
+from django.test.utils import override_settings
+
+from chromepdf import RenderResult
+from chromepdf.instrumentation import PhaseTimer, phase, register_hook, unregister_hook
+from chromepdf.maker import ChromePdfMaker
+
+
+class PhaseTimerTests(TestCase):
+    """Test the recording of phase timings to timers and hooks."""
+
+    def test_phase_timer(self):
+        """Phases should only be recorded to the timer that is active on the current thread."""
+
+        timer = PhaseTimer()
+        with timer.activate():
+            with phase('print'):
+                pass
+            with phase('print'):
+                pass
+
+            # phases from other threads must not be recorded to this thread's timer
+            def other_thread():
+                with phase('navigate'):
+                    pass
+
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            thread.join()
+
+        with phase('decode'):  # no longer active
+            pass
+
+        self.assertEqual(['print'], list(timer.timings))
+        self.assertGreaterEqual(timer.timings['print'], 0)
+
+    def test_nested_timers(self):
+        """Activating a timer should restore the previously-active timer afterwards."""
+
+        outer = PhaseTimer()
+        inner = PhaseTimer()
+        with outer.activate():
+            with inner.activate():
+                with phase('print'):
+                    pass
+            with phase('decode'):
+                pass
+
+        self.assertEqual(['print'], list(inner.timings))
+        self.assertEqual(['decode'], list(outer.timings))
+
+    def test_hooks(self):
+        """Registered hooks should be called with each phase name and duration, even if the phase fails."""
+
+        calls = []
+
+        def hook(name, seconds):
+            calls.append((name, seconds))
+
+        register_hook(hook)
+        try:
+            with phase('print'):
+                pass
+            with self.assertRaises(ValueError):
+                with phase('decode'):
+                    raise ValueError()
+        finally:
+            unregister_hook(hook)
+
+        with phase('quit'):  # no longer registered
+            pass
+
+        self.assertEqual(['print', 'decode'], [c[0] for c in calls])
+        self.assertTrue(all(isinstance(c[1], float) for c in calls))
+
+
+class ChromePdfMakerTimingTests(TestCase):
+
+    @override_settings(CHROMEPDF={'CHROMEDRIVER_DOWNLOADS': False})
+    def test_render_result(self):
+        """ChromePdfMaker.generate_pdf() should fill a RenderResult with the PDF and the render's phase timings."""
+
+        def generate_pdf(html, pdf_kwargs):
+            with phase('print'):
+                return b'%PDF'
+
+        wrapper = MagicMock(render_resources={'cpu_seconds': 1.0}, performance_metrics={'LayoutCount': 2})
+        wrapper.generate_pdf.side_effect = generate_pdf
+        with patch('chromepdf.maker.get_webdriver_maker') as func:
+            func.return_value.__enter__.return_value = wrapper
+
+            result = RenderResult()
+            pdf_bytes = ChromePdfMaker().generate_pdf('Two Words', result=result)
+
+        self.assertEqual(b'%PDF', pdf_bytes)
+        self.assertEqual(b'%PDF', result.pdf_bytes)
+        self.assertEqual({'print', 'render'}, set(result.timings))
+        self.assertGreaterEqual(result.timings['render'], result.timings['print'])
+        self.assertEqual({'cpu_seconds': 1.0}, result.resources)
+        self.assertEqual({'LayoutCount': 2}, result.performance_metrics)
@@ -0,0 +1,112 @@
+import subprocess
+import sys
+from unittest.case import TestCase
+from unittest.mock import MagicMock, patch
+
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from chromepdf import metrics
+from chromepdf.instrumentation import phase
+from chromepdf.maker import ChromePdfMaker
+from chromepdf.metrics import Counter, Gauge, Histogram, MetricsRegistry
+from chromepdf.views import metrics_view
+
+
+class MetricsTests(TestCase):
+    """Test the metric types and their Prometheus text format output."""
+
+    def test_counter(self):
+        counter = Counter('test_total', 'A test counter.', ['kind'])
+        counter.inc(kind='a')
+        counter.inc(2, kind='a')
+        counter.inc(kind='b"c')
+        self.assertEqual(3, counter.get(kind='a'))
+        with self.assertRaises(ValueError):
+            counter.inc(-1, kind='a')
+        with self.assertRaises(ValueError):
+            counter.inc()  # missing label
+        self.assertEqual('# HELP test_total A test counter.\n'
+                         '# TYPE test_total counter\n'
+                         'test_total{kind="a"} 3.0\n'
+                         'test_total{kind="b\\"c"} 1.0', counter.exposition())
+
+    def test_gauge(self):
+        gauge = Gauge('test_depth', 'A test gauge.')
+        gauge.inc(3)
+        gauge.dec()
+        self.assertEqual(2, gauge.get())
+        gauge.set(7)
+        self.assertEqual('# HELP test_depth A test gauge.\n# TYPE test_depth gauge\ntest_depth 7.0', gauge.exposition())
+
+    def test_histogram(self):
+        histogram = Histogram('test_seconds', 'A test histogram.', buckets=(1, 5))
+        histogram.observe(0.5)
+        histogram.observe(3)
+        histogram.observe(10)
+        self.assertEqual((3, 13.5), histogram.get())
+        self.assertEqual('# HELP test_seconds A test histogram.\n'
+                         '# TYPE test_seconds histogram\n'
+                         'test_seconds_bucket{le="1.0"} 1.0\n'
+                         'test_seconds_bucket{le="5.0"} 2.0\n'
+                         'test_seconds_bucket{le="+Inf"} 3.0\n'
+                         'test_seconds_sum 13.5\n'
+                         'test_seconds_count 3.0', histogram.exposition())
+
+    def test_registry(self):
+        registry = MetricsRegistry()
+        registry.register(Counter('test_total', 'A test counter.'))
+        with self.assertRaises(ValueError):
+            registry.register(Counter('test_total', 'A duplicate name.'))
+        self.assertEqual('# HELP test_total A test counter.\n# TYPE test_total counter\n', registry.exposition())
+
+    def test_metrics_view(self):
+        """The Django view should serve the registry's output."""
+
+        response = metrics_view(RequestFactory().get('/metrics/'))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(metrics.CONTENT_TYPE, response['Content-Type'])
+        self.assertIn('# TYPE chromepdf_renders_total counter', response.content.decode('utf8'))
+
+    def test_views_import_without_django(self):
+        """Importing the views should not import Django, which only chromepdf.conf imports, when it is needed."""
+
+        script = 'import sys, chromepdf.views; print("django" in sys.modules)'
+        output = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, check=True, timeout=60).stdout
+        self.assertEqual(b'False', output.strip())
+
+
+class RenderMetricsTests(TestCase):
+    """Test that renders are counted in the metrics."""
+
+    @override_settings(CHROMEPDF={'CHROMEDRIVER_DOWNLOADS': False})
+    def test_render_metrics(self):
+
+        def generate_pdf(html, pdf_kwargs):
+            with phase('browser_launch'):
+                pass
+            if html == 'fail':
+                raise ValueError()
+            return b'%PDF-1.4'
+
+        renders = metrics.RENDERS.get()
+        failures = metrics.RENDER_FAILURES.get()
+        bytes_in = metrics.BYTES_IN.get()
+        bytes_out = metrics.BYTES_OUT.get()
+        launches = metrics.BROWSER_LAUNCHES.get()
+        render_count = metrics.PHASE_SECONDS.get(phase='render')[0]
+
+        wrapper = MagicMock()
+        wrapper.generate_pdf.side_effect = generate_pdf
+        with patch('chromepdf.maker.get_webdriver_maker') as func:
+            func.return_value.__enter__.return_value = wrapper
+            ChromePdfMaker().generate_pdf('Two Words')
+            with self.assertRaises(ValueError):
+                ChromePdfMaker().generate_pdf('fail')
+
+        self.assertEqual(renders + 2, metrics.RENDERS.get())
+        self.assertEqual(failures + 1, metrics.RENDER_FAILURES.get())
+        self.assertEqual(bytes_in + len('Two Words') + len('fail'), metrics.BYTES_IN.get())
+        self.assertEqual(bytes_out + len(b'%PDF-1.4'), metrics.BYTES_OUT.get())
+        self.assertEqual(launches + 2, metrics.BROWSER_LAUNCHES.get())
+        self.assertEqual(render_count + 2, metrics.PHASE_SECONDS.get(phase='render')[0])
@@ -0,0 +1,144 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.case import TestCase
+from unittest.mock import MagicMock, call, patch
+
+from chromepdf import metrics
+from chromepdf.resources import ProcessTreeTracker, get_process_tree, get_process_tree_tracker, is_supported
+from chromepdf.webdrivermakers import _record_browser_resources, _track_render_resources
+
+
+class ProcessTreeTests(TestCase):
+    """Test reading the CPU and memory of a process tree from a /proc filesystem."""
+
+    def setUp(self):
+        self.proc_dir = tempfile.mkdtemp()
+        patcher = patch('chromepdf.resources._PROC_DIR', self.proc_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.proc_dir)
+
+    def _add_process(self, pid, ppid, name, cpu_ticks, rss_kb, peak_rss_kb, starttime=1000):
+        os.makedirs(os.path.join(self.proc_dir, str(pid)))
+        fields = ['S', str(ppid)] + ['0'] * 9 + [str(cpu_ticks), '0', '0', '0'] + ['0'] * 4 + [str(starttime)]
+        with open(os.path.join(self.proc_dir, str(pid), 'stat'), 'w', encoding='utf8') as f:
+            f.write(f'{pid} ({name}) {" ".join(fields)} 0 0\n')
+        with open(os.path.join(self.proc_dir, str(pid), 'status'), 'w', encoding='utf8') as f:
+            f.write(f'Name:\t{name}\nVmHWM:\t{peak_rss_kb} kB\nVmRSS:\t{rss_kb} kB\n')
+
+    def test_process_tree(self):
+        """Only the root process and its descendants should be included. Names may contain spaces and parens."""
+
+        ticks = os.sysconf('SC_CLK_TCK')
+        self._add_process(10, 1, 'chromedriver', ticks, 100, 200)
+        self._add_process(11, 10, 'chrome', 2 * ticks, 1000, 3000)
+        self._add_process(12, 11, 'chrome (renderer) x', 3 * ticks, 500, 500)
+        self._add_process(20, 1, 'unrelated', 100 * ticks, 9999, 9999)
+
+        self.assertEqual({10: (1000, 1.0), 11: (1000, 2.0), 12: (1000, 3.0)}, get_process_tree(10))
+        self.assertEqual({}, get_process_tree(99))
+
+        tracker = ProcessTreeTracker(10)
+        self.assertEqual(
+            {'cpu_seconds': 6.0, 'rss_bytes': 1600 * 1024, 'summed_peak_rss_bytes': 3700 * 1024, 'processes': 3},
+            tracker.sample())
+
+        # an exited renderer's peak memory is still counted. its CPU time moves to its parent once reaped.
+        shutil.rmtree(os.path.join(self.proc_dir, '12'))
+        self._add_process(13, 11, 'chrome', 0, 100, 100)
+        sample = tracker.sample()
+        self.assertEqual(3800 * 1024, sample['summed_peak_rss_bytes'])
+        self.assertEqual(3, ProcessTreeTracker.usage_between({'cpu_seconds': 1}, {'cpu_seconds': 4})['cpu_seconds'])
+
+    def test_reset_peaks(self):
+        """After reset_peaks(), the kernel's peaks should be reset, and the lifetime peaks kept by the tracker."""
+
+        self._add_process(10, 1, 'chromedriver', 0, 100, 200)
+        self._add_process(11, 10, 'chrome', 0, 1000, 3000)
+        tracker = ProcessTreeTracker(10)
+        tracker.sample()
+        tracker.reset_peaks()
+        for pid in (10, 11):
+            with open(os.path.join(self.proc_dir, str(pid), 'clear_refs'), encoding='utf8') as f:
+                self.assertEqual('5', f.read())
+
+        # as the kernel would have it after the reset, and the browser then used a little more memory.
+        for pid in (10, 11):
+            shutil.rmtree(os.path.join(self.proc_dir, str(pid)))
+        self._add_process(10, 1, 'chromedriver', 0, 100, 100)
+        self._add_process(11, 10, 'chrome', 0, 1000, 1500)
+        self.assertEqual(1600 * 1024, tracker.sample(since_reset=True)['summed_peak_rss_bytes'])
+        self.assertEqual(3200 * 1024, tracker.sample()['summed_peak_rss_bytes'])
+
+    def test_unsupported(self):
+        self.assertIsNone(get_process_tree_tracker(None))
+        with patch('chromepdf.resources.is_supported', return_value=False):
+            self.assertIsNone(get_process_tree_tracker(10))
+
+
+class RealProcessTreeTests(TestCase):
+
+    @unittest.skipUnless(is_supported(), 'Requires a /proc filesystem.')
+    def test_real_process_tree(self):
+        proc = subprocess.Popen([sys.executable, '-c', 'import subprocess, sys, time; '
+                                 'subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"]); '
+                                 'time.sleep(30)'])
+        try:
+            tracker = get_process_tree_tracker(proc.pid)
+            for _i in range(50):
+                sample = tracker.sample()
+                if sample['processes'] == 2:
+                    break
+                time.sleep(0.1)  # wait for the child to start
+            self.assertEqual(2, sample['processes'])
+            self.assertGreater(sample['rss_bytes'], 0)
+            self.assertGreaterEqual(sample['summed_peak_rss_bytes'], sample['rss_bytes'])
+
+            tracker.reset_peaks()  # our own processes' peaks may be reset.
+            sample = tracker.sample(since_reset=True)
+            self.assertLessEqual(sample['summed_peak_rss_bytes'], tracker.sample()['summed_peak_rss_bytes'])
+        finally:
+            for pid in get_process_tree(proc.pid):
+                os.kill(pid, 9)
+            proc.wait()
+
+
+class WebdriverMakerResourceTests(TestCase):
+    """Test recording resource usage on webdriver makers and in the metrics."""
+
+    def test_track_render_resources(self):
+        maker = MagicMock()
+        maker.resource_tracker.sample.side_effect = [
+            {'cpu_seconds': 1.0, 'rss_bytes': 10, 'summed_peak_rss_bytes': 20, 'processes': 3},
+            {'cpu_seconds': 3.5, 'rss_bytes': 30, 'summed_peak_rss_bytes': 40, 'processes': 4},
+            {'cpu_seconds': 4.0, 'rss_bytes': 30, 'summed_peak_rss_bytes': 40, 'processes': 4},
+        ]
+        render_count = metrics.RENDER_CPU_SECONDS.get()[0]
+        browser_cpu_seconds = metrics.BROWSER_CPU_SECONDS.get()
+
+        # usage is recorded even if the render fails.
+        with self.assertRaises(ValueError):
+            with _track_render_resources(maker):
+                raise ValueError()
+        self.assertEqual({'cpu_seconds': 2.5, 'rss_bytes': 30, 'summed_peak_rss_bytes': 40, 'processes': 4},
+                         maker.render_resources)
+        self.assertEqual(render_count + 1, metrics.RENDER_CPU_SECONDS.get()[0])
+        maker.resource_tracker.reset_peaks.assert_called_once_with()
+        self.assertEqual(call(since_reset=True), maker.resource_tracker.sample.call_args_list[1])
+
+        _record_browser_resources(maker)
+        self.assertEqual(4.0, maker.browser_resources['cpu_seconds'])
+        self.assertEqual(browser_cpu_seconds + 4.0, metrics.BROWSER_CPU_SECONDS.get())
+
+    def test_no_tracker(self):
+        maker = MagicMock(resource_tracker=None, render_resources=None, browser_resources=None)
+        with _track_render_resources(maker):
+            pass
+        _record_browser_resources(maker)
+        self.assertIsNone(maker.render_resources)
+        self.assertIsNone(maker.browser_resources)
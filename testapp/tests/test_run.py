@@ -5,6 +5,7 @@ import os
 import shutil
 import subprocess
 import sys
+import tempfile
 from contextlib import redirect_stderr, redirect_stdout
 from unittest import mock
 from unittest.case import TestCase
@@ -12,9 +13,10 @@ from unittest.case import TestCase
 from django.conf import settings
 
 import chromepdf
+from chromepdf.fakedriver import FAKE_PDF_BYTES, write_fake_chromedriver
 from chromepdf.run import chromepdf_run
 from chromepdf.webdrivers import _get_chromedriver_environment_path
-from testapp.tests.utils import extractText, findChromePath
+from testapp.tests.utils import extractText, findChromePath, getFakeRunArgs
 
 
 # whichever python exe is running the tests, use the same one to run the commands.
@@ -30,9 +32,11 @@ def subprocess_run(args, **kwargs):
     # this is ugly, but easier than dealing with coverage correctly handling subprocess calls
     # and triggering false flag suspicious activity antivirus warnings...
     try:
-        with mock.patch('chromepdf.shortcuts.generate_pdf') as m:
+        with mock.patch('chromepdf.shortcuts.generate_pdf') as m, \
+                mock.patch('chromepdf.maker.ChromePdfMaker.write_pdf') as m2:
             m.side_effect = Exception('mock exception')  # raise exception, do not return files.
             m.return_value = b'12345'
+            m2.side_effect = Exception('mock exception')
             with redirect_stdout(io.StringIO()):
                 with redirect_stderr(io.StringIO()):
                     chromepdf_run(args[3:])  # skip "python -m chromepdf" calls
@@ -385,16 +389,206 @@ class CommandLineTests(TestCase):
                 self.assertEqual(1, extractText(pdf_bytes).count(html))
 
                 # ensure all parameters got through
-                with mock.patch('chromepdf.shortcuts.generate_pdf') as m:
-                    m.return_value = b'12345'
+                with mock.patch('chromepdf.maker.ChromePdfMaker') as m:
+                    m.return_value.write_pdf.return_value = 5
                     chromepdf_run(args[3:])
+                os.remove(outpath)
 
                 m.assert_called_with(
-                    html,
-                    pdf_kwargs,
                     chrome_path=chrome_path,
                     chromedriver_path=chromedriver_path,
                     chromedriver_downloads=True,
                     chromedriver_chmod=0o777,
                     chrome_args=chrome_args_list,
                 )
+                self.assertEqual((html, pdf_kwargs), m.return_value.write_pdf.call_args[0][::2])
+
+    def test_generate_pdf_trace(self):
+        """Generate a PDF with a trace of the render, using the fake chromedriver."""
+
+        inpath = os.path.join(settings.TEMP_DIR, 'input.html')
+        outpath = os.path.join(settings.TEMP_DIR, 'output.pdf')
+        with open(inpath, 'w', encoding='utf8') as f:
+            f.write('Two Words')
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            chromedriver_path = write_fake_chromedriver(os.path.join(tempdir, 'chromedriver'))
+            trace_dir = os.path.join(tempdir, 'traces')
+            args = [PY_EXE, '-m', 'chromepdf', 'generate-pdf', inpath, outpath, *getFakeRunArgs(chromedriver_path),
+                    f'--trace-dir={trace_dir}', '--trace-threshold=0']
+            proc = subprocess_run(args)
+            self.assertEqual(b'', proc.stderr)
+            self.assertEqual(0, proc.returncode)
+            with open(outpath, 'rb') as f:
+                self.assertEqual(FAKE_PDF_BYTES, f.read())
+            self.assertEqual(1, len(os.listdir(trace_dir)))
+
+            with mock.patch('chromepdf.maker.ChromePdfMaker') as m:
+                m.return_value.write_pdf.return_value = 5
+                chromepdf_run(args[3:])
+            m.assert_called_with(chrome_path=PY_EXE, chromedriver_path=chromedriver_path, chromedriver_downloads=False,
+                                 use_selenium=False, trace_dir=trace_dir, trace_threshold=0)
+            self.assertEqual(('Two Words', None), m.return_value.write_pdf.call_args[0][::2])
+
+    def test_generate_pdf_batch(self):
+        """Generate many PDFs with --jobs and --out-dir, using the fake chromedriver."""
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            chromedriver_path = write_fake_chromedriver(os.path.join(tempdir, 'chromedriver'))
+            html_dir = os.path.join(tempdir, 'html')
+            os.makedirs(os.path.join(html_dir, 'sub'))
+            for name in ('a.html', 'b.htm', os.path.join('sub', 'c.html')):
+                with open(os.path.join(html_dir, name), 'w', encoding='utf8') as f:
+                    f.write('Two Words')
+            with open(os.path.join(html_dir, 'notes.txt'), 'w', encoding='utf8') as f:
+                f.write('Not HTML')
+            manifest_path = os.path.join(tempdir, 'manifest.txt')
+            with open(manifest_path, 'w', encoding='utf8') as f:
+                f.write(f'# comment\n\n{os.path.join(html_dir, "a.html")}\n')  # a duplicate, so it is skipped
+
+            out_dir = os.path.join(tempdir, 'pdfs')
+            args = [PY_EXE, '-m', 'chromepdf', 'generate-pdf', html_dir, f'--out-dir={out_dir}', '--jobs=2',
+                    f'--manifest={manifest_path}', *getFakeRunArgs(chromedriver_path)]
+            proc = subprocess_run(args)
+            self.assertEqual(b'', proc.stderr)
+            self.assertEqual(0, proc.returncode)
+            lines = proc.stdout.decode('utf8').splitlines()
+            self.assertEqual(3, sum(line.startswith('ok ') for line in lines))
+            self.assertIn('Generated 3 of 3 PDF files', lines[-1])
+            for name in ('a.pdf', 'b.pdf', os.path.join('sub', 'c.pdf')):
+                with open(os.path.join(out_dir, name), 'rb') as f:
+                    self.assertEqual(FAKE_PDF_BYTES, f.read())
+
+            # A glob, writing beside the inputs, with a file that cannot be read.
+            with open(os.path.join(html_dir, 'bad.html'), 'wb') as f:
+                f.write(b'\xff\xfe invalid utf-8')
+            args = [PY_EXE, '-m', 'chromepdf', 'generate-pdf', os.path.join(html_dir, '*.html'),
+                    *getFakeRunArgs(chromedriver_path)]
+            proc = subprocess_run(args)
+            self.assertEqual(1, proc.returncode)
+            lines = proc.stdout.decode('utf8').splitlines()
+            self.assertTrue(any(line.startswith('error ') and 'bad.html' in line for line in lines))
+            self.assertIn('Generated 1 of 2 PDF files', lines[-1])
+            self.assertTrue(os.path.exists(os.path.join(html_dir, 'a.pdf')))
+
+    def test_generate_pdf_batch_errors(self):
+        """Should display errors about missing inputs."""
+
+        proc = subprocess_run([PY_EXE, '-m', 'chromepdf', 'generate-pdf', '--jobs=2'])
+        self.assertIn('generate-pdf: requires paths to HTML files', proc.stderr.decode('utf8'))
+        self.assertEqual(2, proc.returncode)
+
+        inpath = os.path.join(settings.TEMP_DIR, 'file-not-found.html')
+        proc = subprocess_run([PY_EXE, '-m', 'chromepdf', 'generate-pdf', '--jobs=2', inpath])
+        self.assertIn('generate-pdf: Could not find: ', proc.stderr.decode('utf8'))
+        self.assertEqual(2, proc.returncode)
+
+        proc = subprocess_run([PY_EXE, '-m', 'chromepdf', 'generate-pdf', os.path.join(settings.TEMP_DIR, '*.nope')])
+        self.assertIn('generate-pdf: No files match: ', proc.stderr.decode('utf8'))
+        self.assertEqual(2, proc.returncode)
+
+    def test_render_manifest(self):
+        """Generate PDFs from a JSON-lines manifest, using the fake chromedriver."""
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            chromedriver_path = write_fake_chromedriver(os.path.join(tempdir, 'chromedriver'))
+            inpath = os.path.join(tempdir, 'input.html')
+            with open(inpath, 'w', encoding='utf8') as f:
+                f.write('Two Words')
+            profiles_path = os.path.join(tempdir, 'profiles.json')
+            with open(profiles_path, 'w', encoding='utf8') as f:
+                json.dump({'static': {'javascript': False, 'pdf_kwargs': {'landscape': True}}}, f)
+            manifest_path = os.path.join(tempdir, 'manifest.jsonl')
+            with open(manifest_path, 'w', encoding='utf8') as f:
+                f.write(json.dumps({'id': 'a', 'input': inpath, 'output': os.path.join(tempdir, 'a.pdf')}) + '\n')
+                f.write(json.dumps({'id': 'b', 'html': '<p>Two Words</p>', 'output': os.path.join(tempdir, 'b.pdf'),
+                                    'profile': 'static', 'pdf_kwargs': {'scale': 0.5}}) + '\n')
+
+            results_path = os.path.join(tempdir, 'results.jsonl')
+            args = [PY_EXE, '-m', 'chromepdf', 'render-manifest', manifest_path, '--jobs=2',
+                    f'--results={results_path}', f'--profiles={profiles_path}', *getFakeRunArgs(chromedriver_path)]
+            proc = subprocess_run(args)
+            self.assertEqual(b'', proc.stderr)
+            self.assertEqual(0, proc.returncode)
+
+            with open(results_path, 'r', encoding='utf8') as f:
+                results = {r['id']: r for r in map(json.loads, f)}
+            self.assertEqual({'a', 'b'}, set(results))
+            self.assertEqual('ok', results['a']['status'])
+            self.assertEqual({'landscape': True, 'scale': 0.5}, results['b']['pdf_kwargs'])
+            self.assertIn('print', results['b']['timings'])
+            for name in ('a.pdf', 'b.pdf'):
+                with open(os.path.join(tempdir, name), 'rb') as f:
+                    self.assertEqual(FAKE_PDF_BYTES, f.read())
+
+            # An invalid record fails, and makes the return code nonzero. Results default to stdout.
+            with open(manifest_path, 'a', encoding='utf8') as f:
+                f.write('{"input": "missing.html"}\n')
+            proc = subprocess_run(args[:6] + args[7:])
+            self.assertEqual(1, proc.returncode)
+            results = [json.loads(line) for line in proc.stdout.decode('utf8').splitlines()]
+            self.assertEqual(['error', 'ok', 'ok'], sorted(r['status'] for r in results))
+
+    def test_render_manifest_errors(self):
+        """Should display errors about the manifest and profiles files."""
+
+        proc = subprocess_run([PY_EXE, '-m', 'chromepdf', 'render-manifest', 'missing.jsonl'])
+        self.assertIn('render-manifest: could not find manifest file', proc.stderr.decode('utf8'))
+        self.assertEqual(2, proc.returncode)
+
+        manifest_path = os.path.join(settings.TEMP_DIR, 'manifest.jsonl')
+        profiles_path = os.path.join(settings.TEMP_DIR, 'profiles.json')
+        with open(manifest_path, 'w', encoding='utf8') as f:
+            f.write('')
+        with open(profiles_path, 'w', encoding='utf8') as f:
+            json.dump({'bad': {'not_a_setting': 1}}, f)
+        proc = subprocess_run([PY_EXE, '-m', 'chromepdf', 'render-manifest', manifest_path,
+                               f'--profiles={profiles_path}'])
+        self.assertIn('profile "bad" has unknown settings: not_a_setting', proc.stderr.decode('utf8'))
+        self.assertEqual(2, proc.returncode)
+
+    def test_generate_pdf_stdin_stdout(self):
+        """Generate a PDF from stdin to stdout, using the fake chromedriver."""
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            chromedriver_path = write_fake_chromedriver(os.path.join(tempdir, 'chromedriver'))
+            kwargs = getFakeRunArgs(chromedriver_path)
+
+            for paths in (['-'], ['-', '-']):
+                with self.subTest(paths=paths):
+                    proc = subprocess.run([PY_EXE, '-m', 'chromepdf', 'generate-pdf'] + paths + kwargs,
+                                          input=b'Two Words', stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    self.assertEqual(b'', proc.stderr)
+                    self.assertEqual(0, proc.returncode)
+                    self.assertEqual(FAKE_PDF_BYTES, proc.stdout)
+
+            # from stdin to a file
+            outpath = os.path.join(tempdir, 'output.pdf')
+            proc = subprocess.run([PY_EXE, '-m', 'chromepdf', 'generate-pdf', '-', outpath] + kwargs,
+                                  input=b'Two Words', stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.assertEqual(0, proc.returncode)
+            with open(outpath, 'rb') as f:
+                self.assertEqual(FAKE_PDF_BYTES, f.read())
+
+            # from a file to stdout
+            inpath = os.path.join(tempdir, 'input.html')
+            with open(inpath, 'w', encoding='utf8') as f:
+                f.write('Two Words')
+            proc = subprocess_run([PY_EXE, '-m', 'chromepdf', 'generate-pdf', inpath, '-'] + kwargs)
+            self.assertEqual(0, proc.returncode)
+            self.assertEqual(FAKE_PDF_BYTES, proc.stdout)
+
+    def test_generate_pdf_watch_errors(self):
+        """--watch can only be used to generate one PDF file, from and to files."""
+
+        inpath = os.path.join(settings.TEMP_DIR, 'input.html')
+        with open(inpath, 'w', encoding='utf8') as f:
+            f.write('Two Words')
+
+        for args, error in ((['-'], 'cannot read from stdin or write to stdout'),
+                            ([inpath, '-'], 'cannot read from stdin or write to stdout'),
+                            ([inpath, '--jobs=2'], 'can only be used to generate one PDF file')):
+            with self.subTest(args=args):
+                proc = subprocess_run([PY_EXE, '-m', 'chromepdf', 'generate-pdf', '--watch'] + args)
+                self.assertIn(f'generate-pdf: --watch {error}', proc.stderr.decode('utf8'))
+                self.assertEqual(2, proc.returncode)
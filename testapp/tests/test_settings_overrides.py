@@ -33,13 +33,35 @@ class TestParseSettings(SimpleTestCase):
 
         # compare to values of 'DEFAULT_SETTINGS'.
         # hardcode the values so tests will fail if defaults get changed by accident.
-        self.assertEqual(6, len(output))
+        self.assertEqual(28, len(output))
         self.assertEqual(output['chrome_path'], None)
         self.assertEqual(output['chromedriver_path'], None)
         self.assertEqual(output['chromedriver_downloads'], True)
         self.assertEqual(output['chromedriver_chmod'], 0o764)
+        self.assertEqual(output['chromedriver_url'], None)
+        self.assertEqual(output['chrome_debugger_address'], None)
+        self.assertEqual(output['share_chromedriver'], False)
+        self.assertEqual(output['standby_browser'], False)
         self.assertEqual(output['chrome_args'], [])
         self.assertEqual(output['use_selenium'], None)
+        self.assertEqual(output['inline_static_assets'], False)
+        self.assertEqual(output['block_network'], False)
+        self.assertEqual(output['network_allowlist'], [])
+        self.assertEqual(output['wait_for'], None)
+        self.assertEqual(output['wait_timeout'], 30)
+        self.assertEqual(output['javascript'], True)
+        self.assertEqual(output['user_data_dir'], None)
+        self.assertEqual(output['collect_performance_metrics'], False)
+        self.assertEqual(output['trace_dir'], None)
+        self.assertEqual(output['trace_threshold'], None)
+        self.assertEqual(output['slow_render_threshold'], None)
+        self.assertEqual(output['slow_render_spool_dir'], None)
+        self.assertEqual(output['slow_render_spool_limit'], 100)
+        self.assertEqual(output['daemon'], None)
+        self.assertEqual(output['daemon_timeout'], 300)
+        self.assertEqual(output['render_servers'], [])
+        self.assertEqual(output['render_server_connect_timeout'], 5)
+        self.assertEqual(output['render_server_read_timeout'], 300)
 
     @override_settings()
     def test_parse_settings_kwargs(self):
@@ -56,7 +78,7 @@ class TestParseSettings(SimpleTestCase):
                                 chrome_args=['--no-sandbox'],
                                 use_selenium=False)
 
-        self.assertEqual(6, len(output))
+        self.assertEqual(28, len(output))
         self.assertEqual(output.get('chrome_path'), CHROME_PATH_KWARG_VAL)
         self.assertEqual(output.get('chromedriver_path'), CHROMEDRIVER_PATH_KWARG_VAL)
         self.assertEqual(output.get('chromedriver_downloads'), False)
@@ -75,7 +97,7 @@ class TestParseSettings(SimpleTestCase):
 
         output = parse_settings()
 
-        self.assertEqual(6, len(output))
+        self.assertEqual(28, len(output))
         self.assertEqual(output['chrome_path'], CHROME_PATH_SETTING_VAL)
         self.assertEqual(output['chromedriver_path'], CHROMEDRIVER_PATH_SETTING_VAL)
         self.assertEqual(output['chromedriver_downloads'], False)
@@ -102,7 +124,7 @@ class TestParseSettings(SimpleTestCase):
                                 use_selenium=True,
                                 chrome_args=['yes-sandbox'])
 
-        self.assertEqual(6, len(output))
+        self.assertEqual(28, len(output))
         self.assertEqual(output.get('chrome_path'), CHROME_PATH_KWARG_VAL)
         self.assertEqual(output.get('chromedriver_path'), CHROMEDRIVER_PATH_KWARG_VAL)
         self.assertEqual(output.get('chromedriver_downloads'), False)
@@ -128,7 +150,7 @@ class TestParseSettings(SimpleTestCase):
                                 use_selenium=False,
                                 chrome_args=[])
 
-        self.assertEqual(6, len(output))
+        self.assertEqual(28, len(output))
         self.assertEqual(output.get('chrome_path'), None)
         self.assertEqual(output.get('chromedriver_path'), None)
         self.assertEqual(output.get('chromedriver_downloads'), False)
@@ -149,7 +171,7 @@ class TestParseSettings(SimpleTestCase):
                                 chrome_args=None)
 
         # parsed values should be converted to None instead of ''
-        self.assertEqual(6, len(output))
+        self.assertEqual(28, len(output))
         self.assertEqual(output['chrome_path'], None)
         self.assertEqual(output['chromedriver_path'], None)
         self.assertEqual(output['chromedriver_downloads'], False)
@@ -182,6 +204,11 @@ class TestParseSettings(SimpleTestCase):
             with self.assertRaises(TypeError):
                 _output = parse_settings(chrome_args='--no-sandbox')
 
+        # NETWORK_ALLOWLIST setting must be an iterable of strings, not a string
+        with override_settings(CHROMEPDF={'NETWORK_ALLOWLIST': 'example.com'}):
+            with self.assertRaises(TypeError):
+                _output = parse_settings()
+
 
 class TestSettingsOverridesPdfKwargs(SimpleTestCase):
 
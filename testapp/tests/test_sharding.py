@@ -0,0 +1,157 @@
+import io
+import socket
+import threading
+import time
+from unittest.case import TestCase
+
+from chromepdf import RenderResult
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.fakedriver import FAKE_PDF_BYTES
+from chromepdf.httpserver import RenderHTTPServer
+from chromepdf.maker import ChromePdfMaker
+from chromepdf.pool import BrowserPool
+from chromepdf.sharding import HashRing, ShardedRenderClient
+from chromepdf.slowrenders import fingerprint_html
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+class HashRingTests(TestCase):
+
+    def test_get_nodes(self):
+        ring = HashRing(['a', 'b', 'c'])
+        for key in ('one', 'two', 'three'):
+            nodes = ring.get_nodes(key)
+            self.assertEqual(['a', 'b', 'c'], sorted(nodes))
+            self.assertEqual(nodes, HashRing(['c', 'b', 'a']).get_nodes(key))
+
+    def test_removing_a_node_only_moves_its_keys(self):
+        keys = [f'key{i}' for i in range(1000)]
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        smaller_ring = HashRing(['a', 'b', 'c'])
+
+        owners = [ring.get_nodes(key)[0] for key in keys]
+        for owner in ('a', 'b', 'c', 'd'):
+            self.assertGreater(owners.count(owner), 150)  # the keys are spread evenly
+        for key, owner in zip(keys, owners):
+            if owner != 'd':
+                self.assertEqual(owner, smaller_ring.get_nodes(key)[0])
+
+
+class ShardedRenderClientTests(FakeChromedriverTestCase):
+    """Test spreading renders across several HTTP render servers, using the fake chromedriver."""
+
+    def setUp(self):
+        super().setUp()
+        chromedriver_path = self.writeFakeChromedriver()
+        self.servers = {}  # url => RenderHTTPServer
+        for _i in range(3):
+            pool = BrowserPool(self.makeFakeMaker(chromedriver_path=chromedriver_path), size=1)
+            self.addCleanup(pool.close)
+            server = RenderHTTPServer(('127.0.0.1', 0), pool)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            self.servers[f'http://127.0.0.1:{server.server_port}'] = server
+        self.urls = list(self.servers)
+
+    def _get_owner(self, client, html):
+        return client.servers[client._ring.get_nodes(fingerprint_html(html))[0]]
+
+    def test_same_html_goes_to_same_server(self):
+        client = ShardedRenderClient(self.urls)
+        result = RenderResult()
+        for _i in range(4):
+            self.assertEqual(FAKE_PDF_BYTES, client.generate_pdf('Two Words', result=result))
+        self.assertEqual(FAKE_PDF_BYTES, result.pdf_bytes)
+        self.assertEqual(4, self._get_owner(client, 'Two Words').renders)
+        self.assertEqual(4, sum(server.renders for server in client.servers.values()))
+
+        output = io.BytesIO()
+        self.assertEqual(len(FAKE_PDF_BYTES), client.generate_pdf('Two Words', output=output))
+        self.assertEqual(FAKE_PDF_BYTES, output.getvalue())
+
+    def test_overloaded_server_is_skipped(self):
+        client = ShardedRenderClient(self.urls)
+        owner = self._get_owner(client, 'Two Words')
+        owner.outstanding = 5  # as if it were busy with other renders
+        client.generate_pdf('Two Words')
+        self.assertEqual(0, owner.renders)
+
+    def test_failover(self):
+        client = ShardedRenderClient(self.urls, retry_interval=0)
+        owner = self._get_owner(client, 'Two Words')
+        server = self.servers[owner.url]
+        server.shutdown()
+        server.server_close()
+
+        self.assertEqual(FAKE_PDF_BYTES, client.generate_pdf('Two Words'))
+        self.assertFalse(owner.healthy)
+        self.assertEqual(1, sum(server.renders for server in client.servers.values()))
+        # the server is checked again in the background, since retry_interval is 0, and is still down.
+        self.assertEqual(FAKE_PDF_BYTES, client.generate_pdf('Two Words'))
+        self.assertEqual(0, owner.renders)
+
+        health = client.check_health()
+        self.assertFalse(health.pop(owner.url))
+        self.assertTrue(all(health.values()))
+
+    def test_recovered_server_is_used_again(self):
+        """An unhealthy server should be checked in the background, rather than by a render, and then used again."""
+
+        client = ShardedRenderClient(self.urls, retry_interval=0)
+        owner = self._get_owner(client, 'Two Words')
+        owner.mark_unhealthy()
+        self.assertEqual(FAKE_PDF_BYTES, client.generate_pdf('Two Words'))
+        self.assertEqual(0, owner.renders)
+
+        deadline = time.monotonic() + 10
+        while not owner.healthy:
+            self.assertLess(time.monotonic(), deadline, 'The server was not checked again.')
+            time.sleep(0.01)
+        self.assertEqual(FAKE_PDF_BYTES, client.generate_pdf('Two Words'))
+        self.assertEqual(1, owner.renders)
+
+    def test_server_timeout(self):
+        """
+        A server that accepts the request but never responds should be given up on after the read timeout.
+        The render should not be sent to another server, since the first one may already be rendering it.
+        """
+
+        urls = []
+        for _i in range(2):
+            sock = socket.socket()
+            self.addCleanup(sock.close)
+            sock.bind(('127.0.0.1', 0))
+            sock.listen()
+            urls.append(f'http://127.0.0.1:{sock.getsockname()[1]}')
+        client = ShardedRenderClient(urls, read_timeout=0.2)
+        start = time.monotonic()
+        with self.assertRaisesRegex(ChromePdfException, 'failed to render the PDF: The connection failed, or timed out'):
+            client.generate_pdf('Two Words')
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(1, [server.healthy for server in client.servers.values()].count(False))
+
+    def test_all_servers_down(self):
+        client = ShardedRenderClient(['http://127.0.0.1:1'])
+        with self.assertRaisesRegex(ChromePdfException, 'No render server could render the PDF'):
+            client.generate_pdf('Two Words')
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            ShardedRenderClient([])
+        with self.assertRaises(ValueError):
+            ShardedRenderClient(['ftp://127.0.0.1:8181'])
+
+        client = ShardedRenderClient(self.urls)
+        with self.assertRaisesRegex(ValueError, 'notAKwarg'):
+            client.generate_pdf('Two Words', {'notAKwarg': 1})
+
+    def test_maker(self):
+        maker = ChromePdfMaker(render_servers=self.urls, render_server_read_timeout=60)
+        self.assertEqual((5, 60), (maker._render_client.servers[self.urls[0]].connect_timeout,
+                                   maker._render_client.servers[self.urls[0]].read_timeout))
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words'))
+        with maker.session() as session:
+            self.assertEqual(FAKE_PDF_BYTES, session.generate_pdf('Two Words'))
+        with self.assertRaisesRegex(ChromePdfException, 'not supported'):
+            maker.generate_pdf_url('file:///tmp/input.html')
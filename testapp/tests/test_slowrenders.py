@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from unittest.case import TestCase
+from unittest.mock import patch
+
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.fakedriver import FAKE_PDF_BYTES, _make_pdf
+from chromepdf.slowrenders import count_pdf_pages, fingerprint_html, get_slow_render_record, log_slow_render, spool_html
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+class SlowRenderLogTests(TestCase):
+    """Test the records written to the slow render log, and the spool of their HTML."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+    def test_fingerprint_html(self):
+        self.assertEqual(hashlib.sha256('Tv\u00e5 Words'.encode('utf8')).hexdigest(), fingerprint_html('Tv\u00e5 Words'))
+
+    def test_count_pdf_pages(self):
+        self.assertEqual(1, count_pdf_pages(FAKE_PDF_BYTES))
+        self.assertEqual(2, count_pdf_pages(b'<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >> '
+                                            b'<< /Type /Page /Parent 2 0 R >> << /Type/Page /Parent 2 0 R >>'))
+
+    def test_get_slow_render_record(self):
+        timings = {'print': 1.5, 'render': 2.0}
+        record = get_slow_render_record('Tv\u00e5 Words', {'paperFormat': 'A4'}, timings, pdf_bytes=_make_pdf('Two Words'))
+        self.assertEqual('slow_render', record['event'])
+        self.assertEqual(2.0, record['seconds'])
+        self.assertEqual(timings, record['timings'])
+        self.assertEqual(10, record['html_bytes'])
+        self.assertEqual(fingerprint_html('Tv\u00e5 Words'), record['html_sha256'])
+        self.assertEqual(8.26, record['pdf_kwargs']['paperWidth'])  # cleaned
+        self.assertEqual(1, record['pages'])
+        self.assertEqual(len(_make_pdf('Two Words')), record['pdf_bytes'])
+        self.assertIsNone(record['error'])
+
+        record = get_slow_render_record('Two Words', {'bad': 1}, timings, error=ValueError('failed'))
+        self.assertEqual({'bad': 1}, record['pdf_kwargs'])  # invalid, so not cleaned
+        self.assertIsNone(record['pages'])
+        self.assertIsNone(record['pdf_bytes'])
+        self.assertEqual('failed', record['error'])
+
+    def test_spool_html(self):
+        spool_dir = os.path.join(self.tempdir.name, 'spool')
+        paths = []
+        for i in range(4):
+            html = f'Document {i}'
+            paths.append(spool_html(spool_dir, fingerprint_html(html), html, limit=3))
+            os.utime(paths[-1], (time.time() - 100 + i, time.time() - 100 + i))  # ensure distinct modified times
+
+        self.assertEqual(sorted(os.path.basename(p) for p in paths[1:]), sorted(os.listdir(spool_dir)))
+        with open(paths[3], 'r', encoding='utf8') as f:
+            self.assertEqual('Document 3', f.read())
+
+        # Saving the same HTML again marks it as recent, so that it is kept instead of a newer file.
+        self.assertEqual(paths[1], spool_html(spool_dir, fingerprint_html('Document 1'), 'Document 1', limit=3))
+        spool_html(spool_dir, fingerprint_html('Document 4'), 'Document 4', limit=3)
+        self.assertFalse(os.path.exists(paths[2]))
+        self.assertTrue(os.path.exists(paths[1]))
+
+    def test_log_slow_render(self):
+        spool_dir = os.path.join(self.tempdir.name, 'spool')
+        with self.assertLogs('chromepdf.slow_renders', 'WARNING') as cm:
+            record = log_slow_render('Two Words', None, {'render': 2.0}, FAKE_PDF_BYTES, spool_dir=spool_dir)
+        self.assertEqual(1, len(cm.records))
+        self.assertEqual(record, json.loads(cm.records[0].getMessage()))
+        self.assertEqual(os.path.join(spool_dir, f'{record["html_sha256"]}.html'), record['spool_path'])
+
+
+class SlowRenderMakerTests(FakeChromedriverTestCase):
+    """Test logging slow renders from ChromePdfMaker, with the fake chromedriver."""
+
+    def test_slow_render(self):
+        spool_dir = os.path.join(self.tempdir.name, 'spool')
+        maker = self.makeFakeMaker(slow_render_threshold=0, slow_render_spool_dir=spool_dir)
+        with self.assertLogs('chromepdf.slow_renders', 'WARNING') as cm:
+            maker.generate_pdf('Two Words', {'landscape': True})
+
+        record = json.loads(cm.records[0].getMessage())
+        self.assertEqual(fingerprint_html('Two Words'), record['html_sha256'])
+        self.assertIs(True, record['pdf_kwargs']['landscape'])
+        self.assertEqual(1, record['pages'])
+        self.assertIn('print', record['timings'])
+        self.assertEqual(record['timings']['render'], record['seconds'])
+        with open(record['spool_path'], 'r', encoding='utf8') as f:
+            self.assertEqual('Two Words', f.read())
+
+    def test_slow_render_failure(self):
+        with self.assertLogs('chromepdf.slow_renders', 'WARNING') as cm:
+            with self.assertRaises(ChromePdfException):
+                self.makeFakeMaker(fake_options={'fail': ['Page.printToPDF']}, slow_render_threshold=0).generate_pdf('Two Words')
+        record = json.loads(cm.records[0].getMessage())
+        self.assertIsNotNone(record['error'])
+        self.assertIsNone(record['pdf_bytes'])
+        self.assertIsNone(record['spool_path'])
+
+    def test_fast_render(self):
+        with patch('chromepdf.maker.log_slow_render') as func:
+            self.makeFakeMaker(slow_render_threshold=60).generate_pdf('Two Words')
+            self.makeFakeMaker().generate_pdf('Two Words')
+        func.assert_not_called()
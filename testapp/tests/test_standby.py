@@ -0,0 +1,81 @@
+import time
+
+from chromepdf import RenderResult, metrics
+from chromepdf.exceptions import ChromePdfException
+from chromepdf.fakedriver import FAKE_PDF_BYTES
+from chromepdf.standby import close_standby_browsers
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+class StandbyBrowserTests(FakeChromedriverTestCase):
+    """Test taking a standby browser that was launched in the background, using the fake chromedriver."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(close_standby_browsers)
+
+    def _make(self, **kwargs):
+        return self.makeFakeMaker(standby_browser=True, **kwargs)
+
+    def _wait_until_ready(self, standby_browser):
+        deadline = time.monotonic() + 20
+        while not standby_browser.is_ready():
+            self.assertLess(time.monotonic(), deadline, 'The standby browser did not launch.')
+            time.sleep(0.01)
+
+    def test_render_takes_standby_browser(self):
+        maker = self._make()
+        self._wait_until_ready(maker._standby_browser)
+
+        result = RenderResult()
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words', result=result))
+        self.assertIn('standby_wait', result.timings)
+        self.assertNotIn('chromedriver_spawn', result.timings)
+        self.assertNotIn('browser_launch', result.timings)
+
+        # a replacement was launched, and is shared by makers with the same settings, such as those of the shortcuts.
+        self._wait_until_ready(maker._standby_browser)
+        self.assertIs(maker._standby_browser, self._make()._standby_browser)
+        with maker.session() as session:
+            self.assertEqual(FAKE_PDF_BYTES, session.generate_pdf('Two Words'))
+
+        close_standby_browsers()
+        self.assertFalse(maker._standby_browser.is_ready())
+        result = RenderResult()
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words', result=result))
+        self.assertIn('chromedriver_spawn', result.timings)  # launched for the render, once closed
+
+    def test_dead_standby_browser_is_replaced(self):
+        """A standby browser that exited while it waited should be discarded, and a browser launched instead."""
+
+        restarts = metrics.CHROMEDRIVER_RESTARTS.get(source='standby')
+        maker = self._make()
+        self._wait_until_ready(maker._standby_browser)
+        proc = maker._standby_browser._standby._wrapper.proc
+        proc.kill()
+        proc.wait()
+
+        result = RenderResult()
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words', result=result))
+        self.assertIn('standby_wait', result.timings)
+        self.assertIn('chromedriver_spawn', result.timings)
+        self.assertEqual(restarts + 1, metrics.CHROMEDRIVER_RESTARTS.get(source='standby'))
+
+    def test_failed_launch(self):
+        maker = self._make(fake_options={'fail': ['session']})
+        with self.assertRaises(ChromePdfException):
+            maker.generate_pdf('Two Words')
+
+    def test_shared_chromedriver(self):
+        """A maker with its own chromedriver should have its own standby browser, which it quits on close()."""
+
+        maker = self._make(share_chromedriver=True)
+        self.assertIsNot(maker._standby_browser, self._make(share_chromedriver=True)._standby_browser)
+        self._wait_until_ready(maker._standby_browser)
+        self.assertEqual(FAKE_PDF_BYTES, maker.generate_pdf('Two Words'))
+
+        self._wait_until_ready(maker._standby_browser)
+        proc = maker._chromedriver_service.proc
+        maker.close()
+        self.assertIsNotNone(proc.poll())
+        self.assertFalse(maker._standby_browser.is_ready())
@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+from unittest.case import TestCase
+from unittest.mock import MagicMock, patch
+
+from django.test.utils import override_settings
+
+from chromepdf.instrumentation import phase
+from chromepdf.maker import ChromePdfMaker
+from chromepdf.tracing import NoopTracer, OpenTelemetryTracer, get_tracer, is_opentelemetry_installed, set_tracer
+from chromepdf.webdrivermakers import NoSeleniumWebdriverMaker
+
+
+class RecordingTracer:
+    """A tracer that records the (name, attributes, parent name) of each span that is started."""
+
+    def __init__(self):
+        self.spans = []
+        self._stack = []
+
+    @contextmanager
+    def start_span(self, name, attributes=None):
+        self.spans.append((name, attributes, self._stack[-1] if self._stack else None))
+        self._stack.append(name)
+        try:
+            yield MagicMock()
+        finally:
+            self._stack.pop()
+
+
+class TracingTests(TestCase):
+    """Test the spans emitted around each phase of PDF generation."""
+
+    def setUp(self):
+        self.tracer = RecordingTracer()
+        set_tracer(self.tracer)
+
+    def tearDown(self):
+        set_tracer(None)
+
+    def test_default_tracer(self):
+        set_tracer(None)
+        expected = OpenTelemetryTracer if is_opentelemetry_installed() else NoopTracer
+        self.assertIsInstance(get_tracer(), expected)
+        with get_tracer().start_span('chromepdf.test') as span:  # the no-op tracer must also be usable.
+            span.set_attribute('key', 'value')
+
+    def test_nested_phase_spans(self):
+        with phase('render'):
+            with phase('print'):
+                pass
+        self.assertEqual([('chromepdf.render', None, None), ('chromepdf.print', None, 'chromepdf.render')],
+                         self.tracer.spans)
+
+    @override_settings(CHROMEPDF={'CHROMEDRIVER_DOWNLOADS': False})
+    def test_render_spans(self):
+        """The maker's init, the webdriver maker's init, and its phases should each be traced."""
+
+        def generate_pdf(html, pdf_kwargs):
+            with phase('print'):
+                return b'%PDF'
+
+        clazz = MagicMock(__name__='FakeWebdriverMaker')
+        clazz.return_value.generate_pdf.side_effect = generate_pdf
+        with patch('chromepdf.maker.get_webdriver_maker_class', return_value=clazz):
+            ChromePdfMaker().generate_pdf('Two Words')
+
+        self.assertEqual([
+            ('chromepdf.maker_init', None, None),
+            ('chromepdf.render', None, None),
+            ('chromepdf.webdriver_maker_init', {'chromepdf.webdriver_maker': 'FakeWebdriverMaker'}, 'chromepdf.render'),
+            ('chromepdf.print', None, 'chromepdf.render'),
+        ], self.tracer.spans)
+
+    def test_devtool_command_span(self):
+        """Each devtool command sent to Chrome should be traced with the name of the command."""
+
+        maker = NoSeleniumWebdriverMaker.__new__(NoSeleniumWebdriverMaker)
+        maker.session_id = 'abc'
+        maker.chromedriver_url = 'http://localhost:9515'
+        with patch('chromepdf.webdrivermakers.get_chromedriver_response', return_value={'value': {'data': ''}}):
+            maker._devtool_command('Page.printToPDF', {})
+        self.assertEqual([('chromepdf.devtool_command', {'chromepdf.devtool.command': 'Page.printToPDF'}, None)],
+                         self.tracer.spans)
+
+    def test_opentelemetry_adapter(self):
+        """The adapter should start spans as the current span of the OpenTelemetry tracer."""
+
+        otel_tracer = MagicMock()
+        OpenTelemetryTracer(otel_tracer).start_span('chromepdf.print', {'key': 'value'})
+        otel_tracer.start_as_current_span.assert_called_once_with('chromepdf.print', attributes={'key': 'value'})
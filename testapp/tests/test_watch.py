@@ -0,0 +1,92 @@
+import json
+import os
+
+from chromepdf.fakedriver import FAKE_PDF_BYTES
+from chromepdf.watch import find_local_assets, get_mtimes, read_pdf_kwargs_json, watch
+from testapp.tests.utils import FakeChromedriverTestCase
+
+
+class WatchTests(FakeChromedriverTestCase):
+    """Test re-generating a PDF when its files change, using the fake chromedriver."""
+
+    def setUp(self):
+        super().setUp()
+        self.root = self.tempdir.name
+        self.inpath = self._write('invoice.html', '<link href="style.css"><img src="img/logo.png">')
+        self.css_path = self._write('style.css', 'body { color: red; background: url("img/bg.png"); }')
+        os.makedirs(os.path.join(self.root, 'img'))
+        self.logo_path = self._write(os.path.join('img', 'logo.png'), 'PNG')
+
+    def _write(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, 'w', encoding='utf8') as f:
+            f.write(content)
+        return path
+
+    def _touch(self, path, content):
+        """Rewrite a file, and move its mtime forward, so the change is seen on filesystems with coarse mtimes."""
+
+        mtime = os.stat(path).st_mtime
+        self._write(path, content)
+        os.utime(path, (mtime + 10, mtime + 10))
+
+    def test_find_local_assets(self):
+        abs_path = self._write('abs.css', '')
+        html = (f'<link href="style.css"><img src=\'img/logo.png?v=2\'><link href="{abs_path}">'
+                f'<div style="background: url(file://{self.logo_path})"></div>'
+                '<img src="missing.png"><img src="https://example.com/logo.png"><a href="#top"></a>'
+                '<img src="data:image/png;base64,AAAA">')
+        self.assertEqual(sorted([abs_path, self.css_path, self.logo_path]), find_local_assets(html, self.root))
+
+    def test_get_mtimes(self):
+        missing_path = os.path.join(self.root, 'missing.html')
+        mtimes = get_mtimes([self.inpath, missing_path])
+        self.assertEqual(os.stat(self.inpath).st_size, mtimes[self.inpath][1])
+        self.assertIsNone(mtimes[missing_path])
+
+    def test_read_pdf_kwargs_json(self):
+        path = self._write('pdf_kwargs.json', '{"landscape": true}')
+        self.assertEqual({'landscape': True}, read_pdf_kwargs_json(path))
+        self._write('pdf_kwargs.json', '[]')
+        with self.assertRaises(ValueError):
+            read_pdf_kwargs_json(path)
+
+    def test_watch(self):
+        maker = self.makeFakeMaker()
+        outpath = os.path.join(self.root, 'out', 'invoice.pdf')
+        pdf_kwargs_path = self._write('pdf_kwargs.json', json.dumps({'landscape': True}))
+
+        results = watch(maker, self.inpath, outpath, pdf_kwargs_path, interval=0.01)
+        try:
+            result = next(results)
+            self.assertEqual('ok', result['status'], result['error'])
+            self.assertEqual([self.inpath], result['changed'])
+            self.assertEqual(sorted([self.inpath, pdf_kwargs_path, self.css_path, self.logo_path]),
+                             sorted(result['watched']))
+            with open(outpath, 'rb') as f:
+                self.assertEqual(FAKE_PDF_BYTES, f.read())
+
+            # a referenced asset changes
+            self._touch(self.css_path, 'body { color: blue; }')
+            result = next(results)
+            self.assertEqual('ok', result['status'], result['error'])
+            self.assertEqual([self.css_path], result['changed'])
+
+            # invalid pdf_kwargs fail the render, but the files are still watched
+            self._touch(pdf_kwargs_path, '{"notAKwarg": 1}')
+            result = next(results)
+            self.assertEqual('error', result['status'])
+            self.assertEqual([pdf_kwargs_path], result['changed'])
+
+            self._touch(pdf_kwargs_path, '{}')
+            result = next(results)
+            self.assertEqual('ok', result['status'], result['error'])
+
+            # the HTML changes, and no longer references the logo
+            self._touch(self.inpath, '<link href="style.css">')
+            result = next(results)
+            self.assertEqual('ok', result['status'], result['error'])
+            self.assertEqual([self.inpath], result['changed'])
+            self.assertNotIn(self.logo_path, result['watched'])
+        finally:
+            results.close()
@@ -1,10 +1,18 @@
-from unittest.case import TestCase
-from unittest.mock import patch
+import base64
+import io
+import json
+import shutil
+import subprocess
+from unittest.case import TestCase, skipUnless
+from unittest.mock import Mock, call, patch
 
 from django.test.utils import override_settings
 
+from chromepdf.exceptions import ChromePdfException
 from chromepdf.maker import ChromePdfMaker
-from chromepdf.webdrivermakers import get_webdriver_maker_class
+from chromepdf.webdrivermakers import (
+    DEFAULT_WAIT_TIMEOUT, _get_document_write_script, _get_performance_metrics, _get_print_params,
+    _get_wait_for_expression, _read_stream, _set_document_content, _wait_for_ready, get_webdriver_maker_class)
 
 
 class WebdriverMakerTests(TestCase):
@@ -19,4 +27,171 @@ class WebdriverMakerTests(TestCase):
             with patch('base64.b64decode') as _func2:  # override this so it doesn't complain about not getting a webdriver
                 clazz = get_webdriver_maker_class()
                 pdfmaker.generate_pdf(html)
-                func.assert_called_once_with(clazz, chrome_path='/chrome', chromedriver_path='/chromedriver', _chromesession_temp_dir=pdfmaker._chromesession_temp_dir, chrome_args=['--no-sandbox'])
+                func.assert_called_once_with(clazz, chrome_path='/chrome', chromedriver_path='/chromedriver', _chromesession_temp_dir=pdfmaker._chromesession_temp_dir, chrome_args=['--no-sandbox'],
+                                             block_network=False, network_allowlist=[], wait_for=None, wait_timeout=30,
+                                             javascript=True, user_data_dir=None, collect_performance_metrics=False,
+                                             trace_dir=None, trace_threshold=None, chromedriver_url=None,
+                                             chrome_debugger_address=None, _chromedriver_service=None)
+
+
+class WaitForReadyTests(TestCase):
+    """Test the WAIT_FOR setting's handling, without needing a real Chrome to evaluate the JavaScript."""
+
+    def test_wait_for_expressions(self):
+        """Named WAIT_FOR values should map to their promises, without polling. Other values should be polled as-is."""
+
+        expression = _get_wait_for_expression('fonts', 2.5)
+        self.assertIn('Promise.resolve(document.fonts.ready)', expression)
+        self.assertNotIn('while', expression)
+        self.assertIn('}, 2500)', expression)
+        self.assertIn('document.close();', expression)
+
+        expression = _get_wait_for_expression('window.myChartsRendered', None)
+        self.assertIn('value = (window.myChartsRendered);', expression)
+        self.assertIn('while', expression)
+        self.assertIn(f'}}, {DEFAULT_WAIT_TIMEOUT * 1000})', expression)
+
+    def _evaluate(self, wait_for, timeout, page_script):
+        """Evaluate a WAIT_FOR expression in Node, after running a script that stands in for the page's own."""
+
+        script = f"""
+            globalThis.window = globalThis;
+            globalThis.document = {{close() {{}}}};
+            {page_script}
+            const start = Date.now();
+            ({_get_wait_for_expression(wait_for, timeout)}).then(
+                value => console.log(JSON.stringify({{value, elapsed: Date.now() - start}})),
+                error => console.log(JSON.stringify({{rejected: String(error)}})));
+        """
+        output = subprocess.run(['node', '-e', script], stdout=subprocess.PIPE, check=True, timeout=30).stdout
+        return json.loads(output)
+
+    @skipUnless(shutil.which('node'), 'Requires Node to evaluate the JavaScript.')
+    def test_wait_for_evaluation(self):
+        """The page's promise should be awaited once it is set. Other expressions should be polled until truthy."""
+
+        # the page sets its promise after a delay, and resolves it after another.
+        page = "setTimeout(() => { window.chromepdfReady = new Promise(resolve => setTimeout(resolve, 200)); }, 300);"
+        output = self._evaluate('signal', 5, page)
+        self.assertEqual({'ready': True}, output['value'])
+        self.assertGreaterEqual(output['elapsed'], 450)
+
+        # the page set its promise before the wait began, and it can still be read and replaced afterwards.
+        page = "window.chromepdfReady = new Promise(resolve => setTimeout(resolve, 200));"
+        output = self._evaluate('signal', 2, page)
+        self.assertEqual({'ready': True}, output['value'])
+        self.assertGreaterEqual(output['elapsed'], 150)
+        page = """setTimeout(() => {
+            window.chromepdfReady = Promise.resolve();
+            window.chromepdfReady = 'replaced';
+            if (window.chromepdfReady !== 'replaced') { throw new Error('not replaced'); }
+        }, 100);"""
+        output = self._evaluate('signal', 2, page)
+        self.assertEqual({'ready': True}, output['value'])
+
+        # a signal that is never set times out.
+        output = self._evaluate('signal', 0.3, '')
+        self.assertEqual({'ready': False, 'error': None}, output['value'])
+
+        # a predicate is polled until it is truthy, and a function is called.
+        page = "window.done = false; setTimeout(() => { window.done = true; }, 300);"
+        for wait_for in ('window.done', '() => window.done'):
+            with self.subTest(wait_for=wait_for):
+                output = self._evaluate(wait_for, 5, page)
+                self.assertEqual({'ready': True}, output['value'])
+                self.assertGreaterEqual(output['elapsed'], 250)
+
+        # an expression that never becomes ready times out, and reports its last error.
+        output = self._evaluate('window.chromepdfReady.then(() => null)', 0.3, '')
+        self.assertEqual(False, output['value']['ready'])
+        self.assertIn('TypeError', output['value']['error'])
+
+        # a rejected promise is an error.
+        output = self._evaluate('signal', 5, "window.chromepdfReady = Promise.reject(new Error('chart failed'));")
+        self.assertEqual('Error: chart failed', output['rejected'])
+
+    def test_wait_for_ready(self):
+        """_wait_for_ready() should send one Runtime.evaluate command, and raise if not ready in time."""
+
+        devtool_command = Mock(return_value={'result': {'type': 'object', 'value': {'ready': True}}})
+        _wait_for_ready(devtool_command, 'load', 5)
+        devtool_command.assert_called_once()
+        cmd, params = devtool_command.call_args[0]
+        self.assertEqual('Runtime.evaluate', cmd)
+        self.assertEqual(True, params['awaitPromise'])
+
+        # no wait_for means no commands sent at all
+        devtool_command = Mock()
+        _wait_for_ready(devtool_command, None, 5)
+        devtool_command.assert_not_called()
+
+        # timed out
+        devtool_command = Mock(return_value={'result': {'type': 'object', 'value': {'ready': False, 'error': None}}})
+        with self.assertRaisesRegex(ChromePdfException, 'did not complete within 5 seconds.$'):
+            _wait_for_ready(devtool_command, 'load', 5)
+        value = {'ready': False, 'error': 'ReferenceError: renderCharts is not defined'}
+        devtool_command = Mock(return_value={'result': {'type': 'object', 'value': value}})
+        with self.assertRaisesRegex(ChromePdfException, 'The last error was: ReferenceError'):
+            _wait_for_ready(devtool_command, 'renderCharts()', 5)
+
+        # promise was rejected
+        devtool_command = Mock(return_value={'result': {}, 'exceptionDetails': {'text': 'Uncaught', 'exception': {'description': 'Error: chart failed'}}})
+        with self.assertRaisesRegex(ChromePdfException, 'Error: chart failed'):
+            _wait_for_ready(devtool_command, 'signal', 5)
+
+
+class LoadContentTests(TestCase):
+    """Test the helpers that load HTML into the page."""
+
+    def test_document_write_script(self):
+        """Quotes and newlines should be escaped so the html can be wrapped in a JavaScript string."""
+
+        script = _get_document_write_script("It's\ntwo\rlines")
+        self.assertEqual("document.write('It\\'s \\\ntwo \\\rlines')", script)
+
+    def test_set_document_content(self):
+        """With JavaScript disabled, the html should be set via CDP rather than executed as a script."""
+
+        def devtool_command(cmd, params=None):
+            return {'frameTree': {'frame': {'id': 'FRAME1'}}} if cmd == 'Page.getFrameTree' else {}
+
+        devtool_command = Mock(side_effect=devtool_command)
+        _set_document_content(devtool_command, '<p>Two Words</p>')
+        self.assertEqual([
+            call('Emulation.setScriptExecutionDisabled', {'value': True}),
+            call('Page.getFrameTree'),
+            call('Page.setDocumentContent', {'frameId': 'FRAME1', 'html': '<p>Two Words</p>'}),
+        ], devtool_command.call_args_list)
+
+
+class PerformanceMetricsTests(TestCase):
+    """Test collecting Chrome's performance metrics for a page."""
+
+    def test_get_performance_metrics(self):
+        metrics = {'metrics': [{'name': 'LayoutCount', 'value': 3}, {'name': 'LayoutDuration', 'value': 0.015}]}
+        devtool_command = Mock(side_effect=lambda cmd, params=None: metrics if cmd == 'Performance.getMetrics' else {})
+        self.assertEqual({'LayoutCount': 3, 'LayoutDuration': 0.015}, _get_performance_metrics(devtool_command))
+        self.assertEqual([call('Performance.getMetrics'), call('Performance.disable')], devtool_command.call_args_list)
+
+
+class StreamTests(TestCase):
+    """Test streaming a printed PDF to a file."""
+
+    def test_get_print_params(self):
+        self.assertNotIn('transferMode', _get_print_params({}))
+        self.assertEqual('ReturnAsStream', _get_print_params({}, io.BytesIO())['transferMode'])
+
+    def test_read_stream(self):
+        chunks = [{'data': base64.b64encode(b'%PDF').decode('ascii'), 'base64Encoded': True, 'eof': False},
+                  {'data': '-1.4', 'base64Encoded': False, 'eof': True}]
+        devtool_command = Mock(side_effect=lambda cmd, params=None: chunks.pop(0) if cmd == 'IO.read' else {})
+        outfile = io.BytesIO()
+        self.assertEqual(8, _read_stream(devtool_command, 'handle1', outfile, chunk_size=4))
+        self.assertEqual(b'%PDF-1.4', outfile.getvalue())
+        self.assertEqual(call('IO.close', {'handle': 'handle1'}), devtool_command.call_args_list[-1])
+
+    def test_read_stream_closes_on_error(self):
+        devtool_command = Mock(side_effect=lambda cmd, params=None: {}[0] if cmd == 'IO.read' else {})
+        with self.assertRaises(KeyError):
+            _read_stream(devtool_command, 'handle1', io.BytesIO())
+        self.assertEqual(call('IO.close', {'handle': 'handle1'}), devtool_command.call_args_list[-1])
@@ -2,8 +2,14 @@ import copy
 import io
 import os
 import platform
+import shutil
+import subprocess
+import sys
+import tempfile
 import time
+import unittest
 from contextlib import redirect_stderr
+from multiprocessing.pool import ThreadPool
 from unittest import mock
 from unittest.case import TestCase
 
@@ -15,8 +21,9 @@ from chromepdf.exceptions import ChromePdfException
 from chromepdf.maker import ChromePdfMaker
 from chromepdf.webdrivers import *
 from chromepdf.webdrivers import (
-    _force_version_str, _get_chrome_webdriver_kwargs, _get_chromedriver_download_path,
-    _get_chromedriver_environment_path, _get_chromedriver_zip_url, _get_chromesession_temp_dir, _version_to_tuple)
+    _clear_profile_state, _force_version_str, _get_chrome_webdriver_args, _get_chrome_webdriver_kwargs,
+    _get_chromedriver_download_path, _get_chromedriver_environment_path, _get_chromedriver_zip_url,
+    _get_chromesession_temp_dir, _version_to_tuple)
 from testapp.tests.utils import MockCompletedProcess, findChromePath
 
 
@@ -248,6 +255,118 @@ class GetChromedriverZipUrlTests(LocalChromedriverTestCase):
                         self.assertEqual(expected_path, _get_chromedriver_zip_url(chromedriver_version))
 
 
+class ChromeArgsTests(TestCase):
+
+    def test_network_lockdown_args(self):
+        """BLOCK_NETWORK should add host resolver and proxy rules that block everything except the NETWORK_ALLOWLIST."""
+
+        with override_settings(CHROMEPDF={}):
+            args = _get_chrome_webdriver_args(**parse_settings())
+            self.assertFalse([a for a in args if a.startswith('--host-resolver-rules')])
+
+        with override_settings(CHROMEPDF={'BLOCK_NETWORK': True}):
+            args = _get_chrome_webdriver_args(**parse_settings())
+            self.assertIn('--host-resolver-rules=MAP * ~NOTFOUND', args)
+            # urls with IP addresses are sent to a proxy that cannot be reached, including those of localhost.
+            self.assertIn('--proxy-server=http://127.0.0.1:9', args)
+            self.assertIn('--proxy-bypass-list=<-loopback>', args)
+            self.assertIn('--dns-prefetch-disable', args)
+            self.assertIn('--disable-background-networking', args)
+
+        with override_settings(CHROMEPDF={'BLOCK_NETWORK': True, 'NETWORK_ALLOWLIST': ['cdn.example.com', '*.example.org']}):
+            args = _get_chrome_webdriver_args(**parse_settings(chrome_args=['--no-sandbox']))
+            self.assertIn('--host-resolver-rules=MAP * ~NOTFOUND, EXCLUDE cdn.example.com, EXCLUDE *.example.org', args)
+            self.assertIn('--proxy-bypass-list=cdn.example.com;*.example.org;<-loopback>', args)
+            self.assertEqual('--no-sandbox', args[-1])  # CHROME_ARGS still come last, so they can override ours.
+
+    def test_profile_dir_args(self):
+        """A profile slot should be used as the --user-data-dir instead of incognito mode."""
+
+        args = _get_chrome_webdriver_args(**parse_settings())
+        self.assertIn('--incognito', args)
+
+        args = _get_chrome_webdriver_args(_profile_dir='/tmp/profiles/slot-0', **parse_settings())
+        self.assertNotIn('--incognito', args)
+        self.assertIn('--user-data-dir=/tmp/profiles/slot-0', args)
+
+
+class ProfileSlotTests(TestCase):
+    """Test the locking of USER_DATA_DIR profile slots, so only one Chrome uses each profile at a time."""
+
+    def setUp(self):
+        self.user_data_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.user_data_dir)
+
+    def test_acquire_profile_slot(self):
+        """Each slot should be given out once at a time, and reused after being released."""
+
+        slot0 = acquire_profile_slot(self.user_data_dir)
+        slot1 = acquire_profile_slot(self.user_data_dir)
+        self.assertEqual(os.path.join(self.user_data_dir, 'slot-0'), slot0.path)
+        self.assertEqual(os.path.join(self.user_data_dir, 'slot-1'), slot1.path)
+        self.assertTrue(os.path.isdir(slot0.path))
+
+        slot0.release()
+        slot0_again = acquire_profile_slot(self.user_data_dir)
+        self.assertEqual(slot0.path, slot0_again.path)
+        self.assertEqual(os.path.join(self.user_data_dir, 'slot-2'), acquire_profile_slot(self.user_data_dir).path)
+
+    def test_acquire_profile_slot_stale_lock(self):
+        """A lock left behind by a process that no longer exists should be reclaimed."""
+
+        proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+        proc.wait()
+        with open(os.path.join(self.user_data_dir, 'slot-0.lock'), 'w', encoding='utf8') as f:
+            f.write(str(proc.pid))
+
+        slot = acquire_profile_slot(self.user_data_dir)
+        self.assertEqual(os.path.join(self.user_data_dir, 'slot-0'), slot.path)
+        with open(slot.lock_path, 'r', encoding='utf8') as f:
+            self.assertEqual(str(os.getpid()), f.read())
+
+    def test_acquire_profile_slot_other_process(self):
+        """A slot locked by another running process should be skipped, and reclaimed once that process exits."""
+
+        script = ('import sys, time; from chromepdf.webdrivers import acquire_profile_slot; '
+                  'slot = acquire_profile_slot(sys.argv[1]); print("locked", flush=True); time.sleep(30)')
+        proc = subprocess.Popen([sys.executable, '-c', script, self.user_data_dir], stdout=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        try:
+            self.assertEqual(b'locked\n', proc.stdout.readline())
+            slot = acquire_profile_slot(self.user_data_dir)
+            self.assertEqual(os.path.join(self.user_data_dir, 'slot-1'), slot.path)
+            slot.release()
+        finally:
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+        self.assertEqual(os.path.join(self.user_data_dir, 'slot-0'), acquire_profile_slot(self.user_data_dir).path)
+
+    def test_acquire_profile_slot_concurrently(self):
+        """Slots acquired at the same time by many threads should all be different."""
+
+        with ThreadPool(8) as pool:
+            slots = pool.map(lambda _i: acquire_profile_slot(self.user_data_dir), range(16))
+        self.assertEqual(16, len({slot.path for slot in slots}))
+        for slot in slots:
+            slot.release()
+
+    def test_clear_profile_state(self):
+        """Cookies and the page origin's storage should be cleared after a render."""
+
+        def devtool_command(cmd, params=None):
+            return {'result': {'type': 'string', 'value': 'https://example.com'}} if cmd == 'Runtime.evaluate' else {}
+
+        devtool_command = mock.Mock(side_effect=devtool_command)
+        _clear_profile_state(devtool_command)
+        cmds = [c[0][0] for c in devtool_command.call_args_list]
+        self.assertEqual(['Network.clearBrowserCookies', 'Runtime.evaluate', 'Storage.clearDataForOrigin'], cmds)
+        self.assertEqual('https://example.com', devtool_command.call_args_list[2][0][1]['origin'])
+        self.assertNotIn('shader_cache', devtool_command.call_args_list[2][0][1]['storageTypes'])
+
+
 class ChromeDriverDownloadTests(LocalChromedriverTestCase):
 
     def test_chromedriver_args(self):
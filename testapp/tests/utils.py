@@ -4,14 +4,19 @@ Utility functions for assisting with unit tests.
 """
 
 import os
+import sys
 import tempfile
 from io import BytesIO
+from unittest.case import TestCase
 
 from pdfminer.converter import TextConverter
 from pdfminer.layout import LAParams
 from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
 from pdfminer.pdfpage import PDFPage
 
+from chromepdf.fakedriver import write_fake_chromedriver
+from chromepdf.maker import ChromePdfMaker
+
 
 def findChromePath():
     """
@@ -75,3 +80,44 @@ class MockCompletedProcess:
     def __init__(self, stdout=None, stderr=None):
         self.stdout = stdout.encode('utf8') if isinstance(stdout, str) else stdout
         self.stderr = stderr.encode('utf8') if isinstance(stderr, str) else stderr
+
+
+def getFakeMakerKwargs(chromedriver_path, use_selenium=False):
+    """Return the ChromePdfMaker kwargs that render with the fake chromedriver script at chromedriver_path."""
+
+    return {'use_selenium': use_selenium, 'chromedriver_path': chromedriver_path, 'chrome_path': sys.executable,
+            'chromedriver_downloads': False}
+
+
+def getFakeRunArgs(chromedriver_path):
+    """Return the command line arguments that render with the fake chromedriver script at chromedriver_path."""
+
+    return [f'--chrome-path={sys.executable}', f'--chromedriver-path={chromedriver_path}', '--chromedriver-downloads=0',
+            '--use-selenium=0']
+
+
+class FakeChromedriverTestCase(TestCase):
+    """
+    Base class for tests that render with the fake chromedriver from chromepdf.fakedriver, so they need no Chrome.
+    Each test gets a temporary directory, self.tempdir, which holds the fake chromedriver scripts.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+    def writeFakeChromedriver(self, name='chromedriver', **fake_options):
+        """Write a fake chromedriver script to self.tempdir, and return its path. See write_fake_chromedriver()."""
+
+        return write_fake_chromedriver(os.path.join(self.tempdir.name, name), **fake_options)
+
+    def makeFakeMaker(self, use_selenium=False, fake_options=None, chromedriver_path=None, **kwargs):
+        """
+        Return a ChromePdfMaker that renders with the fake chromedriver, with extra kwargs for the maker.
+        A fake chromedriver script is written with fake_options, unless an existing chromedriver_path is given.
+        """
+
+        if chromedriver_path is None:
+            chromedriver_path = self.writeFakeChromedriver(**(fake_options or {}))
+        return ChromePdfMaker(**getFakeMakerKwargs(chromedriver_path, use_selenium), **kwargs)